@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+import time
+
+import aiohttp
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class AsyncResponse:
+    """Buffered aiohttp response exposing the parts of requests.Response used by the parsers"""
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers if headers is not None else {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncTaskSignals(QObject):
+    """Carries the result of a coroutine run on the transport loop to the GUI thread"""
+    finished = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.future = None
+
+    def cancel(self):
+        """Cancels the coroutine (from any thread); finished is then not emitted"""
+        if self.future is not None:
+            self.future.cancel()
+
+
+class AsyncTransport:
+    """aiohttp client on a dedicated asyncio event loop thread.
+
+    Requests are coroutines, so a request waiting for the network holds no
+    thread. run() schedules a coroutine from the GUI thread and returns
+    signals whose finished is emitted with the coroutine's result (or an
+    error result), in the same way as the QThreadPool workers. One
+    ClientSession with a keep-alive connector is kept per provider.
+    """
+
+    def __init__(self, pool_size=8, keepalive_timeout=60.0, connect_retries=2):
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_retries = connect_retries
+        self.loop = asyncio.new_event_loop()
+        self._sessions = {}
+        self._pending = set()
+        self._thread = threading.Thread(target=self._run_loop, name="AsyncTransport", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro):
+        """Schedules a coroutine on the loop; returns signals emitting its result"""
+        signals = AsyncTaskSignals()
+        self._pending.add(signals)
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        signals.future = future
+        future.add_done_callback(lambda done: self._deliver(signals, done))
+        return signals
+
+    def _deliver(self, signals, future):
+        if future.cancelled():
+            self._pending.discard(signals)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"error": f"Błąd podczas przetwarzania: {str(e)}", "success": False}
+        signals.finished.emit(result)
+        self._pending.discard(signals)
+
+    def _session(self, provider):
+        """The provider's ClientSession (created on the loop thread on first use)"""
+        session = self._sessions.get(provider)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[provider] = session
+        return session
+
+    @staticmethod
+    async def _stream(body):
+        for block in body:
+            yield block
+
+    async def post(self, provider, url, headers, body, deadlines=None):
+        """POSTs a MultipartStream body; returns an AsyncResponse.
+
+        deadlines (StageDeadlines) limit connecting and the wait for the
+        response; the body enforces its own upload limit. Only failures to
+        connect are retried - the request was never sent.
+        """
+        headers = dict(headers)
+        headers["Content-Length"] = str(len(body))
+        timeout = None
+        if deadlines is not None:
+            timeout = aiohttp.ClientTimeout(sock_connect=deadlines.connect, sock_read=deadlines.first_byte)
+        started = time.perf_counter()
+        for attempt in range(self.connect_retries + 1):
+            try:
+                async with self._session(provider).post(url, headers=headers, data=self._stream(body),
+                                                        timeout=timeout) as response:
+                    result = AsyncResponse(response.status, await response.text(), response.headers)
+                    print(f"{provider} request via aiohttp: {(time.perf_counter() - started) * 1000:.0f} ms")
+                    return result
+            except aiohttp.ClientConnectorError:
+                if attempt == self.connect_retries:
+                    raise
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def _prewarm(self, provider, url):
+        started = time.perf_counter()
+        try:
+            # The status does not matter (endpoints answer 401/405) - only the open connection does
+            async with self._session(provider).head(url, timeout=aiohttp.ClientTimeout(total=5)):
+                pass
+            print(f"Connection to {provider} ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            print(f"Could not pre-warm the connection to {provider}: {str(e)}")
+
+    def prewarm(self, provider, url):
+        """Opens or revalidates a kept-alive connection to the provider on the loop"""
+        asyncio.run_coroutine_threadsafe(self._prewarm(provider, url), self.loop)
+
+    async def _close_sessions(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
+
+    def close(self):
+        """Closes the sessions and stops the loop thread"""
+        if not self.loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_sessions(), self.loop).result(timeout=5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,453 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pyaudio
+
+from pcm_buffer import PCMBuffer
+from resampler import StreamResampler
+
+
+class RingBuffer:
+    """Single-producer / single-consumer ring buffer over a preallocated bytearray.
+
+    The PortAudio callback is the only writer and the drain thread the only
+    reader, so each side owns its own index and no lock is needed.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._write_pos = 0  # Total bytes written (owned by the producer)
+        self._read_pos = 0   # Total bytes read (owned by the consumer)
+
+    def available(self):
+        """Number of bytes waiting to be read"""
+        return self._write_pos - self._read_pos
+
+    def free(self):
+        """Number of bytes that can be written without overwriting unread data"""
+        return self.capacity - self.available()
+
+    def write(self, data):
+        """Writes data into the ring; returns the number of bytes dropped because the ring was full"""
+        size = len(data)
+        writable = min(size, self.free())
+        if writable:
+            start = self._write_pos % self.capacity
+            first = min(writable, self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            if writable > first:
+                self._view[:writable - first] = data[first:writable]
+            self._write_pos += writable
+        return size - writable
+
+    def read(self, max_bytes=None):
+        """Reads up to max_bytes of pending data and returns it as bytes"""
+        size = self.available()
+        if max_bytes is not None:
+            size = min(size, max_bytes)
+        if size <= 0:
+            return b""
+        start = self._read_pos % self.capacity
+        first = min(size, self.capacity - start)
+        if first == size:
+            data = bytes(self._view[start:start + size])
+        else:
+            data = bytes(self._view[start:]) + bytes(self._view[:size - first])
+        self._read_pos += size
+        return data
+
+    def read_into(self, target):
+        """Appends all pending data to target (e.g. a PCMBuffer) without an intermediate copy"""
+        size = self.available()
+        if size <= 0:
+            return 0
+        start = self._read_pos % self.capacity
+        first = min(size, self.capacity - start)
+        target.append(self._view[start:start + first])
+        if size > first:
+            target.append(self._view[:size - first])
+        self._read_pos += size
+        return size
+
+    def clear(self):
+        """Discards all pending data (consumer side)"""
+        self._read_pos = self._write_pos
+
+
+class _ResampledTarget:
+    """Lets RingBuffer.read_into feed the recording through the resampler"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def append(self, data):
+        self.engine.buffer.append(self.engine.resampler.process(data))
+
+
+class AudioCaptureEngine:
+    """Callback-driven audio capture that never blocks the Qt event loop.
+
+    PortAudio delivers audio on its own thread into a ring buffer; a drain
+    thread moves it into the recording. The GUI only reads levels, statistics
+    and the final buffer.
+
+    In armed mode the stream stays open between recordings and the drain
+    thread keeps the last few hundred milliseconds in a pre-roll buffer, so a
+    recording starts with the audio captured just before the key press.
+
+    rate and channels describe the recorded buffer. With native_capture the
+    device is opened at its own rate and channel count (many headsets refuse
+    8 kHz mono or resample it slowly in the driver). The drain thread then
+    downmixes and resamples each block in NumPy.
+    """
+
+    def __init__(self, audio, sample_format=pyaudio.paInt16, channels=1, rate=8000,
+                 frames_per_buffer=1024, ring_seconds=2.0, drain_interval=0.02, native_capture=True):
+        self.audio = audio
+        self.sample_format = sample_format
+        self.channels = channels
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.sample_width = audio.get_sample_size(sample_format)
+        self.ring_seconds = ring_seconds
+        self.drain_interval = drain_interval
+        self.native_capture = native_capture
+
+        # Format the device is opened with (set when the stream opens)
+        self.capture_rate = rate
+        self.capture_channels = channels
+        self.bytes_per_second = rate * channels * self.sample_width
+        self.resampler = self._new_resampler()
+        self._resampled_target = _ResampledTarget(self)
+
+        self.ring = RingBuffer(int(self.bytes_per_second * ring_seconds))
+        self.stream = None
+        self.device_index = None
+        self.buffer = self._new_buffer()
+        self.recording = False
+
+        # Called on the drain thread with each block of newly recorded samples
+        self.chunk_listener = None
+
+        # Pre-roll kept while armed (owned by the drain thread)
+        self.armed = False
+        self.preroll_ms = 0
+        self.preroll_bytes = 0
+        self._preroll = deque()
+        self._preroll_size = 0
+
+        self._drain_thread = None
+        self._stop_event = threading.Event()
+        self._drain_lock = threading.Lock()
+
+        # Levels of the last delivered block (read by the GUI)
+        self.peak_level = 0.0
+        self.rms_level = 0.0
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Resets the capture counters"""
+        self.stats = {
+            "callbacks": 0,
+            "input_overflows": 0,
+            "input_underflows": 0,
+            "ring_overruns": 0,
+            "dropped_bytes": 0,
+            "max_callback_ms": 0.0,
+            "captured_bytes": 0,
+            "preroll_bytes": 0,
+            "capture_rate": self.capture_rate,
+            "capture_channels": self.capture_channels,
+        }
+
+    @property
+    def is_active(self):
+        return self.recording
+
+    def arm(self, device_index, preroll_ms):
+        """Keeps the device stream warm and buffers the last preroll_ms of audio"""
+        self.preroll_ms = preroll_ms
+        self._update_preroll_bytes()
+
+        if self.armed and self.device_index == device_index:
+            return
+
+        if self.stream is not None and not self.recording:
+            self._close_stream()
+        self.armed = True
+        if self.stream is None:
+            self._open_stream(device_index)
+
+    def _update_preroll_bytes(self):
+        """Converts the pre-roll length to bytes of the device format"""
+        frame_size = self.capture_channels * self.sample_width
+        preroll_bytes = int(self.bytes_per_second * self.preroll_ms / 1000)
+        with self._drain_lock:
+            self.preroll_bytes = preroll_bytes - preroll_bytes % frame_size
+            self._trim_preroll()
+
+    def set_output_rate(self, rate):
+        """Changes the sample rate of recorded buffers (between recordings only)"""
+        if rate == self.rate or self.recording:
+            return
+        with self._drain_lock:
+            self.rate = rate
+            self.resampler = self._new_resampler()
+        if self.stream is not None and not self.native_capture:
+            # The device itself runs at the output rate - reopen it
+            device_index = self.device_index
+            self._close_stream()
+            self._open_stream(device_index)
+
+    def disarm(self):
+        """Leaves armed mode; the stream is closed unless a recording is running"""
+        self.armed = False
+        with self._drain_lock:
+            self._preroll.clear()
+            self._preroll_size = 0
+        if self.stream is not None and not self.recording:
+            self._close_stream()
+
+    def start(self, device_index, chunk_listener=None):
+        """Starts a recording, reusing the armed stream and its pre-roll when possible.
+
+        chunk_listener, if given, receives every block of recorded samples
+        (pre-roll included) on the drain thread, e.g. a streaming encoder.
+        """
+        if self.recording:
+            return
+
+        if self.stream is not None and self.device_index != device_index:
+            # Armed on a different device - reopen on the requested one
+            self._close_stream()
+
+        self.reset_stats()
+        if self.stream is None:
+            self.buffer = self._new_buffer()
+            self.chunk_listener = chunk_listener
+            self.ring.clear()
+            # Recording before the drain thread starts - its first block belongs to the recording
+            self.recording = True
+            try:
+                self._open_stream(device_index)
+            except Exception:
+                self.recording = False
+                self.chunk_listener = None
+                raise
+            return
+
+        # Armed: the recording begins with the buffered pre-roll
+        with self._drain_lock:
+            self._drain_pending()
+            self.buffer = self._new_buffer()
+            self.chunk_listener = chunk_listener
+            self.recording = True
+            self.resampler.reset()
+            for chunk in self._preroll:
+                self.buffer.append(self.resampler.process(chunk))
+            self.stats["preroll_bytes"] = self._preroll_size
+            self._preroll.clear()
+            self._preroll_size = 0
+            if chunk_listener is not None and len(self.buffer):
+                chunk_listener(self.buffer.samples())
+
+    def stop(self):
+        """Stops the recording and returns its PCMBuffer (owned by the caller from now on)"""
+        if not self.armed:
+            self._close_stream()
+
+        with self._drain_lock:
+            # Collect whatever arrived after the last drain
+            self._drain_pending()
+            self.recording = False
+            self.chunk_listener = None
+            buffer = self.buffer
+            self.buffer = self._new_buffer()
+        return buffer
+
+    def close(self):
+        """Closes the stream regardless of the current mode"""
+        self.armed = False
+        self.recording = False
+        self._close_stream()
+
+    def _new_buffer(self):
+        return PCMBuffer(self.rate, self.channels)
+
+    def native_format(self, device_index):
+        """Returns the device's default (rate, channels), at most stereo"""
+        try:
+            if device_index is None:
+                info = self.audio.get_default_input_device_info()
+            else:
+                info = self.audio.get_device_info_by_index(device_index)
+            return int(info['defaultSampleRate']), max(1, min(int(info['maxInputChannels']), 2))
+        except Exception as e:
+            print(f"Could not read the native device format: {str(e)}")
+            return self.rate, self.channels
+
+    def _new_resampler(self):
+        """Device format -> recording format converter (the resampler produces mono)"""
+        if self.channels != 1:
+            return StreamResampler(self.capture_rate, self.capture_rate, 1)
+        return StreamResampler(self.capture_rate, self.rate, self.capture_channels)
+
+    def _configure_capture(self, rate, channels):
+        """Sizes the ring, pre-roll and resampler for the device format (stream closed)"""
+        self.capture_rate = rate
+        self.capture_channels = channels
+        self.bytes_per_second = rate * channels * self.sample_width
+        ring_capacity = int(self.bytes_per_second * self.ring_seconds)
+        if ring_capacity != self.ring.capacity:
+            self.ring = RingBuffer(ring_capacity)
+        self.resampler = self._new_resampler()
+        self._update_preroll_bytes()
+        self.stats["capture_rate"] = rate
+        self.stats["capture_channels"] = channels
+
+    def _open_stream(self, device_index):
+        """Opens the input stream in callback mode and starts draining it"""
+        self.ring.clear()
+        self.peak_level = 0.0
+        self.rms_level = 0.0
+
+        # Native format first; the output format is the fallback
+        formats = [(self.rate, self.channels)]
+        if self.native_capture and self.channels == 1:
+            native = self.native_format(device_index)
+            if native != formats[0]:
+                formats.insert(0, native)
+
+        for attempt, (rate, channels) in enumerate(formats):
+            self._configure_capture(rate, channels)
+            try:
+                self.stream = self.audio.open(
+                    format=self.sample_format,
+                    channels=channels,
+                    rate=rate,
+                    input=True,
+                    input_device_index=device_index,
+                    frames_per_buffer=self.frames_per_buffer,
+                    stream_callback=self._callback
+                )
+                break
+            except Exception as e:
+                if attempt == len(formats) - 1:
+                    raise
+                print(f"Could not open the device at {rate} Hz / {channels} ch ({str(e)}), "
+                      f"trying {self.rate} Hz / {self.channels} ch")
+
+        self.device_index = device_index
+        print(f"Capturing at {self.capture_rate} Hz / {self.capture_channels} ch, "
+              f"recording at {self.rate} Hz / {self.channels} ch")
+
+        self._stop_event.clear()
+        self._drain_thread = threading.Thread(target=self._drain_loop, name="AudioDrain", daemon=True)
+        self._drain_thread.start()
+        self.stream.start_stream()
+
+    def _close_stream(self):
+        """Stops the stream and the drain thread"""
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            finally:
+                self.stream = None
+
+        if self._drain_thread is not None:
+            self._stop_event.set()
+            self._drain_thread.join()
+            self._drain_thread = None
+
+        with self._drain_lock:
+            self._drain_pending()
+            self._preroll.clear()
+            self._preroll_size = 0
+
+    def recorded_samples(self, start):
+        """Returns (view of the samples recorded since start, new position) for level metering.
+
+        Safe to call from the GUI thread: it only slices the current buffer.
+        A position past the end (new recording) starts over from zero.
+        """
+        buffer = self.buffer
+        end = len(buffer)
+        if start > end:
+            start = 0
+        return buffer.samples()[start:end], end
+
+    def recorded_bytes(self):
+        """Number of bytes captured so far in the current recording"""
+        return self.stats["captured_bytes"]
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        """PortAudio callback - runs on the audio thread, must not block"""
+        started = time.perf_counter()
+        stats = self.stats
+        stats["callbacks"] += 1
+
+        if status_flags & pyaudio.paInputOverflow:
+            stats["input_overflows"] += 1
+        if status_flags & pyaudio.paInputUnderflow:
+            stats["input_underflows"] += 1
+
+        dropped = self.ring.write(in_data)
+        if dropped:
+            stats["ring_overruns"] += 1
+            stats["dropped_bytes"] += dropped
+        stats["captured_bytes"] += len(in_data) - dropped
+
+        if self.sample_width == 2 and in_data:
+            samples = np.frombuffer(in_data, dtype=np.int16)
+            peak = max(int(samples.max()), -int(samples.min()))
+            self.peak_level = peak / 32768.0
+            self.rms_level = float(np.sqrt(np.mean(np.square(samples, dtype=np.float32)))) / 32768.0
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if elapsed_ms > stats["max_callback_ms"]:
+            stats["max_callback_ms"] = elapsed_ms
+
+        return (None, pyaudio.paContinue)
+
+    def _drain(self):
+        with self._drain_lock:
+            self._drain_pending()
+
+    def _drain_pending(self):
+        """Moves pending data out of the ring buffer (caller holds the drain lock)"""
+        if self.recording:
+            start = len(self.buffer)
+            if self.ring.read_into(self._resampled_target) and self.chunk_listener is not None:
+                self.chunk_listener(self.buffer.samples()[start:])
+            return
+        data = self.ring.read()
+        if not data:
+            return
+        if self.armed:
+            self._preroll.append(data)
+            self._preroll_size += len(data)
+            self._trim_preroll()
+
+    def _trim_preroll(self):
+        """Drops the oldest pre-roll audio beyond the configured length"""
+        excess = self._preroll_size - self.preroll_bytes
+        while excess > 0 and self._preroll:
+            oldest = self._preroll[0]
+            if len(oldest) <= excess:
+                self._preroll.popleft()
+                self._preroll_size -= len(oldest)
+                excess -= len(oldest)
+            else:
+                self._preroll[0] = oldest[excess:]
+                self._preroll_size -= excess
+                excess = 0
+
+    def _drain_loop(self):
+        while not self._stop_event.wait(self.drain_interval):
+            self._drain()
@@ -0,0 +1,294 @@
+import io
+import struct
+import threading
+import time
+
+import numpy as np
+
+# FLAC and Opus need libsndfile through the optional soundfile package
+try:
+    import soundfile
+except (ImportError, OSError):
+    soundfile = None
+
+
+# Codecs tried by "auto", smallest expected payload first
+SIZE_ORDER = ["opus", "flac", "wav_ulaw", "wav"]
+
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+class EncodedAudio:
+    """Encoded clip held in memory as a list of byte chunks.
+
+    Chunks may be memoryviews of the PCM buffer, so the audio is never
+    copied into an intermediate file or joined bytes object.
+    """
+
+    def __init__(self, chunks, mime_type, extension, raw_bytes, codec="wav"):
+        self.chunks = chunks
+        self.mime_type = mime_type
+        self.extension = extension
+        self.raw_bytes = raw_bytes
+        self.codec = codec
+        self.nbytes = sum(len(chunk) for chunk in chunks)
+
+    @property
+    def filename(self):
+        return f"audio.{self.extension}"
+
+    def tobytes(self):
+        return b"".join(self.chunks)
+
+    def write_to(self, file_path):
+        """Writes the encoded clip to a file (used by the debug dump)"""
+        with open(file_path, 'wb') as f:
+            for chunk in self.chunks:
+                f.write(chunk)
+
+
+class Codec:
+    """Describes one upload format"""
+
+    def __init__(self, name, label, mime_type, extension, encoder, is_available=lambda rate: True):
+        self.name = name
+        self.label = label
+        self.mime_type = mime_type
+        self.extension = extension
+        self.encoder = encoder
+        self.is_available = is_available
+
+    def encode(self, pcm_buffer):
+        return self.encoder(pcm_buffer)
+
+
+def wav_header(data_size, rate, channels, sample_width, format_tag=1, frame_count=None):
+    """Builds a RIFF/WAVE header (canonical 44 bytes for PCM, with fact chunk otherwise)"""
+    block_align = channels * sample_width
+    byte_rate = rate * block_align
+    bits = sample_width * 8
+
+    if format_tag == 1:
+        return struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + data_size, b'WAVE',
+            b'fmt ', 16, format_tag, channels, rate, byte_rate, block_align, bits,
+            b'data', data_size
+        )
+
+    # Non-PCM formats (e.g. mu-law) use an 18-byte fmt chunk and a fact chunk
+    if frame_count is None:
+        frame_count = data_size // block_align
+    return struct.pack(
+        '<4sI4s4sIHHIIHHH4sII4sI',
+        b'RIFF', 50 + data_size, b'WAVE',
+        b'fmt ', 18, format_tag, channels, rate, byte_rate, block_align, bits, 0,
+        b'fact', 4, frame_count,
+        b'data', data_size
+    )
+
+
+def encode_wav(pcm_buffer):
+    """Wraps the PCM buffer in a WAV container without copying the samples"""
+    data = pcm_buffer.memoryview()
+    header = wav_header(len(data), pcm_buffer.rate, pcm_buffer.channels, pcm_buffer.sample_width)
+    return EncodedAudio([header, data], 'audio/wav', 'wav', len(data), "wav")
+
+
+# G.711 mu-law exponent for each value of (magnitude >> 7)
+_ULAW_EXPONENT = np.array([0, 0] + [1] * 2 + [2] * 4 + [3] * 8 + [4] * 16 + [5] * 32 + [6] * 64 + [7] * 128,
+                          dtype=np.int32)
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 32635
+
+
+def pcm16_to_ulaw(samples):
+    """Vectorized G.711 mu-law encoding of int16 samples"""
+    x = samples.astype(np.int32)
+    sign = (x < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(x), _ULAW_CLIP) + _ULAW_BIAS
+    exponent = _ULAW_EXPONENT[magnitude >> 7]
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def encode_wav_ulaw(pcm_buffer):
+    """8-bit mu-law WAV - half the size of 16-bit PCM"""
+    data = pcm16_to_ulaw(pcm_buffer.samples())
+    header = wav_header(len(data), pcm_buffer.rate, pcm_buffer.channels, 1, format_tag=7,
+                        frame_count=pcm_buffer.frame_count)
+    return EncodedAudio([header, memoryview(data)], 'audio/wav', 'wav', pcm_buffer.nbytes, "wav_ulaw")
+
+
+def _encode_soundfile(pcm_buffer, file_format, subtype, mime_type, extension, codec):
+    output = io.BytesIO()
+    samples = pcm_buffer.samples().reshape(-1, pcm_buffer.channels)
+    soundfile.write(output, samples, pcm_buffer.rate, format=file_format, subtype=subtype)
+    return EncodedAudio([output.getbuffer()], mime_type, extension, pcm_buffer.nbytes, codec)
+
+
+def encode_flac(pcm_buffer):
+    return _encode_soundfile(pcm_buffer, 'FLAC', 'PCM_16', 'audio/flac', 'flac', "flac")
+
+
+def encode_opus(pcm_buffer):
+    return _encode_soundfile(pcm_buffer, 'OGG', 'OPUS', 'audio/ogg', 'ogg', "opus")
+
+
+def _flac_available(rate):
+    return soundfile is not None and 'FLAC' in soundfile.available_formats()
+
+
+def _opus_available(rate):
+    if soundfile is None or rate not in OPUS_RATES:
+        return False
+    try:
+        return 'OPUS' in soundfile.available_subtypes('OGG')
+    except Exception:
+        return False
+
+
+CODECS = {
+    "wav": Codec("wav", "WAV (16-bit PCM)", 'audio/wav', 'wav', encode_wav),
+    "wav_ulaw": Codec("wav_ulaw", "WAV (8-bit mu-law)", 'audio/wav', 'wav', encode_wav_ulaw),
+    "flac": Codec("flac", "FLAC", 'audio/flac', 'flac', encode_flac, _flac_available),
+    "opus": Codec("opus", "Opus (Ogg)", 'audio/ogg', 'ogg', encode_opus, _opus_available),
+}
+
+
+def negotiate_codec(preference, accepted, rate):
+    """Picks the codec to upload with.
+
+    The preferred codec is used when the endpoint accepts it and it can be
+    encoded here; otherwise ("auto" included) the smallest accepted and
+    available codec wins. WAV is the universal fallback.
+    """
+    def usable(name):
+        return name in CODECS and name in accepted and CODECS[name].is_available(rate)
+
+    if preference and preference != "auto" and usable(preference):
+        return CODECS[preference]
+    for name in SIZE_ORDER:
+        if usable(name):
+            return CODECS[name]
+    return CODECS["wav"]
+
+
+class StreamingEncoder:
+    """Encodes captured chunks while the user is still speaking.
+
+    feed() runs on the capture drain thread; finish() only patches the
+    container (or flushes the encoder), so the payload is ready within
+    milliseconds of the key release. feed_seconds is the encode time taken
+    off the release-to-upload critical path. Streamable encoders also pass
+    each encoded block to data_listener, so it can be uploaded right away.
+    """
+
+    streamable = False
+
+    def __init__(self, codec, rate, channels):
+        self.codec = codec
+        self.rate = rate
+        self.channels = channels
+        self.raw_bytes = 0
+        self.feed_seconds = 0.0
+        self.finish_seconds = 0.0
+        self.failed = False
+        self.data_listener = None
+        self._lock = threading.Lock()
+        self._finished = None
+
+    def feed(self, samples):
+        """Encodes a block of int16 samples; errors disable the encoder instead of raising"""
+        if self.failed or self._finished is not None:
+            return
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                self._encode(samples)
+                self.raw_bytes += samples.nbytes
+        except Exception as e:
+            print(f"Streaming encoder failed, falling back to whole-clip encoding: {str(e)}")
+            self.failed = True
+        self.feed_seconds += time.perf_counter() - started
+
+    def finish(self):
+        """Finalizes the container and returns the EncodedAudio"""
+        if self._finished is None:
+            started = time.perf_counter()
+            with self._lock:
+                self._finished = self._finish()
+            self.finish_seconds = time.perf_counter() - started
+        return self._finished
+
+    def _encode(self, samples):
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+
+class WavStreamEncoder(StreamingEncoder):
+    """PCM or mu-law WAV; the header is patched with the final sizes on finish"""
+
+    streamable = True
+
+    def __init__(self, codec, rate, channels):
+        super().__init__(codec, rate, channels)
+        self.ulaw = codec.name == "wav_ulaw"
+        self._data = bytearray()
+
+    def _encode(self, samples):
+        if self.ulaw:
+            encoded = pcm16_to_ulaw(samples).tobytes()
+        else:
+            encoded = samples.tobytes()
+        self._data += encoded
+        if self.data_listener is not None:
+            self.data_listener(encoded)
+
+    def _header(self, size):
+        if self.ulaw:
+            return wav_header(size, self.rate, self.channels, 1, format_tag=7,
+                              frame_count=size // self.channels)
+        return wav_header(size, self.rate, self.channels, 2)
+
+    def stream_header(self):
+        """Header for a stream of unknown length (zero sizes, as ffmpeg writes to pipes)"""
+        return self._header(0)
+
+    def _finish(self):
+        header = self._header(len(self._data))
+        return EncodedAudio([header, memoryview(self._data)], self.codec.mime_type, self.codec.extension,
+                            self.raw_bytes, self.codec.name)
+
+
+class SoundFileStreamEncoder(StreamingEncoder):
+    """FLAC frames or Opus packets written incrementally through libsndfile"""
+
+    FORMATS = {
+        "flac": ('FLAC', 'PCM_16'),
+        "opus": ('OGG', 'OPUS'),
+    }
+
+    def __init__(self, codec, rate, channels):
+        super().__init__(codec, rate, channels)
+        file_format, subtype = self.FORMATS[codec.name]
+        self._output = io.BytesIO()
+        self._file = soundfile.SoundFile(self._output, mode='w', samplerate=rate, channels=channels,
+                                         format=file_format, subtype=subtype)
+
+    def _encode(self, samples):
+        self._file.write(samples.reshape(-1, self.channels))
+
+    def _finish(self):
+        self._file.close()
+        return EncodedAudio([self._output.getbuffer()], self.codec.mime_type, self.codec.extension,
+                            self.raw_bytes, self.codec.name)
+
+
+def create_streaming_encoder(codec, rate, channels):
+    """Returns a streaming encoder for the codec"""
+    if codec.name in SoundFileStreamEncoder.FORMATS:
+        return SoundFileStreamEncoder(codec, rate, channels)
+    return WavStreamEncoder(codec, rate, channels)
@@ -0,0 +1,321 @@
+import bisect
+
+import numpy as np
+
+
+def frame_features(samples, frame_length):
+    """Vectorized per-frame energy (dBFS) and zero-crossing rate of int16 samples.
+
+    Trailing samples that do not fill a whole frame are ignored.
+    """
+    count = len(samples) // frame_length
+    if count == 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.float32)
+    frames = samples[:count * frame_length].reshape(count, frame_length).astype(np.float32)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    energy_db = 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_length - 1)
+    return energy_db, zcr
+
+
+class SampleOffsetMap:
+    """Maps sample offsets in the processed (trimmed / pause-compressed) clip back to the recording.
+
+    Stored as breakpoints (processed_offset, original_offset); between two
+    breakpoints the clip is an unmodified copy of the recording. time_scale
+    accounts for a time compression applied after the breakpoints were taken.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.time_scale = 1.0
+        self._processed = [0]
+        self._original = [0]
+
+    def add(self, processed_offset, original_offset):
+        """Records that processed_offset onwards continues at original_offset"""
+        if self._processed and self._processed[-1] == processed_offset:
+            self._original[-1] = original_offset
+        else:
+            self._processed.append(processed_offset)
+            self._original.append(original_offset)
+
+    def to_original(self, processed_offset):
+        """Original sample offset for a sample offset in the processed clip"""
+        i = bisect.bisect_right(self._processed, processed_offset) - 1
+        return self._original[i] + (processed_offset - self._processed[i])
+
+    def to_original_seconds(self, seconds):
+        return self.to_original(int(round(seconds * self.time_scale * self.rate))) / float(self.rate)
+
+    def clip_segments(self, segments):
+        """Returns copies of provider segments with start/end in seconds of the processed clip (time_scale undone)"""
+        scaled = []
+        for segment in segments:
+            segment = dict(segment)
+            for key in ("start", "end"):
+                if isinstance(segment.get(key), (int, float)):
+                    segment[key] = segment[key] * self.time_scale
+            scaled.append(segment)
+        return scaled
+
+    def map_segments(self, segments):
+        """Returns copies of provider segments with start/end mapped to the original recording"""
+        mapped = []
+        for segment in segments:
+            segment = dict(segment)
+            for key in ("start", "end"):
+                if isinstance(segment.get(key), (int, float)):
+                    segment[key] = self.to_original_seconds(segment[key])
+            mapped.append(segment)
+        return mapped
+
+
+class SpeechGate:
+    """Streaming energy / zero-crossing voice activity gate.
+
+    Fed with blocks of int16 samples, it forwards audio to the sink with
+    leading and trailing silence removed (keeping a short padding around
+    speech). Silent frames are held back until speech resumes, so internal
+    pauses are kept while the trailing silence never reaches the sink.
+    Frames count as speech when they are loud enough, or slightly quieter
+    but noisy like fricatives (high zero-crossing rate).
+
+    With max_pause_ms set, internal pauses longer than that are shortened to
+    pause_gap_ms (half kept from each end) and offset_map records how the
+    processed clip maps back to the recording. With output set, everything
+    forwarded is also collected into that PCMBuffer.
+    """
+
+    def __init__(self, rate, sink=None, frame_ms=20, energy_threshold_db=-48.0,
+                 fricative_margin_db=8.0, fricative_zcr=0.3, padding_ms=200, min_speech_ms=200,
+                 max_pause_ms=None, pause_gap_ms=300, output=None):
+        self.rate = rate
+        self.sink = sink
+        self.output = output
+        self.max_pause = int(rate * max_pause_ms / 1000) if max_pause_ms else None
+        self.pause_gap = int(rate * pause_gap_ms / 1000)
+        if self.max_pause is not None:
+            self.pause_gap = min(self.pause_gap, self.max_pause)
+        self.offset_map = SampleOffsetMap(rate)
+        self.compressed_samples = 0
+        self._emitted = 0
+        self.frame_length = max(int(rate * frame_ms / 1000), 16)
+        self.energy_threshold_db = energy_threshold_db
+        self.fricative_threshold_db = energy_threshold_db - fricative_margin_db
+        self.fricative_zcr = fricative_zcr
+        self.padding_frames = max(int(padding_ms / frame_ms), 0)
+        self.min_speech_frames = max(int(min_speech_ms / frame_ms), 1)
+
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._pending = []       # Silent frames since the last speech frame
+        self._position = 0       # Input samples classified so far
+        self.speech_frames = 0
+        self.first_speech = None  # Sample offset where the forwarded audio starts
+        self.last_speech = None   # Sample offset where speech (plus padding) ends
+        self.finished = False
+
+    @property
+    def has_speech(self):
+        return self.speech_frames >= self.min_speech_frames
+
+    def classify(self, samples):
+        """Boolean speech mask, one entry per whole frame"""
+        energy_db, zcr = frame_features(samples, self.frame_length)
+        return (energy_db > self.energy_threshold_db) | (
+            (energy_db > self.fricative_threshold_db) & (zcr > self.fricative_zcr))
+
+    def feed(self, samples):
+        """Classifies a block of samples and forwards speech to the sink"""
+        if self.finished:
+            return
+        if len(self._remainder):
+            samples = np.concatenate((self._remainder, samples))
+        usable = len(samples) - len(samples) % self.frame_length
+        self._remainder = samples[usable:].copy()
+        if usable == 0:
+            return
+
+        block = samples[:usable]
+        mask = self.classify(block)
+        frame_length = self.frame_length
+        for i, is_speech in enumerate(mask):
+            start = self._position
+            frame = block[i * frame_length:(i + 1) * frame_length]
+            self._position += frame_length
+            if is_speech:
+                self.speech_frames += 1
+                self._on_speech(frame, start)
+            else:
+                self._pending.append(frame)
+                if self.first_speech is None and len(self._pending) > self.padding_frames:
+                    # Leading silence beyond the padding is dropped
+                    self._pending.pop(0)
+
+    def _on_speech(self, frame, start):
+        if self.first_speech is None:
+            self.first_speech = start - len(self._pending) * self.frame_length
+            self.offset_map.add(0, self.first_speech)
+            self._emit_pending()
+        else:
+            self._flush_pause(start)
+        self._emit(frame)
+        self.last_speech = start + self.frame_length
+
+    def _emit_pending(self):
+        if self._pending:
+            self._emit(np.concatenate(self._pending))
+            self._pending = []
+
+    def _flush_pause(self, pause_end):
+        """Forwards held-back silence that turned out to be an internal pause"""
+        pause_length = len(self._pending) * self.frame_length
+        if self.max_pause is None or pause_length <= self.max_pause:
+            self._emit_pending()
+            return
+
+        # Long pause - keep a short gap (half from each end) and remember the jump
+        pause = np.concatenate(self._pending)
+        self._pending = []
+        head = self.pause_gap // 2
+        tail = self.pause_gap - head
+        self._emit(pause[:head])
+        self.offset_map.add(self._emitted, pause_end - tail)
+        self._emit(pause[len(pause) - tail:])
+        self.compressed_samples += pause_length - self.pause_gap
+
+    def _emit(self, samples):
+        if not len(samples):
+            return
+        self._emitted += len(samples)
+        if self.output is not None:
+            self.output.append(samples)
+        if self.sink is not None:
+            self.sink(samples)
+
+    def finish(self):
+        """Ends the stream: forwards the trailing padding and drops the rest"""
+        if self.finished:
+            return
+        self.finished = True
+        if self.first_speech is not None:
+            tail = self._pending[:self.padding_frames]
+            if tail:
+                tail_samples = np.concatenate(tail)
+                self._emit(tail_samples)
+                self.last_speech += len(tail_samples)
+        self._pending = []
+
+    def bounds(self):
+        """(start, end) sample offsets of the trimmed clip, or None when there is no speech"""
+        if not self.has_speech or self.first_speech is None:
+            return None
+        return self.first_speech, self.last_speech
+
+
+def _periodic_hann(length):
+    # Periodic Hann windows at 50% overlap sum to exactly one
+    return (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(length) / length)).astype(np.float32)
+
+
+def time_compress(samples, rate, factor, frame_ms=30, tolerance_ms=10):
+    """Pitch-preserving speed-up of mono int16 samples (WSOLA).
+
+    Frames are taken from the input every frame/2 * factor samples and
+    overlap-added every frame/2 samples; each frame is shifted by up to
+    tolerance_ms to the position that best continues the previous one, so
+    pitch periods line up instead of being stretched. Returns an int16 array
+    about len(samples) / factor long.
+    """
+    samples = np.asarray(samples, dtype=np.int16)
+    frame = max(int(rate * frame_ms / 1000) // 2 * 2, 32)
+    hop_out = frame // 2
+    hop_in = hop_out * factor
+    tolerance = int(rate * tolerance_ms / 1000)
+    if factor <= 1.0 or len(samples) < frame * 2:
+        return samples
+
+    # Padding keeps every search window inside the signal
+    x = np.pad(samples.astype(np.float32), (tolerance, frame + tolerance))
+    count = int((len(samples) - hop_out) / hop_in) + 1
+    positions = np.empty(count, dtype=np.int64)
+    positions[0] = tolerance
+    for k in range(1, count):
+        natural = positions[k - 1] + hop_out
+        ideal = int(round(k * hop_in)) + tolerance
+        template = x[natural:natural + frame]
+        region = x[ideal - tolerance:ideal + tolerance + frame]
+        correlation = np.correlate(region, template, mode='valid')
+        positions[k] = ideal - tolerance + int(np.argmax(correlation))
+
+    # Overlap-add of all windowed frames at once: first and second halves interleave
+    window = _periodic_hann(frame)
+    segments = x[positions[:, None] + np.arange(frame)] * window
+    halves = segments.reshape(count, 2, hop_out)
+    output = np.zeros((count + 1) * hop_out, dtype=np.float32)
+    output[:count * hop_out] += halves[:, 0, :].ravel()
+    output[hop_out:] += halves[:, 1, :].ravel()
+
+    # Undo the fade-in/out of the first and last half frame
+    norm = np.zeros_like(output)
+    norm[:count * hop_out] += np.tile(window[:hop_out], count)
+    norm[hop_out:] += np.tile(window[hop_out:], count)
+    output /= np.maximum(norm, 1e-3)
+
+    length = int(round(len(samples) / factor))
+    return np.clip(np.round(output[:length]), -32768, 32767).astype(np.int16)
+
+
+def _best_cut(energy_db, silent):
+    """Frame index to cut at: middle of the longest (latest on ties) silent run, else the quietest frame"""
+    if silent.any():
+        edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        lengths = (ends - starts)[::-1]
+        longest = len(lengths) - 1 - int(np.argmax(lengths))
+        return int((starts[longest] + ends[longest]) // 2)
+    return int(np.argmin(energy_db))
+
+
+def split_at_silences(samples, rate, max_segment_s=30.0, overlap_s=0.5, frame_ms=20,
+                      energy_threshold_db=-48.0):
+    """Splits a clip into (start, end) sample ranges for separate transcription.
+
+    Each cut is placed in the longest pause within the second half of the
+    segment window (or at the quietest frame when there is no pause), so
+    segments stay below max_segment_s plus the overlap. Every segment after
+    the first starts overlap_s before its cut, so a word split by the cut is
+    heard whole by one of the requests.
+    """
+    total = len(samples)
+    max_length = int(max_segment_s * rate)
+    if total <= max_length:
+        return [(0, total)]
+
+    frame_length = max(int(rate * frame_ms / 1000), 16)
+    energy_db, _ = frame_features(samples, frame_length)
+    silent = energy_db <= energy_threshold_db
+    overlap = int(overlap_s * rate)
+
+    cuts = []
+    start = 0
+    while total - start > max_length:
+        low = (start + max_length // 2) // frame_length
+        high = (start + max_length) // frame_length
+        frame = low + _best_cut(energy_db[low:high], silent[low:high])
+        cuts.append(frame * frame_length + frame_length // 2)
+        start = cuts[-1]
+
+    bounds = [0] + cuts + [total]
+    return [(max(bounds[i] - overlap, 0) if i else 0, bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def find_speech_bounds(samples, rate, block_size=8192, **gate_options):
+    """Runs the speech gate over a whole buffer; returns (start, end) or None"""
+    gate = SpeechGate(rate, **gate_options)
+    for offset in range(0, len(samples), block_size):
+        gate.feed(samples[offset:offset + block_size])
+    gate.finish()
+    return gate.bounds()
@@ -0,0 +1,106 @@
+import queue
+import threading
+
+import numpy as np
+import pyaudio
+
+# Cue name -> (frequency in Hz, duration in ms)
+CUES = {
+    "start": (1000, 200),  # Higher tone when recording starts
+    "stop": (200, 100),
+}
+
+
+def render_tone(rate, frequency, duration_ms, volume=0.3, fade_ms=5):
+    """Sine tone as mono int16 PCM bytes, with short fades so it does not click"""
+    count = int(rate * duration_ms / 1000)
+    tone = volume * np.sin(2.0 * np.pi * frequency * np.arange(count) / float(rate))
+    fade = min(int(rate * fade_ms / 1000), count // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade)
+        tone[:fade] *= ramp
+        tone[count - fade:] *= ramp[::-1]
+    return np.round(tone * 32767).astype(np.int16).tobytes()
+
+
+class NullCuePlayer:
+    """Cue player that plays nothing (headless runs, no output device)"""
+
+    def __init__(self, audio=None):
+        self.audio = audio
+
+    def play(self, name):
+        pass
+
+    def close(self):
+        pass
+
+
+class CuePlayer:
+    """Plays short cue sounds without blocking the caller.
+
+    The cues are rendered to PCM once at startup. play() only queues a
+    buffer; a background thread writes it to an output stream opened on the
+    shared PyAudio instance. The stream stays open between the start and
+    stop cue of a dictation and is closed after idle_close_s without cues.
+    """
+
+    def __init__(self, audio, rate=None, cues=CUES, idle_close_s=2.0):
+        self.audio = audio
+        if rate is None:
+            rate = int(audio.get_default_output_device_info()["defaultSampleRate"])
+        self.rate = rate
+        self.buffers = {name: render_tone(rate, frequency, duration_ms)
+                        for name, (frequency, duration_ms) in cues.items()}
+        self.idle_close_s = idle_close_s
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stream = None
+        self._thread = threading.Thread(target=self._run, name="CuePlayer", daemon=True)
+        self._thread.start()
+
+    def play(self, name):
+        """Queues a cue for playback and returns immediately"""
+        self._queue.put(self.buffers[name])
+
+    def close(self):
+        """Closes the output stream (e.g. before the PyAudio instance is replaced); the next cue reopens it"""
+        with self._lock:
+            self._close_stream()
+
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception as e:
+                print(f"Error closing the cue output stream: {str(e)}")
+            self._stream = None
+
+    def _run(self):
+        while True:
+            try:
+                data = self._queue.get(timeout=self.idle_close_s)
+            except queue.Empty:
+                self.close()
+                continue
+            with self._lock:
+                try:
+                    if self._stream is None:
+                        self._stream = self.audio.open(format=pyaudio.paInt16, channels=1,
+                                                       rate=self.rate, output=True)
+                    self._stream.write(data)
+                except Exception as e:
+                    print(f"Cue playback failed: {str(e)}")
+                    self._close_stream()
+
+
+def create_cue_player(audio):
+    """CuePlayer on the default output device, or a NullCuePlayer when there is none"""
+    if audio is None:
+        return NullCuePlayer()
+    try:
+        return CuePlayer(audio)
+    except Exception as e:
+        print(f"No audio output for cue sounds: {str(e)}")
+        return NullCuePlayer(audio)
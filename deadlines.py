@@ -0,0 +1,89 @@
+import threading
+
+
+class TranscriptionCancelled(Exception):
+    """Raised inside a transcription request that the user cancelled"""
+
+
+class StageTimeout(TimeoutError):
+    """A request stage (connect, upload, first byte) exceeded its deadline"""
+
+
+class CancelToken:
+    """Cooperative cancellation of one dictation's requests.
+
+    Blocking code checks cancelled (or calls check()) between steps, and
+    resources that can be released from another thread - an upload, an
+    asyncio task, the local model - register a callback that cancel()
+    runs at once. The token is shared by all requests of the dictation
+    (segments, hedges, retries).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error while cancelling: {str(e)}")
+
+    def add_callback(self, callback):
+        """Runs callback on cancel (at once if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        """Raises TranscriptionCancelled if the token was cancelled"""
+        if self._event.is_set():
+            raise TranscriptionCancelled()
+
+    def sleep(self, seconds):
+        """Waits seconds unless cancelled first; raises TranscriptionCancelled on cancel"""
+        if self._event.wait(seconds):
+            raise TranscriptionCancelled()
+
+
+class StageDeadlines:
+    """Time limits of the stages of one upload, scaled to its size.
+
+    connect: opening the connection (TCP and TLS).
+    upload: sending the whole body, allowing for min_upload_rate bytes/s.
+    first_byte: from the end of the upload to the first byte of the
+    response; the provider transcribes in that time, so it grows with the
+    length of the audio.
+    """
+
+    def __init__(self, connect, upload, first_byte):
+        self.connect = connect
+        self.upload = upload
+        self.first_byte = first_byte
+
+    @classmethod
+    def for_payload(cls, nbytes, audio_seconds, connect=5.0, min_upload_rate=32 * 1024, upload_margin=5.0,
+                    first_byte_base=10.0, first_byte_per_audio_second=0.5):
+        return cls(connect, upload_margin + nbytes / float(min_upload_rate),
+                   first_byte_base + audio_seconds * first_byte_per_audio_second)
+
+    @property
+    def total(self):
+        return self.connect + self.upload + self.first_byte
+
+    def __repr__(self):
+        return (f"connect {self.connect:.0f} s, upload {self.upload:.0f} s, "
+                f"first byte {self.first_byte:.0f} s")
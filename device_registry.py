@@ -0,0 +1,224 @@
+import os
+import sys
+import threading
+
+import pyaudio
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+def normalize_device_name(name):
+    """Fixes device names that PortAudio reports as latin1-decoded UTF-8"""
+    try:
+        return name.encode('latin1').decode('utf-8')
+    except (UnicodeDecodeError, UnicodeEncodeError):
+        return name
+
+
+def _windows_fingerprint():
+    """Cheap snapshot of the WinMM capture devices (no PortAudio involved)"""
+    import ctypes
+    from ctypes import wintypes
+
+    class WAVEINCAPSW(ctypes.Structure):
+        _fields_ = [
+            ("wMid", wintypes.WORD),
+            ("wPid", wintypes.WORD),
+            ("vDriverVersion", wintypes.UINT),
+            ("szPname", wintypes.WCHAR * 32),
+            ("dwFormats", wintypes.DWORD),
+            ("wChannels", wintypes.WORD),
+            ("wReserved1", wintypes.WORD),
+        ]
+
+    winmm = ctypes.windll.winmm
+    names = []
+    for i in range(winmm.waveInGetNumDevs()):
+        caps = WAVEINCAPSW()
+        if winmm.waveInGetDevCapsW(i, ctypes.byref(caps), ctypes.sizeof(caps)) == 0:
+            names.append(caps.szPname)
+    return tuple(names)
+
+
+def _linux_fingerprint():
+    """Snapshot of the ALSA cards and PCM nodes"""
+    with open("/proc/asound/cards", "r") as f:
+        cards = f.read()
+    nodes = tuple(sorted(os.listdir("/dev/snd"))) if os.path.isdir("/dev/snd") else ()
+    return cards, nodes
+
+
+def device_fingerprint():
+    """Returns a cheap, platform-specific snapshot of the audio devices, or None if unsupported"""
+    try:
+        if sys.platform == "win32":
+            return _windows_fingerprint()
+        if sys.platform.startswith("linux"):
+            return _linux_fingerprint()
+    except Exception as e:
+        print(f"Device fingerprint unavailable: {str(e)}")
+    return None
+
+
+class DeviceRegistry(QObject):
+    """Shared, cached view of the audio devices.
+
+    Owns the application-wide PyAudio instance, enumerates devices once and
+    indexes input devices by index and by normalized name. PortAudio only
+    sees new devices after a full re-initialisation, so hot-plug is detected
+    with a cheap OS-level fingerprint polled in the background and the shared
+    instance is re-initialised only while no recording is running.
+    """
+
+    devices_changed = pyqtSignal()
+    about_to_reinitialize = pyqtSignal()
+    _fingerprint_changed = pyqtSignal()
+
+    def __init__(self, audio_factory=pyaudio.PyAudio, watch_interval=3.0):
+        super().__init__()
+        self.audio_factory = audio_factory
+        self.audio = audio_factory()
+        self.watch_interval = watch_interval
+
+        # Callable returning True while the audio instance must not be replaced
+        self.is_busy = lambda: False
+
+        self._devices = {}
+        self._inputs = []
+        self._inputs_by_name = {}
+        self._default_input_index = None
+        self.refresh()
+
+        self._pending_reinitialize = False
+        self._retry_timer = QTimer(self)
+        self._retry_timer.setInterval(1000)
+        self._retry_timer.timeout.connect(self._retry_reinitialize)
+        self._fingerprint_changed.connect(self.request_reinitialize)
+
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+
+    def refresh(self):
+        """Re-reads the device list from the current PyAudio instance"""
+        devices = {}
+        inputs = []
+        inputs_by_name = {}
+
+        for i in range(self.audio.get_device_count()):
+            info = dict(self.audio.get_device_info_by_index(i))
+            info['display_name'] = normalize_device_name(info['name'])
+            devices[i] = info
+            if info['maxInputChannels'] > 0:
+                inputs.append(info)
+                # First device wins, matching the previous linear scans
+                inputs_by_name.setdefault(info['name'], info)
+                inputs_by_name.setdefault(info['display_name'], info)
+
+        try:
+            default_info = self.audio.get_default_input_device_info()
+            default_index = default_info['index'] if default_info['maxInputChannels'] > 0 else None
+        except Exception:
+            default_index = None
+
+        self._devices = devices
+        self._inputs = inputs
+        self._inputs_by_name = inputs_by_name
+        self._default_input_index = default_index
+
+    def input_devices(self):
+        """Returns the cached list of input devices"""
+        return list(self._inputs)
+
+    def has_input_devices(self):
+        return bool(self._inputs)
+
+    def get(self, index):
+        """Returns device info by index, or None"""
+        return self._devices.get(index)
+
+    def get_input(self, index):
+        """Returns device info by index if it is a valid input device, or None"""
+        info = self._devices.get(index)
+        if info and info['maxInputChannels'] > 0:
+            return info
+        return None
+
+    def find_input(self, name):
+        """Looks up an input device by raw or normalized name"""
+        return self._inputs_by_name.get(name)
+
+    def find_input_partial(self, name):
+        """Returns the first input device whose name contains the given text"""
+        for info in self._inputs:
+            if name in info['name'] or name in info['display_name']:
+                return info
+        return None
+
+    def default_input(self):
+        """Returns the default input device, or the first available one"""
+        if self._default_input_index is not None:
+            return self._devices[self._default_input_index]
+        return self._inputs[0] if self._inputs else None
+
+    def request_reinitialize(self):
+        """Re-initialises PortAudio now, or as soon as the registry is no longer busy"""
+        if self.is_busy():
+            self._pending_reinitialize = True
+            self._retry_timer.start()
+            return False
+        self.reinitialize()
+        return True
+
+    def reinitialize(self):
+        """Replaces the shared PyAudio instance so PortAudio rescans the devices"""
+        self._pending_reinitialize = False
+        self._retry_timer.stop()
+
+        # Owners of open streams close them here
+        self.about_to_reinitialize.emit()
+        try:
+            self.audio.terminate()
+        except Exception as e:
+            print(f"Error terminating PyAudio: {str(e)}")
+        self.audio = self.audio_factory()
+        self.refresh()
+        print(f"Audio devices rescanned: {len(self._inputs)} input device(s)")
+        self.devices_changed.emit()
+
+    def _retry_reinitialize(self):
+        if self._pending_reinitialize and not self.is_busy():
+            self.reinitialize()
+
+    def start_watching(self):
+        """Starts polling the OS device fingerprint in the background"""
+        if self._watch_thread is not None or device_fingerprint() is None:
+            return
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, name="DeviceWatcher", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self):
+        if self._watch_thread is not None:
+            self._watch_stop.set()
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def _watch_loop(self):
+        last = device_fingerprint()
+        while not self._watch_stop.wait(self.watch_interval):
+            current = device_fingerprint()
+            if current is not None and current != last:
+                last = current
+                # Queued to the GUI thread
+                self._fingerprint_changed.emit()
+
+    def terminate(self):
+        """Stops watching and releases PortAudio"""
+        self.stop_watching()
+        self._retry_timer.stop()
+        if self.audio:
+            try:
+                self.audio.terminate()
+                print("PyAudio zamknięty")
+            except Exception:
+                pass
+            self.audio = None
@@ -0,0 +1,51 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class DictationSequencer(QObject):
+    """Reorder buffer releasing the results of overlapping dictations in recording order.
+
+    Every recording opens a session with consecutive ids. Its transcription
+    may finish before that of an earlier recording (a shorter clip, a cache
+    hit, a faster provider); the result then waits here until all earlier
+    sessions are completed or dropped, and is emitted through released. A
+    dropped session (cancelled dictation) releases nothing and no longer
+    holds back the sessions after it. Used on the GUI thread only.
+    """
+
+    released = pyqtSignal(int, object)  # Numer sesji, wynik transkrypcji
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._next_session = 1
+        self._next_release = 1
+        self._results = {}  # Numer sesji -> wynik (None dla sesji porzuconej)
+
+    def open(self):
+        """Starts a session for a new recording; returns its id"""
+        session_id = self._next_session
+        self._next_session += 1
+        return session_id
+
+    @property
+    def pending(self):
+        """Number of sessions whose results have not been released yet"""
+        return self._next_session - self._next_release
+
+    def complete(self, session_id, result):
+        """Stores the session's result; releases it and any results waiting behind it once they are next"""
+        self._store(session_id, result)
+
+    def drop(self, session_id):
+        """Abandons the session; the results waiting behind it are released"""
+        self._store(session_id, None)
+
+    def _store(self, session_id, result):
+        if not self._next_release <= session_id < self._next_session or session_id in self._results:
+            return
+        self._results[session_id] = result
+        while self._next_release in self._results:
+            session_id = self._next_release
+            result = self._results.pop(session_id)
+            self._next_release += 1
+            if result is not None:
+                self.released.emit(session_id, result)
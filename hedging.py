@@ -0,0 +1,52 @@
+import asyncio
+
+
+def _succeeded(result):
+    return bool(result.get("success"))
+
+
+async def _outcome(task):
+    try:
+        return task.result()
+    except Exception as e:
+        return {"error": str(e), "success": False}
+
+
+async def hedge(primary, secondary, delay, accept=_succeeded):
+    """Runs primary() and, if it has not finished after delay seconds, a duplicate secondary().
+
+    primary and secondary are coroutine functions returning result dicts.
+    The first accepted result wins and the other request is cancelled; if
+    both fail, the primary's result is returned. A primary that answers
+    within the delay (successfully or not) is never hedged.
+
+    Returns (result, winner, hedged) with winner 0 for the primary and 1
+    for the secondary. Cancelling hedge() cancels both requests.
+    """
+    tasks = {}
+    try:
+        first = asyncio.ensure_future(primary())
+        tasks[first] = 0
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return await _outcome(first), 0, False
+
+        second = asyncio.ensure_future(secondary())
+        tasks[second] = 1
+        failed = {}
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = await _outcome(task)
+                if accept(result):
+                    return result, tasks[task], True
+                failed[tasks[task]] = result
+        return failed[0], 0, True
+    finally:
+        # The loser's (or, on cancel, every) connection is closed, aborting its upload or response
+        unfinished = [task for task in tasks if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
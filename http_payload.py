@@ -0,0 +1,81 @@
+import time
+import uuid
+
+from deadlines import StageTimeout
+
+
+class MultipartStream:
+    """File-like multipart/form-data body assembled from in-memory chunks.
+
+    requests sends objects with read() and __len__ as a streamed body with a
+    Content-Length, so the encoded audio goes from its buffers to the socket
+    block by block without being copied into one request body.
+    """
+
+    def __init__(self, fields, boundary=None):
+        """fields: list of (name, value) for text fields or (name, EncodedAudio) for files"""
+        self.boundary = boundary or uuid.uuid4().hex
+        self._parts = []
+        for name, value in fields:
+            if hasattr(value, 'chunks'):
+                disposition = (
+                    f'--{self.boundary}\r\n'
+                    f'Content-Disposition: form-data; name="{name}"; filename="{value.filename}"\r\n'
+                    f'Content-Type: {value.mime_type}\r\n\r\n'
+                )
+                self._parts.append(disposition.encode('utf-8'))
+                self._parts.extend(memoryview(chunk).cast('B') for chunk in value.chunks)
+                self._parts.append(b'\r\n')
+            else:
+                text = (
+                    f'--{self.boundary}\r\n'
+                    f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                    f'{value}\r\n'
+                )
+                self._parts.append(text.encode('utf-8'))
+        self._parts.append(f'--{self.boundary}--\r\n'.encode('utf-8'))
+        self._length = sum(len(part) for part in self._parts)
+        # Optional limits checked on every block: seconds from reset() to send the body, and a CancelToken
+        self.time_limit = None
+        self.cancel_token = None
+        self.reset()
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self._length
+
+    def reset(self):
+        """Rewinds the body so it can be sent again (e.g. on retry); the time limit starts now"""
+        self._part_index = 0
+        self._offset = 0
+        self._deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+
+    def read(self, size=-1):
+        """Returns the next block; blocks never span two parts, so no copy is needed"""
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise StageTimeout(f"Upload did not finish within {self.time_limit:.0f} s")
+        while self._part_index < len(self._parts):
+            part = self._parts[self._part_index]
+            remaining = len(part) - self._offset
+            if remaining <= 0:
+                self._part_index += 1
+                self._offset = 0
+                continue
+            count = remaining if size is None or size < 0 else min(size, remaining)
+            block = part[self._offset:self._offset + count]
+            self._offset += count
+            return block
+        return b''
+
+    def __iter__(self):
+        self.reset()
+        while True:
+            block = self.read(65536)
+            if not block:
+                break
+            yield block
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def connect_retry():
+    """Retries only failures to connect: the request was never sent, so a POST is safe to repeat"""
+    return Retry(total=2, connect=2, read=0, status=0, other=0, redirect=0, backoff_factor=0.1,
+                 raise_on_status=False)
+
+
+class SessionPool:
+    """One persistent requests.Session per provider.
+
+    Connections are kept alive and reused between dictations, which saves
+    the DNS lookup, TCP and TLS handshakes (100-300 ms) of a fresh
+    connection. Each session pools up to pool_size connections for parallel
+    segment uploads. prewarm() opens or revalidates the connection in the
+    background while the user is still speaking.
+    """
+
+    def __init__(self, pool_size=8, prewarm_interval=2.0):
+        self.pool_size = pool_size
+        self.prewarm_interval = prewarm_interval
+        self._sessions = {}
+        self._last_prewarm = {}
+        self._lock = threading.Lock()
+
+    def session(self, provider):
+        """Returns the provider's session, creating it on first use"""
+        with self._lock:
+            session = self._sessions.get(provider)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=connect_retry())
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[provider] = session
+            return session
+
+    def prewarm(self, provider, url):
+        """Opens or revalidates a pooled connection to the provider in a background thread.
+
+        A HEAD request goes through the handshakes (or finds that a kept-alive
+        connection is still usable) and leaves the connection in the pool for
+        the upload. Calls within prewarm_interval of the previous one are skipped.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prewarm.get(provider, float("-inf")) < self.prewarm_interval:
+                return
+            self._last_prewarm[provider] = now
+        threading.Thread(target=self._prewarm, args=(provider, url), name="SessionPrewarm", daemon=True).start()
+
+    def _prewarm(self, provider, url):
+        started = time.perf_counter()
+        try:
+            # The status does not matter (endpoints answer 401/405) - only the open connection does
+            self.session(provider).head(url, timeout=5)
+            print(f"Connection to {provider} ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except Exception as e:
+            print(f"Could not pre-warm the connection to {provider}: {str(e)}")
+
+    def close(self):
+        """Closes all sessions and their pooled connections"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
@@ -0,0 +1,301 @@
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from deadlines import TranscriptionCancelled
+from resampler import StreamResampler
+from transcription_backends import TranscriptionBackend
+
+MODEL_RATE = 16000  # Whisper models take 16 kHz mono audio
+FAKE_MODEL_FILE = "fake_model.json"
+
+
+class FakeWhisperModel:
+    """Tiny stand-in model for tests and pipeline benchmarks.
+
+    Used when the model directory holds a fake_model.json, e.g.
+    {"words": ["hello", "world"], "seconds_per_segment": 1.0, "delay": 0.01}.
+    Emits one segment per seconds_per_segment of audio, cycling through the
+    words, after sleeping delay seconds per segment.
+    """
+
+    def __init__(self, config):
+        self.words = config.get("words", ["test"])
+        self.seconds_per_segment = config.get("seconds_per_segment", 1.0)
+        self.delay = config.get("delay", 0.0)
+
+    def transcribe(self, audio):
+        duration = len(audio) / float(MODEL_RATE)
+        count = max(1, int(np.ceil(duration / self.seconds_per_segment)))
+        words = itertools.cycle(self.words)
+        for index in range(count):
+            time.sleep(self.delay)
+            start = index * self.seconds_per_segment
+            yield {"start": start, "end": min(start + self.seconds_per_segment, duration), "text": next(words)}
+
+
+class FasterWhisperModel:
+    """CTranslate2 Whisper model (faster-whisper) on the CPU, optionally int8-quantized"""
+
+    def __init__(self, model_dir, quantize=True):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_dir, device="cpu", compute_type="int8" if quantize else "float32")
+
+    def transcribe(self, audio):
+        # Wyszukiwanie zachłanne - na CPU znacznie szybsze od beam search przy podobnej dokładności dyktowania
+        segments, _ = self.model.transcribe(audio, beam_size=1)
+        for segment in segments:
+            yield {"start": segment.start, "end": segment.end, "text": segment.text.strip()}
+
+
+def load_model(model_dir, quantize=True):
+    """Loads the model from model_dir: the fake model if it has a fake_model.json, otherwise faster-whisper"""
+    fake_config = os.path.join(model_dir, FAKE_MODEL_FILE)
+    if os.path.exists(fake_config):
+        with open(fake_config, 'r', encoding='utf-8') as f:
+            return FakeWhisperModel(json.load(f))
+    return FasterWhisperModel(model_dir, quantize)
+
+
+def _worker_main(conn, cancel, model_dir, quantize):
+    """Worker process: loads the model once, then serves transcription requests until stopped"""
+    started = time.perf_counter()
+    try:
+        model = load_model(model_dir, quantize)
+    except Exception as e:
+        conn.send(("error", None, f"Could not load the model from {model_dir}: {str(e)}"))
+        return
+    conn.send(("ready", time.perf_counter() - started))
+
+    block = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message[0] == "stop":
+            break
+        _, request_id, block_name, count, rate = message
+        try:
+            if block is None or block.name != block_name:
+                if block is not None:
+                    block.close()
+                # Proces startuje przez spawn i dzieli resource tracker z klientem, który zwalnia blok
+                block = shared_memory.SharedMemory(name=block_name)
+            samples = np.ndarray((count,), dtype=np.int16, buffer=block.buf)
+            if rate != MODEL_RATE:
+                samples = StreamResampler(rate, MODEL_RATE).process(samples)
+            audio = samples.astype(np.float32) / 32768.0
+            del samples
+
+            text = []
+            segments = []
+            for segment in model.transcribe(audio):
+                if cancel.value == request_id:
+                    break
+                segments.append(segment)
+                text.append(segment["text"])
+                conn.send(("partial", request_id, " ".join(text)))
+            if cancel.value == request_id:
+                conn.send(("cancelled", request_id, None))
+            else:
+                conn.send(("result", request_id, {"text": " ".join(text), "segments": segments}))
+        except Exception as e:
+            conn.send(("error", request_id, str(e)))
+    if block is not None:
+        block.close()
+
+
+class LocalWhisperWorker:
+    """Client of a persistent model worker process.
+
+    The model is loaded once in a separate process, so it stays warm
+    between dictations and its CPU-heavy inference does not compete with
+    the GUI for the interpreter. PCM goes to the worker through a shared
+    memory block (grown as needed and reused), only the small request and
+    the text travel through the pipe. Requests are served one at a time.
+    """
+
+    def __init__(self, model_dir, quantize=True):
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.load_seconds = None
+        self._process = None
+        self._conn = None
+        self._ready = False
+        self._block = None
+        self._cancel = None
+        self._request_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker process (the model loads in the background); no-op if it is running"""
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._cancel = context.Value('q', 0)  # Numer anulowanego żądania
+        self._process = context.Process(target=_worker_main,
+                                        args=(child_conn, self._cancel, self.model_dir, self.quantize),
+                                        name="LocalWhisperWorker", daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._ready = False
+
+    def _receive(self, timeout, cancel_token=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._conn.poll(0.1):
+            if cancel_token is not None and cancel_token.cancelled:
+                # Odpowiedź anulowanego żądania zostanie pominięta przy następnym (inny numer)
+                raise TranscriptionCancelled()
+            if not self._process.is_alive():
+                self._process = None
+                raise RuntimeError("The local model worker stopped unexpectedly")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError("The local model did not answer in time")
+        return self._conn.recv()
+
+    def _share(self, samples):
+        """Copies the samples into the shared memory block, growing it when needed"""
+        if self._block is None or self._block.size < samples.nbytes:
+            if self._block is not None:
+                self._block.close()
+                self._block.unlink()
+            self._block = shared_memory.SharedMemory(create=True, size=max(samples.nbytes, 1 << 20))
+        view = np.ndarray(samples.shape, dtype=np.int16, buffer=self._block.buf)
+        view[:] = samples
+        del view
+
+    def transcribe(self, samples, rate, on_partial=None, timeout=None, cancel_token=None):
+        """Transcribes mono int16 samples; on_partial(text) receives the hypothesis as it grows.
+
+        Returns {"text", "segments"}; raises RuntimeError on a worker failure
+        and TranscriptionCancelled when cancel_token is cancelled (the worker
+        stops after the segment it is decoding and keeps the model loaded).
+        """
+        with self._lock:
+            self._start()
+            while not self._ready:
+                message = self._receive(timeout, cancel_token)
+                if message[0] == "error":
+                    self._process = None
+                    raise RuntimeError(message[2])
+                self._ready = message[0] == "ready"
+                self.load_seconds = message[1]
+                print(f"Local model loaded in {self.load_seconds:.1f} s")
+
+            self._share(samples)
+            request_id = next(self._request_ids)
+            if cancel_token is not None:
+                cancel_token.add_callback(lambda: setattr(self._cancel, "value", request_id))
+            self._conn.send(("transcribe", request_id, self._block.name, len(samples), rate))
+            while True:
+                kind, message_id, content = self._receive(timeout, cancel_token)
+                if message_id != request_id:
+                    continue
+                if kind == "partial":
+                    if on_partial is not None:
+                        on_partial(content)
+                elif kind == "result":
+                    return content
+                elif kind == "cancelled":
+                    raise TranscriptionCancelled()
+                else:
+                    raise RuntimeError(content)
+
+    def close(self):
+        """Stops the worker process and frees the shared memory"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                try:
+                    self._conn.send(("stop",))
+                    self._process.join(timeout=2)
+                except (OSError, ValueError):
+                    pass
+                if self._process.is_alive():
+                    self._process.terminate()
+            self._process = None
+            if self._block is not None:
+                self._block.close()
+                self._block.unlink()
+                self._block = None
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Whisper-compatible model running on this machine's CPU.
+
+    Takes PCM directly instead of an encoded upload, so the pipeline skips
+    encoding, uploading and segmenting for it.
+    """
+
+    name = "local"
+    label = "Local model (CPU)"
+    requires_api_key = False
+    codecs = ()
+    supports_chunked = False
+    local = True
+    sample_rate = MODEL_RATE
+
+    def __init__(self, model_dir="", quantize=True):
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.worker = None
+
+    def configure(self, model_dir, quantize=True):
+        """Sets the model directory; a running worker with other settings is stopped"""
+        model_dir = model_dir.strip()
+        if (model_dir, quantize) != (self.model_dir, self.quantize):
+            self.close()
+        self.model_dir = model_dir
+        self.quantize = quantize
+
+    def is_usable(self, api_key):
+        return bool(self.model_dir) and os.path.isdir(self.model_dir)
+
+    def cache_identity(self):
+        return f"{self.name}|{os.path.abspath(self.model_dir)}|int8={self.quantize}"
+
+    def warm_up(self):
+        """Starts the worker so the model is loaded before the first dictation"""
+        if not self.is_usable(""):
+            return
+        if self.worker is None:
+            self.worker = LocalWhisperWorker(self.model_dir, self.quantize)
+        self.worker.start()
+
+    def transcribe(self, pcm_buffer, duration, on_partial=None, cancel_token=None):
+        """Transcribes a mono PCMBuffer in the worker process; returns a transcription result"""
+        try:
+            self.warm_up()
+            started = time.perf_counter()
+            result = self.worker.transcribe(pcm_buffer.samples(), pcm_buffer.rate, on_partial,
+                                            cancel_token=cancel_token)
+            print(f"Local transcription: {(time.perf_counter() - started) * 1000:.0f} ms")
+            return {
+                "text": result["text"],
+                "segments": result["segments"],
+                "duration": duration,
+                "success": True
+            }
+        except TranscriptionCancelled:
+            return {"error": "Transkrypcja anulowana", "success": False, "cancelled": True}
+        except Exception as e:
+            return {
+                "error": f"Błąd lokalnego modelu: {str(e)}",
+                "success": False
+            }
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+class PCMBuffer:
+    """Growable, contiguous int16 PCM buffer.
+
+    Samples live in a single preallocated NumPy array that grows by doubling,
+    so appending is amortized O(1) and no final join is needed. Level
+    metering, trimming, encoding and upload all read zero-copy views of the
+    same memory via samples() and memoryview().
+    """
+
+    def __init__(self, rate=8000, channels=1, initial_seconds=10.0):
+        self.rate = rate
+        self.channels = channels
+        self.sample_width = 2
+        capacity = max(int(rate * channels * initial_seconds), 1024)
+        self._data = np.empty(capacity, dtype=np.int16)
+        self._length = 0
+
+    def __len__(self):
+        """Number of samples (all channels) in the buffer"""
+        return self._length
+
+    @property
+    def nbytes(self):
+        return self._length * self.sample_width
+
+    @property
+    def frame_count(self):
+        return self._length // self.channels
+
+    @property
+    def duration(self):
+        """Length of the buffered audio in seconds"""
+        return self.frame_count / float(self.rate)
+
+    def reserve(self, samples):
+        """Ensures room for at least the given number of additional samples"""
+        required = self._length + samples
+        if required <= len(self._data):
+            return
+        capacity = len(self._data)
+        while capacity < required:
+            capacity *= 2
+        grown = np.empty(capacity, dtype=np.int16)
+        grown[:self._length] = self._data[:self._length]
+        self._data = grown
+
+    def append(self, data):
+        """Appends raw int16 PCM (bytes-like or NumPy array) to the buffer"""
+        if isinstance(data, np.ndarray):
+            samples = data.astype(np.int16, copy=False).ravel()
+        else:
+            samples = np.frombuffer(data, dtype=np.int16)
+        count = len(samples)
+        if count == 0:
+            return
+        self.reserve(count)
+        self._data[self._length:self._length + count] = samples
+        self._length += count
+
+    def samples(self):
+        """Zero-copy int16 view of the buffered samples.
+
+        The view is only valid until the next append that grows the buffer.
+        """
+        return self._data[:self._length]
+
+    def memoryview(self):
+        """Zero-copy byte view of the buffered PCM"""
+        return memoryview(self.samples()).cast('B')
+
+    @classmethod
+    def from_samples(cls, samples, rate, channels=1):
+        """Wraps an existing int16 array without copying"""
+        buffer = cls.__new__(cls)
+        buffer.rate = rate
+        buffer.channels = channels
+        buffer.sample_width = 2
+        buffer._data = np.ascontiguousarray(samples, dtype=np.int16)
+        buffer._length = len(buffer._data)
+        return buffer
+
+    def slice(self, start, end):
+        """Returns a PCMBuffer viewing samples[start:end] of this one without copying"""
+        view = PCMBuffer.__new__(PCMBuffer)
+        view.rate = self.rate
+        view.channels = self.channels
+        view.sample_width = self.sample_width
+        view._data = self._data[start:end]
+        view._length = len(view._data)
+        return view
+
+    def clear(self):
+        """Empties the buffer, keeping the allocated capacity"""
+        self._length = 0
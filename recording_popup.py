@@ -1,26 +1,55 @@
+import math
+import time
+
+import numpy as np
 from PyQt6.QtWidgets import (
     QWidget, QLabel, QVBoxLayout, QHBoxLayout, QFrame, 
-    QGraphicsDropShadowEffect, QApplication
+    QGraphicsDropShadowEffect, QGraphicsScene, QApplication
 )
-from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QTimer
-from PyQt6.QtGui import QFont, QColor, QPainter, QPainterPath, QBrush
+from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QTimer, QPointF, QRectF
+from PyQt6.QtGui import QFont, QColor, QPainter, QPainterPath, QBrush, QPolygonF, QPen, QPixmap
+
+
+def render_drop_shadow(size, rect, radius=12, blur_radius=20, color=QColor(0, 0, 0, 50), offset=(0, 4)):
+    """Renders a rounded rectangle with a drop shadow into a transparent pixmap once.
+
+    A live QGraphicsDropShadowEffect re-blurs the whole frame on every
+    repaint of any child, which makes animated children expensive.
+    """
+    scene = QGraphicsScene(0, 0, size.width(), size.height())
+    path = QPainterPath()
+    path.addRoundedRect(QRectF(rect), radius, radius)
+    item = scene.addPath(path, QPen(Qt.PenStyle.NoPen), QBrush(QColor("#FFFFFF")))
+    effect = QGraphicsDropShadowEffect()
+    effect.setBlurRadius(blur_radius)
+    effect.setColor(color)
+    effect.setOffset(*offset)
+    item.setGraphicsEffect(effect)
+
+    pixmap = QPixmap(size)
+    pixmap.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(pixmap)
+    scene.render(painter, QRectF(pixmap.rect()), scene.sceneRect())
+    painter.end()
+    return pixmap
 
 
 class ModernFrame(QFrame):
     """Custom frame with rounded corners and shadow effect"""
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, shadow=True):
         super().__init__(parent)
         self.setObjectName("modernFrame")
         
         # Set background transparency
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         
-        # Add shadow effect
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(20)
-        shadow.setColor(QColor(0, 0, 0, 50))
-        shadow.setOffset(0, 4)
-        self.setGraphicsEffect(shadow)
+        # Add shadow effect (owners with animated content paint a cached shadow instead)
+        if shadow:
+            shadow_effect = QGraphicsDropShadowEffect(self)
+            shadow_effect.setBlurRadius(20)
+            shadow_effect.setColor(QColor(0, 0, 0, 50))
+            shadow_effect.setOffset(0, 4)
+            self.setGraphicsEffect(shadow_effect)
         
         self.setStyleSheet("""
             #modernFrame {
@@ -42,6 +71,179 @@ class ModernFrame(QFrame):
         painter.fillPath(path, QBrush(QColor("#FFFFFF")))
 
 
+def _polygon_view(polygon):
+    """(n, 2) float64 NumPy view of a QPolygonF's points, or None if the binding does not expose them"""
+    try:
+        pointer = polygon.data()
+        pointer.setsize(len(polygon) * 2 * 8)
+        return np.frombuffer(pointer, dtype=np.float64).reshape(-1, 2)
+    except Exception:
+        return None
+
+
+class LevelMeter(QWidget):
+    """Live RMS/peak meter with a scrolling waveform envelope.
+
+    A throttled timer reads only the samples recorded since the previous
+    tick and reduces them to one RMS/peak column with NumPy. The envelope
+    lives in a preallocated QPolygonF whose coordinates are written through
+    a NumPy view, so repaints only draw one polygon and two rectangles. The
+    debug overlay shows the frame rate, the meter's own CPU share (tick +
+    paint time) and the process CPU use.
+
+    The meter paints an opaque background, so its repaints do not require
+    the widgets underneath to be repainted.
+    """
+
+    FLOOR_DB = -60.0
+    HEIGHT = 44
+
+    def __init__(self, parent=None, columns=120, interval_ms=33):
+        super().__init__(parent)
+        self.setFixedHeight(self.HEIGHT)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.columns = columns
+        self.interval_ms = interval_ms
+        self.level_source = None
+        self.debug_overlay = False
+
+        self._position = 0
+        self._envelope = np.zeros(columns, dtype=np.float64)  # Circular history of peaks (0..1)
+        self._head = 0
+        self._ordered = np.empty(columns, dtype=np.float64)
+        self._half = np.empty(columns, dtype=np.float64)
+        self.rms = 0.0
+        self.peak = 0.0
+        self.peak_hold = 0.0
+
+        # Top edge left to right, then bottom edge right to left
+        self._polygon = QPolygonF()
+        self._polygon.fill(QPointF(), columns * 2)
+        self._points = _polygon_view(self._polygon)
+        self._layout_points()
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.tick)
+
+        # Debug statistics
+        self._busy_seconds = 0.0
+        self._frames = 0
+        self._stats_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self.fps = 0.0
+        self.meter_cpu = 0.0
+        self.process_cpu = 0.0
+
+    def start(self):
+        self._position = 0
+        self._envelope[:] = 0.0
+        self._head = 0
+        self.rms = self.peak = self.peak_hold = 0.0
+        self._reset_stats()
+        self._timer.start(self.interval_ms)
+
+    def stop(self):
+        self._timer.stop()
+
+    def _reset_stats(self):
+        self._busy_seconds = 0.0
+        self._frames = 0
+        self._stats_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+
+    def _layout_points(self):
+        """Sets the fixed x coordinates of the envelope points for the current width"""
+        width = max(self.width() - 2, 1)
+        x = np.linspace(1, width, self.columns)
+        if self._points is not None:
+            self._points[:self.columns, 0] = x
+            self._points[self.columns:, 0] = x[::-1]
+        self._x = x
+
+    def resizeEvent(self, event):
+        self._layout_points()
+        super().resizeEvent(event)
+
+    def tick(self):
+        """Reduces the newly recorded samples to one meter column"""
+        started = time.perf_counter()
+        if self.level_source is not None:
+            samples, self._position = self.level_source(self._position)
+            if len(samples):
+                peak = max(int(samples.max()), -int(samples.min())) / 32768.0
+                rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float32)))) / 32768.0
+            else:
+                peak = rms = 0.0
+            self.peak = peak
+            self.rms = rms
+            self.peak_hold = max(peak, self.peak_hold * 0.95)
+            self._envelope[self._head] = self._to_meter(peak)
+            self._head = (self._head + 1) % self.columns
+        self._busy_seconds += time.perf_counter() - started
+        self.update()
+
+    def _to_meter(self, level):
+        """Maps a linear level to 0..1 on a dB scale"""
+        if level <= 0.0:
+            return 0.0
+        return min(max(1.0 - 20.0 * math.log10(level) / self.FLOOR_DB, 0.0), 1.0)
+
+    def paintEvent(self, event):
+        started = time.perf_counter()
+        painter = QPainter(self)
+        width = self.width()
+        painter.fillRect(self.rect(), QColor("#FFFFFF"))
+        wave_height = self.height() - 10
+        middle = wave_height / 2.0
+
+        # Waveform envelope, oldest column on the left
+        ordered = self._ordered
+        tail = self.columns - self._head
+        ordered[:tail] = self._envelope[self._head:]
+        ordered[tail:] = self._envelope[:self._head]
+        half = np.multiply(ordered, middle - 1, out=self._half)
+        if self._points is not None:
+            np.subtract(middle, half, out=self._points[:self.columns, 1])
+            np.add(middle, half[::-1], out=self._points[self.columns:, 1])
+            polygon = self._polygon
+        else:
+            polygon = QPolygonF([QPointF(x, middle - h) for x, h in zip(self._x, half)] +
+                                [QPointF(x, middle + h) for x, h in zip(self._x[::-1], half[::-1])])
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#007BFF"))
+        painter.drawPolygon(polygon)
+
+        # RMS bar with a peak-hold marker; red when the input is close to clipping
+        bar_top = wave_height + 4
+        painter.fillRect(QRectF(0, bar_top, width, 6), QColor("#E9ECEF"))
+        rms_width = self._to_meter(self.rms) * width
+        painter.fillRect(QRectF(0, bar_top, rms_width, 6), QColor("#DC3545" if self.peak >= 0.99 else "#28A745"))
+        peak_x = self._to_meter(self.peak_hold) * width
+        painter.setPen(QPen(QColor("#212529"), 2))
+        painter.drawLine(QPointF(peak_x, bar_top), QPointF(peak_x, bar_top + 6))
+
+        if self.debug_overlay:
+            painter.setPen(QColor("#6C757D"))
+            painter.setFont(QFont("Segoe UI", 7))
+            painter.drawText(QRectF(0, 0, width, 12), Qt.AlignmentFlag.AlignRight,
+                             f"{self.fps:.0f} fps | meter {self.meter_cpu:.2f}% | process {self.process_cpu:.1f}%")
+        painter.end()
+
+        self._busy_seconds += time.perf_counter() - started
+        self._frames += 1
+        self._update_stats()
+
+    def _update_stats(self):
+        """Refreshes the overlay figures about once per second"""
+        elapsed = time.perf_counter() - self._stats_started
+        if elapsed < 1.0:
+            return
+        self.fps = self._frames / elapsed
+        self.meter_cpu = 100.0 * self._busy_seconds / elapsed
+        self.process_cpu = 100.0 * (time.process_time() - self._cpu_started) / elapsed
+        self._reset_stats()
+
+
 class RecordingPopup(QWidget):
     """Modern recording popup that matches the main UI style"""
     
@@ -66,8 +268,9 @@ class RecordingPopup(QWidget):
         layout = QVBoxLayout(self)
         layout.setContentsMargins(10, 10, 10, 10)
         
-        # Container with modern style
-        self.container = ModernFrame()
+        # Container with modern style; its shadow is painted from a cache (see paintEvent)
+        self.container = ModernFrame(shadow=False)
+        self._shadow_pixmap = None
         container_layout = QVBoxLayout(self.container)
         container_layout.setContentsMargins(20, 15, 20, 15)
         container_layout.setSpacing(10)
@@ -101,6 +304,10 @@ class RecordingPopup(QWidget):
         container_layout.addLayout(indicator_layout)
         container_layout.addWidget(self.timer_label)
         
+        # Live input level and waveform
+        self.level_meter = LevelMeter()
+        container_layout.addWidget(self.level_meter)
+        
         # Information label
         self.info_label = QLabel("Release hotkey to stop recording")
         self.info_label.setFont(QFont("Segoe UI", 10))
@@ -121,8 +328,8 @@ class RecordingPopup(QWidget):
         container_layout.addWidget(self.processing_indicator)
         
         layout.addWidget(self.container)
-        # Increase width from 240 to 280 and height from 160 to 180 to accommodate text better
-        self.setFixedSize(280, 180)
+        # Increase width from 240 to 280 and height from 160 to 230 to fit the text and level meter
+        self.setFixedSize(280, 230)
         
         # Center on screen
         self.center_on_screen()
@@ -174,6 +381,22 @@ class RecordingPopup(QWidget):
         self.processing_rotation = (self.processing_rotation + 1) % len(symbols)
         self.processing_indicator.setText(symbols[self.processing_rotation])
     
+    def paintEvent(self, event):
+        """Draws the container's drop shadow from a pixmap rendered once per size"""
+        if self._shadow_pixmap is None or self._shadow_pixmap.size() != self.size():
+            self._shadow_pixmap = render_drop_shadow(self.size(), self.container.geometry())
+        painter = QPainter(self)
+        painter.drawPixmap(event.rect(), self._shadow_pixmap, event.rect())
+        painter.end()
+    
+    def set_level_source(self, level_source):
+        """Sets the callable (position) -> (new samples, new position) read by the level meter"""
+        self.level_meter.level_source = level_source
+    
+    def set_debug_overlay(self, enabled):
+        """Shows frame rate and CPU use of the level meter"""
+        self.level_meter.debug_overlay = enabled
+    
     def update_timer(self, seconds):
         """Update the displayed recording time"""
         minutes = seconds // 60
@@ -187,6 +410,7 @@ class RecordingPopup(QWidget):
         self.info_label.setText("Release hotkey to stop recording")
         self.record_indicator.show()
         self.processing_indicator.hide()
+        self.level_meter.show()
         
         # Show popup immediately
         self.setWindowOpacity(1.0)
@@ -195,18 +419,29 @@ class RecordingPopup(QWidget):
         
         # Start pulse animation
         self.pulse_timer.start(800)
+        
+        # Start the live level meter
+        self.level_meter.start()
     
     def show_processing(self):
         """Show the processing state"""
         self.record_indicator.hide()
+        self.level_meter.stop()
+        self.level_meter.hide()
         self.processing_indicator.show()
         self.status_label.setText("Processing")
         self.info_label.setText("Transcribing audio...")
         self.processing_timer.start(150)
         QApplication.processEvents()
     
+    def show_partial(self, text):
+        """Shows the growing hypothesis of a local transcription"""
+        # Końcówka tekstu - etykieta ma miejsce na kilka linii
+        self.info_label.setText(text if len(text) <= 90 else "…" + text[-89:])
+    
     def hide_popup(self):
         """Hide the popup and stop all animations"""
         self.pulse_timer.stop()
         self.processing_timer.stop()
+        self.level_meter.stop()
         self.hide()
\ No newline at end of file
@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+
+
+def design_lowpass(length, cutoff, beta=8.0):
+    """Kaiser-windowed sinc low-pass FIR; cutoff in cycles per sample"""
+    n = np.arange(length) - (length - 1) / 2.0
+    return 2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.kaiser(length, beta)
+
+
+class StreamResampler:
+    """Blockwise polyphase resampler with channel downmix for int16 PCM.
+
+    Converts interleaved int16 audio at the device's native rate and channel
+    count to mono at the target rate. The rate ratio is reduced to up/down;
+    each output sample is one row of a (phase x taps) filter bank dotted with
+    the matching input window. All windows of a block are gathered and
+    filtered in one vectorized pass. Filter history carries over between
+    blocks, and the work arrays are preallocated, so steady-state blocks do
+    not allocate.
+    """
+
+    def __init__(self, in_rate, out_rate, in_channels=1, zero_crossings=8):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.in_channels = in_channels
+        divisor = math.gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // divisor
+        self.down = self.in_rate // divisor
+        self.passthrough = self.up == self.down
+
+        # Longer filters when decimating, so the transition band stays narrow at the output rate
+        self.taps = int(math.ceil(2 * zero_crossings * max(1.0, self.down / float(self.up))))
+        if self.passthrough:
+            self.taps = 1
+        prototype = design_lowpass(self.taps * self.up, 0.45 / max(self.up, self.down))
+        prototype *= self.up / prototype.sum()
+        # bank[phase, j] weights input sample k - j for output phase `phase`
+        self.bank = prototype.reshape(self.taps, self.up).T.astype(np.float32).copy()
+        self._offsets = (self.taps - 1) - np.arange(self.taps)
+
+        self._capacity = 0
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._t = 0  # Position of the next output, in 1/up input samples from the block start
+        self._reserve(4096)
+
+    def _reserve(self, frames):
+        """Grows the work arrays to handle blocks of the given number of input frames"""
+        if frames <= self._capacity:
+            return
+        self._capacity = frames
+        outputs = frames * self.up // self.down + 2
+        history = self.taps - 1
+        self._input = np.zeros(history + frames, dtype=np.float32)
+        self._input[:history] = self._history
+        self._history = self._input[:history]
+        self._positions = np.empty(outputs, dtype=np.int64)
+        self._steps = np.arange(outputs, dtype=np.int64) * self.down
+        self._phases = np.empty(outputs, dtype=np.int64)
+        self._indices = np.empty((outputs, self.taps), dtype=np.int64)
+        self._windows = np.empty((outputs, self.taps), dtype=np.float32)
+        self._coefficients = np.empty((outputs, self.taps), dtype=np.float32)
+        self._mixed = np.empty(outputs, dtype=np.float32)
+        self._output = np.empty(max(outputs, frames), dtype=np.int16)
+
+    def reset(self):
+        """Forgets the filter history (call on a discontinuity in the input)"""
+        self._history[:] = 0
+        self._t = 0
+
+    def process(self, data):
+        """Converts a block of interleaved int16 PCM (bytes-like or array).
+
+        Returns mono int16 samples at out_rate as a view that stays valid
+        until the next call.
+        """
+        samples = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.int16)
+        frames = len(samples) // self.in_channels
+        if frames == 0:
+            return self._output[:0]
+        if self.passthrough and self.in_channels == 1:
+            return samples[:frames]
+
+        self._reserve(frames)
+        history = self.taps - 1
+        block = self._input[history:history + frames]
+        if self.in_channels == 1:
+            np.copyto(block, samples[:frames], casting='unsafe')
+        else:
+            np.mean(samples[:frames * self.in_channels].reshape(frames, self.in_channels), axis=1,
+                    dtype=np.float32, out=block)
+
+        if self.passthrough:
+            count = frames
+            mixed = block
+        else:
+            total = frames * self.up
+            count = max(0, -(-(total - self._t) // self.down))
+            positions = self._positions[:count]
+            np.add(self._steps[:count], self._t, out=positions)
+            phases = self._phases[:count]
+            np.remainder(positions, self.up, out=phases)
+            np.floor_divide(positions, self.up, out=positions)
+            indices = self._indices[:count]
+            np.add(positions[:, None], self._offsets, out=indices)
+            windows = self._windows[:count]
+            np.take(self._input[:history + frames], indices, out=windows)
+            coefficients = self._coefficients[:count]
+            np.take(self.bank, phases, axis=0, out=coefficients)
+            mixed = self._mixed[:count]
+            np.einsum('ij,ij->i', windows, coefficients, out=mixed)
+            self._t += count * self.down - total
+
+            # Keep the last taps - 1 input samples for the next block
+            if history:
+                self._input[:history] = self._input[frames:frames + history]
+
+        output = self._output[:count]
+        np.rint(mixed, out=mixed)
+        np.clip(mixed, -32768, 32767, out=mixed)
+        np.copyto(output, mixed, casting='unsafe')
+        return output
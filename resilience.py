@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Responses after which the same request may succeed: the server did not
+# process it (rate limit, overload) or a gateway lost it
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+PROBING = "probing"
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter.
+
+    The n-th retry waits a random time between 0 and base_delay * 2**n
+    (capped at max_delay), so clients that failed together do not retry
+    together. A Retry-After from the server takes precedence, up to
+    max_retry_after; a longer wait is not worth it for a dictation and
+    the request is given up instead.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=8.0, max_retry_after=20.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, retry, retry_after=None):
+        """Seconds to wait before the given retry (0 = first retry), or None to give up"""
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """Tracks the health of one provider.
+
+    After failure_threshold consecutive failures the breaker opens and the
+    provider is skipped. A background probe then checks it every
+    probe_interval seconds (doubling up to max_probe_interval while it keeps
+    failing) and closes the breaker once it answers again. Thread-safe: it is
+    updated from worker threads and the asyncio transport loop.
+    """
+
+    def __init__(self, name, probe, failure_threshold=3, probe_interval=15.0, max_probe_interval=120.0,
+                 on_change=None):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._interval = probe_interval
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True when requests may be sent to the provider"""
+        return self.state == CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            changed = self.state != CLOSED
+            if changed:
+                self._close()
+        if changed:
+            self._notify()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            tripped = self.state == CLOSED and self.failures >= self.failure_threshold
+            if tripped:
+                self.state = OPEN
+                self.opened_at = time.time()
+                self._interval = self.probe_interval
+                self._schedule_probe()
+        if tripped:
+            print(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+            self._notify()
+
+    def _close(self):
+        self.state = CLOSED
+        self.opened_at = None
+        self._interval = self.probe_interval
+
+    def _schedule_probe(self):
+        timer = threading.Timer(self._interval, self._run_probe)
+        timer.daemon = True
+        timer.start()
+
+    def _run_probe(self):
+        with self._lock:
+            if self.state != OPEN:
+                return
+            self.state = PROBING
+        try:
+            healthy = self.probe()
+        except Exception as e:
+            print(f"Probe of {self.name} failed: {str(e)}")
+            healthy = False
+        with self._lock:
+            if self.state != PROBING:
+                return
+            if healthy:
+                self._close()
+                self.failures = 0
+            else:
+                self.state = OPEN
+                self._interval = min(self._interval * 2, self.max_probe_interval)
+                self._schedule_probe()
+        print(f"Probe of {self.name}: {'available again' if healthy else 'still unavailable'}")
+        self._notify()
+
+    def _notify(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def describe(self):
+        """Short state for the tray tooltip"""
+        if self.state == CLOSED:
+            return "OK"
+        since = time.strftime("%H:%M", time.localtime(self.opened_at))
+        if self.state == PROBING:
+            return f"unavailable since {since}, checking now"
+        return f"unavailable since {since}, checking in the background"
@@ -0,0 +1,122 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+def _normalize(word):
+    return "".join(c for c in word.lower() if c.isalnum())
+
+
+def stitch_texts(texts, max_overlap_words=12):
+    """Joins segment transcripts, dropping words repeated across the segment overlap.
+
+    The overlap is found by matching the tail of the text so far against the
+    head of the next transcript (case and punctuation are ignored). The next
+    transcript may start with a partial word cut by the boundary, so a match
+    of at least two words may begin at its second word.
+    """
+    words = []
+    for text in texts:
+        next_words = text.split()
+        if not next_words:
+            continue
+        skip = 0
+        if words:
+            tail = [_normalize(w) for w in words[-max_overlap_words:]]
+            head = [_normalize(w) for w in next_words[:max_overlap_words + 1]]
+            skip = _overlap_length(tail, head)
+        words.extend(next_words[skip:])
+    return " ".join(words)
+
+
+def _overlap_length(tail, head):
+    """Number of leading words of head that repeat the end of tail (0 if none)"""
+    for size in range(min(len(tail), len(head)), 0, -1):
+        for offset in (0, 1):
+            # A single word matching after a skipped word is almost always a coincidence
+            if offset and size < 2:
+                continue
+            candidate = head[offset:offset + size]
+            if len(candidate) == size and candidate == tail[-size:] and any(candidate):
+                return offset + size
+    return 0
+
+
+class SegmentedTranscription(QObject):
+    """Collects results of concurrently transcribed segments and stitches them in order.
+
+    Worker results arrive on the GUI thread in any order. When the last
+    segment is in, the combined result is emitted through finished.
+    """
+
+    finished = pyqtSignal(object)
+
+    def __init__(self, ranges, rate, duration, speedup=1.0, offset_map=None, parent=None):
+        super().__init__(parent)
+        self.ranges = ranges
+        self.rate = rate
+        self.duration = duration
+        self.speedup = speedup
+        self.offset_map = offset_map
+        self.results = [None] * len(ranges)
+        self.pending = len(ranges)
+
+    def on_segment_result(self, result):
+        """Stores one segment result (carrying its segment_index); emits finished after the last one"""
+        index = result["segment_index"]
+        if self.results[index] is not None or not self.pending:
+            return
+        self.results[index] = result
+        self.pending -= 1
+        if self.pending == 0:
+            self.finished.emit(self.combine())
+            self.deleteLater()
+
+    def abandon(self):
+        """Discards the collector of a cancelled transcription whose remaining segments will not report"""
+        if self.pending:
+            self.pending = 0
+            self.deleteLater()
+
+    def combine(self):
+        """Builds one transcription result from the segment results"""
+        for index, result in enumerate(self.results):
+            if not result.get("success"):
+                return {
+                    "error": f"Segment {index + 1}/{len(self.results)}: {result.get('error', '')}",
+                    "success": False,
+                    "hedges": [hedge for result in self.results for hedge in result.get("hedges", [])]
+                }
+
+        combined = {
+            "text": stitch_texts([result["text"] for result in self.results]),
+            "segments": self.combine_segments(),
+            "duration": self.duration,
+            "success": True,
+        }
+        # Unmapped timestamps (seconds of the processed clip) for the transcription cache
+        combined["clip_segments"] = self.combine_segments(mapped=False)
+        for key in ("raw_bytes", "uploaded_bytes", "encode_offloaded_seconds"):
+            combined[key] = sum(result.get(key, 0) for result in self.results)
+        combined["hedges"] = [hedge for result in self.results for hedge in result.get("hedges", [])]
+        return combined
+
+    def combine_segments(self, mapped=True):
+        """Provider segments with timestamps in the recording (in the clip unless mapped), overlap duplicates removed"""
+        combined = []
+        for index, result in enumerate(self.results):
+            start = self.ranges[index][0] / float(self.rate)
+            # The overlap at the start of a segment was already covered by the previous one
+            covered_until = self.ranges[index - 1][1] / float(self.rate) if index else 0.0
+            for segment in result.get("segments") or []:
+                segment = dict(segment)
+                # Segment-local (sped-up) seconds -> seconds in the uploaded clip
+                for key in ("start", "end"):
+                    if isinstance(segment.get(key), (int, float)):
+                        segment[key] = start + segment[key] * self.speedup
+                if isinstance(segment.get("end"), (int, float)) and segment["end"] <= covered_until:
+                    continue
+                if mapped and self.offset_map is not None:
+                    for key in ("start", "end"):
+                        if isinstance(segment.get(key), (int, float)):
+                            segment[key] = self.offset_map.to_original_seconds(segment[key])
+                combined.append(segment)
+        return combined
@@ -0,0 +1,155 @@
+"""Measures transcription accuracy and latency of sped-up audio.
+
+Every recording is sent at each speed-up factor. The tool reports the word
+error rate against a reference transcript and the end-to-end request
+latency. The reference comes from a .txt file next to the .wav, or from the
+1.0x transcript. Use the results to pick the backend's max_speedup in
+transcription_backends.py.
+
+    python speedup_benchmark.py --provider deepinfra recordings/*.wav
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import wave
+
+import numpy as np
+import requests
+
+from audio_codecs import encode_wav
+from audio_processing import time_compress
+from deadlines import StageDeadlines
+from pcm_buffer import PCMBuffer
+from transcription_backends import available_backends, get_backend
+
+
+def api_key_variable(provider):
+    """Environment variable holding the provider's API key, e.g. OPENAI_API_KEY"""
+    return f"{provider.upper()}_API_KEY"
+
+
+def load_wav(path):
+    """Reads a 16-bit mono WAV file into a PCMBuffer"""
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2 or f.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono audio")
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        return PCMBuffer.from_samples(samples, f.getframerate())
+
+
+def load_reference(path):
+    reference_path = os.path.splitext(path)[0] + ".txt"
+    if os.path.exists(reference_path):
+        with open(reference_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return None
+
+
+def normalize_words(text):
+    return "".join(c.lower() if c.isalnum() else " " for c in text).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Levenshtein distance over words divided by the reference length"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / float(len(ref))
+
+
+def transcribe(backend, pcm_buffer, api_key):
+    """Uploads the clip as WAV; returns (text, seconds from request start to response)"""
+    body = backend.build_body(encode_wav(pcm_buffer))
+    headers = backend.headers(api_key)
+    headers["Content-Type"] = body.content_type
+    # A stalled provider raises a timeout instead of hanging the benchmark
+    deadlines = StageDeadlines.for_payload(len(body), pcm_buffer.duration)
+    started = time.perf_counter()
+    response = requests.post(backend.url, headers=headers, data=body, timeout=(deadlines.connect, deadlines.first_byte))
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return backend.parse(response, 0.0)["text"], elapsed
+
+
+def run(args):
+    backend = get_backend(args.provider)
+    if backend is None:
+        sys.exit(f"Unknown provider: {args.provider}")
+    if args.base_url:
+        backend.configure(args.base_url, args.model)
+    api_key = args.api_key or os.environ.get(api_key_variable(args.provider), "")
+    if not backend.is_usable(api_key):
+        sys.exit(f"No API key or endpoint: pass --api-key (or set {api_key_variable(args.provider)}) / --base-url")
+
+    factors = sorted(set([1.0] + args.factors))
+    rows = {factor: {"wer": [], "latency": [], "compress": [], "audio": 0.0} for factor in factors}
+
+    for path in args.files:
+        clip = load_wav(path)
+        reference = load_reference(path)
+        print(f"{path}: {clip.duration:.1f} s{'' if reference else ' (no reference, comparing to 1.0x)'}")
+        for factor in factors:
+            started = time.perf_counter()
+            samples = time_compress(clip.samples(), clip.rate, factor)
+            compress_seconds = time.perf_counter() - started
+            sped_up = PCMBuffer.from_samples(samples, clip.rate)
+
+            latencies = []
+            text = ""
+            for _ in range(args.repeats):
+                text, elapsed = transcribe(backend, sped_up, api_key)
+                latencies.append(elapsed)
+            if reference is None:
+                reference = text
+            wer = word_error_rate(reference, text)
+
+            row = rows[factor]
+            row["wer"].append(wer)
+            row["latency"].append(statistics.median(latencies))
+            row["compress"].append(compress_seconds)
+            row["audio"] += sped_up.duration
+            print(f"  {factor:g}x  WER {wer:6.1%}  latency {statistics.median(latencies):.2f} s  {text[:60]!r}")
+
+    print()
+    print(f"{'factor':>7} {'audio s':>8} {'WER':>7} {'latency s':>10} {'compress ms':>12}")
+    baseline_wer = statistics.mean(rows[1.0]["wer"])
+    suggested = 1.0
+    within_tolerance = True
+    for factor in factors:
+        row = rows[factor]
+        wer = statistics.mean(row["wer"])
+        print(f"{factor:>6g}x {row['audio']:>8.1f} {wer:>7.1%} {statistics.median(row['latency']):>10.2f} "
+              f"{statistics.mean(row['compress']) * 1000:>12.1f}")
+        # The suggestion stops growing at the first factor that loses accuracy
+        within_tolerance = within_tolerance and wer - baseline_wer <= args.max_wer_increase
+        if within_tolerance:
+            suggested = factor
+    print(f"\nLargest factor within +{args.max_wer_increase:.1%} WER of 1.0x: {suggested:g}x ({args.provider})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcription accuracy and latency of sped-up audio")
+    parser.add_argument("files", nargs="+", help="16-bit mono WAV recordings (optional .txt reference alongside)")
+    parser.add_argument("--provider", choices=[name for name, _ in available_backends()], default="deepinfra")
+    parser.add_argument("--api-key", help="API key (defaults to the provider's environment variable)")
+    parser.add_argument("--base-url", help="base URL of an OpenAI-compatible server (openai_compatible)")
+    parser.add_argument("--model", default="whisper-1", help="model name for an OpenAI-compatible server")
+    parser.add_argument("--factors", type=float, nargs="+", default=[1.1, 1.25, 1.5, 1.75, 2.0])
+    parser.add_argument("--repeats", type=int, default=3, help="requests per factor for the latency median")
+    parser.add_argument("--max-wer-increase", type=float, default=0.02,
+                        help="accepted WER increase over 1.0x when suggesting a factor")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
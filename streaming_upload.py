@@ -0,0 +1,120 @@
+import queue
+import threading
+import uuid
+
+import requests
+
+# Responses meaning the endpoint does not take chunked request bodies
+CHUNKED_REJECTED_STATUSES = {400, 411, 413, 501, 505}
+
+
+class UploadAborted(Exception):
+    """Raised inside the body generator to abandon a started upload"""
+
+
+class ChunkedUpload:
+    """multipart/form-data upload whose file part is sent while it is being recorded.
+
+    The request is opened at the key press in a background thread, on the
+    provider's pooled session when one is given. requests sends a generator
+    body with chunked transfer encoding, so write() puts encoded audio on
+    the wire as soon as the encoder produces it. close() only appends the
+    closing boundary, so after the key release little more than the last
+    chunk and the response wait remain.
+    """
+
+    def __init__(self, url, headers, file_field, filename, mime_type, fields=(), provider=None, session=None,
+                 timeout=None):
+        self.url = url
+        self.provider = provider
+        self.session = session
+        self.timeout = timeout  # (connect, first byte after the body ends) in seconds
+        self.boundary = uuid.uuid4().hex
+        self.headers = dict(headers)
+        self.headers["Content-Type"] = f'multipart/form-data; boundary={self.boundary}'
+
+        prefix = ""
+        for name, value in fields:
+            prefix += (
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        prefix += (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: {mime_type}\r\n\r\n'
+        )
+        self._prefix = prefix.encode('utf-8')
+        self._suffix = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+
+        self._queue = queue.Queue()
+        self._aborted = False
+        self._done = threading.Event()
+        self._thread = None
+        self.response = None
+        self.error = None
+        self.sent_bytes = 0
+        self.closed = False
+
+    def start(self):
+        """Opens the connection and starts streaming the body"""
+        self._thread = threading.Thread(target=self._run, name="ChunkedUpload", daemon=True)
+        self._thread.start()
+
+    def write(self, data):
+        """Queues encoded audio for sending (called from the capture drain thread)"""
+        if len(data) and not self.closed:
+            self._queue.put(bytes(data))
+
+    def close(self):
+        """Ends the file part; the response can then be awaited with wait()"""
+        if not self.closed:
+            self.closed = True
+            self._queue.put(None)
+
+    def abort(self):
+        """Abandons the upload before the body is complete, so the request is never processed"""
+        self._aborted = True
+        self.close()
+
+    def wait(self, timeout=None, cancel_token=None):
+        """Blocks until the response arrives; returns it (None on error, timeout or cancel)"""
+        if cancel_token is None:
+            self._done.wait(timeout)
+            return self.response
+        cancel_token.add_callback(self.abort)
+        while not self._done.wait(0.1):
+            if cancel_token.cancelled:
+                return None
+        return self.response
+
+    @property
+    def rejected(self):
+        """True if the endpoint refused the chunked body or the connection failed"""
+        if self.response is None:
+            return True
+        return self.response.status_code in CHUNKED_REJECTED_STATUSES
+
+    def _body(self):
+        yield self._prefix
+        while True:
+            chunk = self._queue.get()
+            if self._aborted:
+                raise UploadAborted()
+            if chunk is None:
+                break
+            self.sent_bytes += len(chunk)
+            yield chunk
+        yield self._suffix
+
+    def _run(self):
+        try:
+            self.response = (self.session or requests).post(self.url, headers=self.headers, data=self._body(),
+                                                            timeout=self.timeout)
+        except UploadAborted:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
@@ -0,0 +1,226 @@
+import importlib
+
+from http_payload import MultipartStream
+
+# Installed packages can register backends under this entry point group
+ENTRY_POINT_GROUP = "hold_to_speak.backends"
+
+# Provider settings that choose a backend per dictation -> ranking preference
+AUTO_SELECTION = {
+    "auto_cheapest": "cost",
+    "auto_fastest": "speed",
+}
+
+
+class TranscriptionBackend:
+    """Base class of a transcription service with an OpenAI-style multipart API.
+
+    Besides building requests and parsing responses, a backend declares what
+    the pipeline needs to choose a path: accepted codecs, upload limit,
+    chunked streaming support, cost per minute and the safe speed-up.
+    """
+
+    name = ""
+    label = ""
+    url = ""
+    file_field = "file"
+    fields = ()
+    auth_scheme = "Bearer"
+    requires_api_key = True
+    # Formats accepted by the endpoint, in order of preference for "auto"
+    codecs = ("wav",)
+    # Largest accepted upload in bytes (None = no known limit)
+    max_upload_bytes = None
+    # Accepts request bodies sent with chunked transfer encoding
+    supports_chunked = True
+    # Price in USD per minute of uploaded audio
+    cost_per_minute = 0.0
+    # Largest audio speed-up that keeps the accuracy (see speedup_benchmark.py)
+    max_speedup = 1.0
+    # Repeating a request has no effect besides its cost, so a request that
+    # may already have been processed (5xx, timeout) can be sent again
+    idempotent = True
+    # Runs on this machine and takes PCM instead of an upload (see local_whisper.py)
+    local = False
+
+    def is_usable(self, api_key):
+        """True when the backend has an endpoint and, if it needs one, an API key"""
+        return bool(self.url) and (bool(api_key) or not self.requires_api_key)
+
+    def headers(self, api_key):
+        """Request headers without the Content-Type"""
+        return {"Authorization": f"{self.auth_scheme} {api_key}"} if api_key else {}
+
+    def form_fields(self):
+        """Text fields of the multipart form"""
+        return list(self.fields)
+
+    def build_body(self, payload):
+        """Multipart body streaming the encoded payload"""
+        return MultipartStream([(self.file_field, payload)] + self.form_fields())
+
+    def cache_identity(self):
+        """Everything besides the audio that shapes the transcription: endpoint, model and request fields"""
+        return "|".join([self.name, self.url] + [f"{name}={value}" for name, value in self.form_fields()])
+
+    def estimate_cost(self, duration):
+        """Cost in USD of transcribing duration seconds"""
+        return self.cost_per_minute * duration / 60.0
+
+    def extract_text(self, result):
+        return result["text"]
+
+    def parse(self, response, duration):
+        """Turns a requests-like response (status_code, text, json()) into a transcription result"""
+        if response.status_code == 200:
+            result = response.json()
+            return {
+                "text": self.extract_text(result),
+                "segments": result.get("segments") or [],
+                "duration": duration,
+                "success": True
+            }
+        return {
+            "error": f"Błąd {self.label} API: {response.status_code}\n{response.text}",
+            "success": False
+        }
+
+
+class OpenAIBackend(TranscriptionBackend):
+    name = "openai"
+    label = "OpenAI"
+    url = "https://api.openai.com/v1/audio/transcriptions"
+    fields = (("model", "whisper-1"),)
+    codecs = ("opus", "flac", "wav_ulaw", "wav")
+    # OpenAI rejects files above 25 MB
+    max_upload_bytes = 25 * 1024 * 1024
+    cost_per_minute = 0.006
+    max_speedup = 1.5
+
+
+class DeepInfraBackend(TranscriptionBackend):
+    name = "deepinfra"
+    label = "DeepInfra"
+    url = "https://api.deepinfra.com/v1/inference/openai/whisper-large-v3-turbo"
+    file_field = "audio"
+    auth_scheme = "bearer"
+    codecs = ("opus", "flac", "wav_ulaw", "wav")
+    cost_per_minute = 0.0002
+    max_speedup = 1.25
+
+    def extract_text(self, result):
+        # DeepInfra may return the text directly or only as segments
+        if result.get("text"):
+            return result["text"]
+        if result.get("segments"):
+            return " ".join(seg["text"] for seg in result["segments"] if "text" in seg)
+        return "Brak tekstu w odpowiedzi API."
+
+
+class OpenAICompatibleBackend(TranscriptionBackend):
+    """Self-hosted server with the OpenAI transcription API (faster-whisper-server, LocalAI, vLLM...)"""
+
+    name = "openai_compatible"
+    label = "OpenAI-compatible"
+    requires_api_key = False
+    codecs = ("flac", "wav_ulaw", "wav")
+
+    def __init__(self, base_url="", model="whisper-1"):
+        self.base_url = base_url
+        self.model = model
+
+    def configure(self, base_url, model=None):
+        """Sets the server's base URL (e.g. http://localhost:8000/v1) and model name"""
+        self.base_url = base_url.strip()
+        self.model = model or "whisper-1"
+
+    @property
+    def url(self):
+        """Transcription endpoint under the base URL (empty until a base URL is configured)"""
+        return self.base_url.rstrip("/") + "/audio/transcriptions" if self.base_url else ""
+
+    def form_fields(self):
+        return [("model", self.model)]
+
+
+_registry = {}   # name -> [label, loader, instance]
+_plugins_loaded = False
+
+
+def register_backend(name, loader, label=None):
+    """Registers a backend under name.
+
+    loader is a class, a factory or a "module:attribute" string. It is only
+    resolved when the backend is first used, so a plugin is not imported
+    until it is selected.
+    """
+    _registry[name] = [label or name, loader, None]
+
+
+def _resolve(loader):
+    if isinstance(loader, str):
+        module_name, _, attribute = loader.partition(":")
+        loader = getattr(importlib.import_module(module_name), attribute)
+    elif hasattr(loader, "load") and not isinstance(loader, type):
+        loader = loader.load()  # importlib.metadata.EntryPoint
+    return loader()
+
+
+def load_plugins():
+    """Registers the backends advertised by installed packages (without importing them)"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    try:
+        from importlib.metadata import entry_points
+        found = entry_points()
+        found = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, "select") else found.get(ENTRY_POINT_GROUP, [])
+    except Exception as e:
+        print(f"Could not list backend plugins: {str(e)}")
+        return
+    for entry_point in found:
+        if entry_point.name not in _registry:
+            register_backend(entry_point.name, entry_point)
+
+
+def available_backends():
+    """(name, label) of every registered backend, in registration order"""
+    load_plugins()
+    return [(name, entry[0]) for name, entry in _registry.items()]
+
+
+def get_backend(name):
+    """The backend instance registered under name (created on first use), or None"""
+    entry = _registry.get(name)
+    if entry is None:
+        load_plugins()
+        entry = _registry.get(name)
+        if entry is None:
+            return None
+    if entry[2] is None:
+        try:
+            entry[2] = _resolve(entry[1])
+        except Exception as e:
+            print(f"Could not load transcription backend {name}: {str(e)}")
+            return None
+    return entry[2]
+
+
+def rank_backends(backends, prefer="cost"):
+    """Orders candidate backends for automatic selection.
+
+    "cost" puts the lowest price per minute first. "speed" puts backends
+    that take a chunked upload (sent while recording) first, then the ones
+    without an upload limit that would force splitting, then cheaper ones.
+    """
+    if prefer == "speed":
+        return sorted(backends, key=lambda b: (not b.supports_chunked, b.max_upload_bytes is not None,
+                                               b.cost_per_minute))
+    return sorted(backends, key=lambda b: b.cost_per_minute)
+
+
+register_backend("openai", OpenAIBackend, "OpenAI")
+register_backend("deepinfra", DeepInfraBackend, "DeepInfra")
+register_backend("openai_compatible", OpenAICompatibleBackend, "OpenAI-compatible (self-hosted)")
+register_backend("local", "local_whisper:LocalWhisperBackend", "Local model (CPU)")
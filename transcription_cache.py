@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+# Fields of a transcription result worth keeping; upload statistics and routing details are not
+CACHED_FIELDS = ("text", "segments", "duration", "success")
+
+
+def cache_key(pcm_buffer, identity, codec="", speedup=1.0):
+    """Content address of a transcription: hash of the PCM and everything else that shapes the result.
+
+    identity describes the provider, model and request fields (see
+    TranscriptionBackend.cache_identity). The PCM is the trimmed mono clip
+    at the provider's sample rate, so the same recording re-sent hashes the
+    same however it was captured.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{identity}\0{codec}\0{speedup:g}\0{pcm_buffer.rate}\0{pcm_buffer.channels}\0".encode('utf-8'))
+    digest.update(pcm_buffer.memoryview())
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Transcription results by content address, in memory and on disk.
+
+    The memory tier is an LRU of up to memory_entries results. Every result
+    is also written to its own small JSON file, so the cache survives a
+    restart; the disk tier is trimmed to disk_max_bytes by dropping the
+    least recently used files (their modification time is touched on a
+    hit). Entries older than ttl_seconds are ignored and removed.
+    """
+
+    def __init__(self, directory, ttl_seconds=7 * 24 * 3600, memory_entries=256, disk_max_bytes=20 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()  # key -> (czas zapisu, wynik)
+        os.makedirs(directory, exist_ok=True)
+        self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """The cached result for key (a copy), or None"""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is None:
+                return None
+        if now - entry[0] > self.ttl_seconds:
+            self._discard(key)
+            return None
+        self._remember(key, entry)
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return json.loads(json.dumps(entry[1]))
+
+    def put(self, key, result):
+        """Stores a successful transcription result"""
+        entry = (time.time(), {field: result[field] for field in CACHED_FIELDS if field in result})
+        self._remember(key, entry)
+        try:
+            data = json.dumps({"created": entry[0], "result": entry[1]}).encode('utf-8')
+            path = self._path(key)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(path, 'wb') as f:
+                f.write(data)
+            self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+        except OSError as e:
+            print(f"Could not write the transcription cache: {str(e)}")
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                stored = json.loads(f.read())
+            return stored["created"], stored["result"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _discard(self, key):
+        self._memory.pop(key, None)
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _trim_disk(self):
+        """Removes the least recently used files until the disk tier is at 80% of its limit"""
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.is_file()),
+                         key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._disk_bytes <= self.disk_max_bytes * 0.8:
+                break
+            self._discard(entry.name[:-len(".json")])
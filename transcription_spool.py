@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from audio_codecs import EncodedAudio
+
+INDEX_FILE = "index.jsonl"
+
+
+class SpoolEntry:
+    """A queued recording: the encoded clip on disk and what is needed to send it"""
+
+    def __init__(self, id, file_name, codec, mime_type, extension, raw_bytes, nbytes, duration, provider, created):
+        self.id = id
+        self.file_name = file_name
+        self.codec = codec
+        self.mime_type = mime_type
+        self.extension = extension
+        self.raw_bytes = raw_bytes
+        self.nbytes = nbytes
+        self.duration = duration
+        self.provider = provider
+        self.created = created
+
+    def to_record(self):
+        return {"op": "add", "id": self.id, "file": self.file_name, "codec": self.codec, "mime": self.mime_type,
+                "ext": self.extension, "raw_bytes": self.raw_bytes, "nbytes": self.nbytes,
+                "duration": self.duration, "provider": self.provider, "created": self.created}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record["id"], record["file"], record["codec"], record["mime"], record["ext"],
+                   record["raw_bytes"], record["nbytes"], record["duration"], record["provider"], record["created"])
+
+
+class TranscriptionSpool:
+    """Crash-safe directory of recordings waiting for transcription.
+
+    Each clip is written to its own file (through a temporary file and an
+    atomic rename) before a line is appended to the index, so a crash leaves
+    either a complete entry or nothing. The index is an append-only JSON
+    lines log of "add" and "remove" records; it is rewritten without the
+    removed entries once they outnumber the pending ones. When the queue
+    exceeds max_bytes the oldest clips are evicted.
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = {}
+        self._removed = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _load(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Wiersz przerwany awarią
+                    self._next_id = max(self._next_id, record["id"] + 1)
+                    if record["op"] == "add":
+                        self._entries[record["id"]] = SpoolEntry.from_record(record)
+                    else:
+                        self._entries.pop(record["id"], None)
+
+        # Wpisy bez pliku i pliki bez wpisu (awaria w trakcie zapisu) są porzucane
+        for entry_id, entry in list(self._entries.items()):
+            if not os.path.exists(os.path.join(self.directory, entry.file_name)):
+                del self._entries[entry_id]
+        known = {entry.file_name for entry in self._entries.values()} | {INDEX_FILE}
+        for file_name in os.listdir(self.directory):
+            if file_name not in known:
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except OSError:
+                    pass
+        self._compact()
+        if self._entries:
+            print(f"Offline queue: {len(self._entries)} recordings waiting for transcription")
+
+    def _append_index(self, record):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in sorted(self._entries.values(), key=lambda entry: entry.id):
+                f.write(json.dumps(entry.to_record()) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+        self._removed = 0
+
+    def add(self, payload, provider, duration):
+        """Writes an encoded clip to the queue; returns its entry"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            file_name = f"{entry_id:08d}.{payload.extension}"
+            path = os.path.join(self.directory, file_name)
+            temp_path = path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                for chunk in payload.chunks:
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+
+            entry = SpoolEntry(entry_id, file_name, payload.codec, payload.mime_type, payload.extension,
+                               payload.raw_bytes, payload.nbytes, duration, provider, time.time())
+            self._append_index(entry.to_record())
+            self._entries[entry_id] = entry
+            self._evict()
+            return entry
+
+    def _evict(self):
+        while len(self._entries) > 1 and self.total_bytes() > self.max_bytes:
+            oldest = min(self._entries.values(), key=lambda entry: entry.id)
+            print(f"Offline queue over {self.max_bytes // (1024 * 1024)} MB, dropping the oldest recording")
+            self._remove(oldest)
+
+    def _remove(self, entry):
+        if self._entries.pop(entry.id, None) is None:
+            return
+        self._append_index({"op": "remove", "id": entry.id})
+        try:
+            os.remove(os.path.join(self.directory, entry.file_name))
+        except OSError:
+            pass
+        self._removed += 1
+        if self._removed > len(self._entries):
+            self._compact()
+
+    def remove(self, entry):
+        """Removes a transcribed (or abandoned) clip from the queue"""
+        with self._lock:
+            self._remove(entry)
+
+    def pending(self):
+        """Queued entries, oldest first"""
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda entry: entry.id)
+
+    def total_bytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def load_payload(self, entry):
+        """Reads a queued clip back as EncodedAudio"""
+        with open(os.path.join(self.directory, entry.file_name), 'rb') as f:
+            data = f.read()
+        return EncodedAudio([data], entry.mime_type, entry.extension, entry.raw_bytes, entry.codec)
+
+
+class SpoolDrainer(QObject):
+    """Background thread uploading the queued recordings.
+
+    Up to max_parallel clips are sent at once with send(entry, payload),
+    which returns a transcription result. Results are delivered through
+    the delivered signal strictly in queue order: a clip answered early
+    waits for the ones before it. After a transient failure (no network,
+    provider down) the drainer backs off from retry_interval up to
+    max_retry_interval; wake(force=True) retries at once, e.g. when a live
+    request has just succeeded. A clip failing for other reasons is retried
+    after the same back-off, and after max_attempts failures it is delivered
+    with its error and dropped.
+    """
+
+    delivered = pyqtSignal(object, object)  # SpoolEntry, wynik transkrypcji
+
+    def __init__(self, spool, send, max_parallel=2, retry_interval=5.0, max_retry_interval=60.0, max_attempts=3):
+        super().__init__()
+        self.spool = spool
+        self.send = send
+        self.max_parallel = max_parallel
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.max_attempts = max_attempts
+        self._interval = retry_interval
+        self._next_attempt = 0.0
+        self._results = {}
+        self._attempts = {}
+        self._wake = threading.Event()
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="SpoolUpload")
+        self._thread = threading.Thread(target=self._run, name="SpoolDrainer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wake(self, force=False):
+        """Signals new work; force also skips the current back-off"""
+        if force:
+            self._next_attempt = 0.0
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stopped:
+            pending = self.spool.pending()
+            wait = self._next_attempt - time.monotonic()
+            if not pending or wait > 0:
+                self._wake.wait(wait if pending else None)
+                self._wake.clear()
+                continue
+            if self._drain(pending):
+                self._interval = self.retry_interval
+                self._next_attempt = 0.0
+            else:
+                self._next_attempt = time.monotonic() + self._interval
+                self._interval = min(self._interval * 2, self.max_retry_interval)
+
+    def _send(self, entry):
+        try:
+            return self.send(entry, self.spool.load_payload(entry))
+        except Exception as e:
+            return {"error": str(e), "success": False}
+
+    def _drain(self, pending):
+        """Sends the next batch and delivers what is ready; False when a clip is to be retried"""
+        batch = [entry for entry in pending if entry.id not in self._results][:self.max_parallel]
+        futures = [self._executor.submit(self._send, entry) for entry in batch]
+        succeeded = True
+        for entry, future in zip(batch, futures):
+            result = future.result()
+            if result.get("success"):
+                self._results[entry.id] = result
+            elif result.get("transient"):
+                succeeded = False
+            else:
+                self._attempts[entry.id] = self._attempts.get(entry.id, 0) + 1
+                if self._attempts[entry.id] >= self.max_attempts:
+                    self._results[entry.id] = result
+                else:
+                    # The next attempt waits for the back-off too, not resent at once
+                    succeeded = False
+
+        # Wyniki w kolejności nagrań - wczesna odpowiedź czeka na wcześniejsze nagrania
+        for entry in self.spool.pending():
+            result = self._results.pop(entry.id, None)
+            if result is None:
+                break
+            self._attempts.pop(entry.id, None)
+            self.spool.remove(entry)
+            self.delivered.emit(entry, result)
+        return succeeded
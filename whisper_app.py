@@ -1,9 +1,11 @@
 import sys
 import os
+import multiprocessing
+import functools
+import threading
 import pyaudio
-import wave
-import requests
 import time
+import uuid
 import asyncio
 import aiohttp
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMessageBox
@@ -11,18 +13,44 @@ from PyQt6.QtCore import Qt, QTimer, QObject, pyqtSignal, QRunnable, QThreadPool
 from PyQt6.QtGui import QIcon, QPixmap, QPainter, QColor
 from pynput import keyboard
 import pyperclip
-import winsound
 
 # Importuj nasze moduły UI
 from whisper_ui import WhisperMainWindow
 from recording_popup import RecordingPopup
+from audio_capture import AudioCaptureEngine
+from device_registry import DeviceRegistry
+from cue_player import create_cue_player
+from audio_codecs import negotiate_codec, create_streaming_encoder
+from audio_processing import SpeechGate, SampleOffsetMap, find_speech_bounds, split_at_silences, time_compress
+from pcm_buffer import PCMBuffer
+from streaming_upload import ChunkedUpload
+from http_sessions import SessionPool
+from async_transport import AsyncTransport
+from hedging import hedge
+from deadlines import CancelToken, StageDeadlines, TranscriptionCancelled
+from dictation_sequencer import DictationSequencer
+from resilience import RETRYABLE_STATUSES, CircuitBreaker, RetryPolicy, parse_retry_after
+from transcription_backends import AUTO_SELECTION, available_backends, get_backend, rank_backends
+from segmented_transcription import SegmentedTranscription
+from transcription_spool import SpoolDrainer, TranscriptionSpool
+from transcription_cache import TranscriptionCache, cache_key
 
-# Parametry nagrywania
+# Parametry nagrywania - format wysyłanego nagrania; urządzenie pracuje
+# w swoim natywnym formacie, a strumień jest przeliczany w locie
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
-RATE = 8000
-CHUNK = 4096
-WAVE_OUTPUT_FILENAME = "output.mp3"
+RATE = 8000  # Domyślna częstotliwość, gdy dostawca nie ma własnej
+CHUNK = 1024
+DEBUG_RECORDINGS_DIR = "debug_recordings"
+SPOOL_DIR = "pending_recordings"  # Nagrania czekające na transkrypcję (brak sieci, awaria dostawcy)
+CACHE_DIR = "transcription_cache"
+
+# Zakładka między segmentami długich nagrań i limit równoległych żądań
+SEGMENT_OVERLAP_SECONDS = 0.5
+MAX_PARALLEL_SEGMENTS = 8
+
+# Długość nagrania nie jest znana przy otwieraniu wysyłania chunked - limit oczekiwania na odpowiedź dla 2 minut mowy
+CHUNKED_RESPONSE_AUDIO_SECONDS = 120
 
 class KeyboardHandler(QObject):
     start_recording_signal = pyqtSignal()
@@ -133,36 +161,107 @@ class WhisperTranscriber(QObject):
     """Klasa obsługująca nagrywanie i transkrypcję"""
     
     transcription_complete = pyqtSignal(str, float)  # Tekst, czas nagrywania
+    breaker_state_changed = pyqtSignal()
+    partial_transcript = pyqtSignal(str)  # Rosnąca hipoteza lokalnego modelu
     
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
         self.recording = False
-        self.frames = []
-        self.stream = None
+        self.pcm_buffer = None
         self.recording_start_time = None
         self.api_provider = "openai"  # Domyślnie OpenAI
         self.api_key = ""
+        self.api_keys = {}  # Klucze wszystkich dostawców (tryb automatycznego wyboru)
         self.selected_mic_index = None
         
         # Opcje
         self.auto_paste_enabled = True
         self.sound_notifications_enabled = False
         self.tray_notifications_enabled = True
+        self.armed_enabled = False
+        self.preroll_ms = 500
+        self.debug_save_audio = False
+        self.recording_counter = 0
+        self.upload_codec = "auto"
+        self.provider_codecs = {}
+        self.streaming_encode_enabled = True
+        self.stream_encoder = None
+        self.vad_enabled = True
+        self.speech_gate = None
+        self.compress_pauses_enabled = False
+        self.max_pause_ms = 1000
+        self.speedup_factor = 1.0
+        self.provider_sample_rates = {}
+        self.chunked_upload_enabled = False
+        self.chunked_upload = None
+        self.chunked_rejected = set()  # Dostawcy, którzy odrzucili wysyłanie chunked
+        self.segmented_enabled = True
+        self.max_segment_seconds = 30
+        self.meter_debug_overlay = False
+        self.prewarm_enabled = True
+        
+        # Trwałe sesje HTTP (keep-alive) dla każdego dostawcy - bez nowego połączenia przy każdym dyktowaniu
+        self.sessions = SessionPool(pool_size=MAX_PARALLEL_SEGMENTS)
+        
+        # Klient HTTP: "requests" (wątek na żądanie) lub "aiohttp" (korutyny na osobnej pętli asyncio)
+        self.http_transport = "requests"
+        self.async_transport = None
+        
+        # Zabezpieczenie przed wolną odpowiedzią: po opóźnieniu ta sama prośba idzie do drugiego dostawcy
+        self.hedge_enabled = False
+        self.hedge_delay_ms = 2000
+        self.hedge_provider = "auto"
+        
+        # Ponawianie przejściowych błędów i bezpieczniki dostawców - po serii awarii
+        # ruch idzie do innego dostawcy, a niedostępny jest sprawdzany w tle
+        self.retry_policy = RetryPolicy()
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()  # Bezpieczniki tworzone także w wątkach kolejki i roboczych
+        self.breaker_state_changed.connect(self.update_tray_tooltip)
+        
+        # Trwała kolejka nagrań, których nie udało się wysłać - przetwarzana w tle po powrocie sieci
+        self.spool_enabled = True
+        self.spool = TranscriptionSpool(SPOOL_DIR)
+        self.spool_drainer = SpoolDrainer(self.spool, self.send_spooled)
+        self.spool_drainer.delivered.connect(self.on_spooled_result)
+        
+        # Wyniki transkrypcji według treści nagrania - to samo audio nie jest wysyłane ponownie
+        self.cache_enabled = True
+        self.cache = TranscriptionCache(CACHE_DIR)
         
-        # Inicjalizacja PyAudio przy starcie - będzie używana przez całą aplikację
-        self.audio = pyaudio.PyAudio()
-        print("PyAudio zainicjalizowany")
+        # Dyktowania mogą się nakładać - następne nagranie startuje, zanim poprzednie zostanie
+        # przetworzone, a wyniki trafiają do transkryptu i są wklejane w kolejności nagrań
+        self.dictations = DictationSequencer(self)
+        self.dictations.released.connect(self.present_result)
+        
+        # Tokeny anulowania dyktowań, na których wynik czekamy, z numerami ich sesji
+        self.in_flight = {}
+        
+        # Wspólna instancja PyAudio i lista urządzeń - będzie używana przez całą aplikację
+        self.device_registry = self.main_window.device_registry
+        self.device_registry.is_busy = lambda: self.recording
+        self.device_registry.about_to_reinitialize.connect(self.on_audio_reinitializing)
+        self.device_registry.devices_changed.connect(self.on_devices_changed)
+        self.audio = self.device_registry.audio
+        
+        # Silnik nagrywania działający w trybie callback - nie blokuje wątku GUI
+        self.capture = AudioCaptureEngine(self.audio, FORMAT, CHANNELS, RATE, CHUNK)
+        
+        # Dźwięki powiadomień - przygotowane z góry i odtwarzane w tle, bez blokowania wątku GUI
+        self.cue_player = create_cue_player(self.audio)
         
         # Połącz sygnały UI z metodami
         self.main_window.record_button.clicked.connect(self.toggle_recording)
         self.main_window.api_settings_changed.connect(self.update_api_settings)
         self.main_window.hotkey_changed.connect(self.update_hotkeys)
         self.main_window.option_changed.connect(self.update_option)
-        self.main_window.microphone_changed.connect(self.update_microphone)
+        self.main_window.microphone_changed.connect(self.on_microphone_changed)
+        self.main_window.audio_settings_changed.connect(self.update_audio_settings)
         
         # Połącz akcję nagrywania z zasobnika systemowego
         self.main_window.record_action.triggered.connect(self.toggle_recording)
+        self.main_window.cancel_action.triggered.connect(self.cancel_transcriptions)
         
         # Pobierz aktualne ustawienia API
         api_settings = self.main_window.get_api_settings()
@@ -177,6 +276,12 @@ class WhisperTranscriber(QObject):
         # Get initial microphone selection
         self.update_microphone(self.main_window.get_selected_microphone())
         
+        # Ustawienia nagrywania (tryb uzbrojony z buforem pre-roll)
+        self.update_audio_settings(self.main_window.get_audio_settings())
+        
+        # Kolejka rusza po wczytaniu kluczy API - wcześniej żaden dostawca nie byłby dostępny
+        self.spool_drainer.start()
+        
         # Utwórz obsługę klawiatury
         self.keyboard_handler = KeyboardHandler(self.main_window.get_hotkey())
         self.keyboard_handler.start_recording_signal.connect(self.start_recording)
@@ -184,16 +289,16 @@ class WhisperTranscriber(QObject):
         
         # Create recording popup
         self.popup = RecordingPopup()
+        # Wskaźnik poziomu czyta próbki bezpośrednio z bufora nagrania
+        self.popup.set_level_source(self.capture.recorded_samples)
+        self.popup.set_debug_overlay(self.meter_debug_overlay)
+        self.partial_transcript.connect(self.on_partial_transcript)
         
         # Timer dla licznika nagrywania
         self.recording_timer = QTimer()
         self.recording_timer.timeout.connect(self.update_recording_timer)
         self.recording_time_seconds = 0
         
-        # Timer do zbierania audio
-        self.audio_timer = QTimer()
-        self.audio_timer.timeout.connect(self.collect_audio)
-        
         # Inicjalizuj ThreadPool do obsługi zadań asynchronicznych
         self.threadpool = QThreadPool()
         print(f"Dostępnych wątków: {self.threadpool.maxThreadCount()}")
@@ -203,10 +308,18 @@ class WhisperTranscriber(QObject):
     
     def __del__(self):
         """Destruktor - upewnij się, że PyAudio jest poprawnie zamykany"""
-        if hasattr(self, 'audio') and self.audio:
+        if hasattr(self, 'device_registry'):
             try:
-                self.audio.terminate()
-                print("PyAudio zamknięty")
+                self.capture.close()
+                self.cue_player.close()
+                self.sessions.close()
+                self.spool_drainer.stop()
+                local = get_backend("local")
+                if local is not None:
+                    local.close()
+                if self.async_transport is not None:
+                    self.async_transport.close()
+                self.device_registry.terminate()
             except:
                 pass
     
@@ -214,10 +327,9 @@ class WhisperTranscriber(QObject):
         """Odtwarza dźwięk powiadomienia o rozpoczęciu lub zakończeniu nagrywania"""
         if not self.sound_notifications_enabled:
             return
-            
-        if not start:
-            # Dźwięk rozpoczęcia nagrywania (wyższy ton)
-            winsound.Beep(200, 200)  # 1000 Hz przez 200 ms
+        
+        # Rozpoczęcie - wyższy ton, zakończenie - krótki niski ton; play() tylko kolejkuje dźwięk
+        self.cue_player.play("start" if start else "stop")
     
     def update_recording_timer(self):
         """Aktualizuje wyświetlany czas nagrywania"""
@@ -237,6 +349,24 @@ class WhisperTranscriber(QObject):
             self.main_window.record_action.setText("Rozpocznij nagrywanie")
             self.main_window.toggle_recording_icon(False)
     
+    def cancel_transcriptions(self):
+        """Aborts the requests of every dictation still waiting for its transcription"""
+        if not self.in_flight:
+            return
+        in_flight, self.in_flight = self.in_flight, {}
+        self.update_cancel_action()
+        print(f"Transcription cancelled ({len(in_flight)} pending)")
+        self.main_window.transcript_text.append("Transkrypcja anulowana\n\n")
+        for token, session_id in in_flight.items():
+            token.cancel()
+            # Wyniki późniejszych nagrań, które już dotarły, nie czekają na anulowane
+            self.dictations.drop(session_id)
+        self.update_popup()
+    
+    def update_cancel_action(self):
+        """The tray's cancel action is available while a transcription is in progress"""
+        self.main_window.cancel_action.setEnabled(bool(self.in_flight))
+    
     def start_recording(self):
         """Rozpoczyna nagrywanie"""
         if self.recording:  # Zabezpieczenie przed podwójnym startem
@@ -255,85 +385,75 @@ class WhisperTranscriber(QObject):
         self.recording_timer.start(1000)  # Aktualizuj timer co sekundę
         
         # Przygotuj nagrywanie audio - używamy istniejącej instancji PyAudio
-        self.frames = []
-        
-        # Try to use the selected microphone or find a default one
-        input_device = self.selected_mic_index
-        valid_input_device = False
+        self.pcm_buffer = None
         
-        # If no specific device is selected, try to find any valid input device
-        if input_device is None:
-            try:
-                default_device_info = self.audio.get_default_input_device_info()
-                if default_device_info and default_device_info['maxInputChannels'] > 0:
-                    input_device = default_device_info['index']
-                    valid_input_device = True
-                    print(f"Using default input device: {default_device_info['name']} (index: {input_device})")
-                else:
-                    valid_input_device = False
-            except Exception as e:
-                print(f"Error getting default input device: {str(e)}")
-                valid_input_device = False
-                
-            # If no default device works, try finding any input device
-            if not valid_input_device:
-                for i in range(self.audio.get_device_count()):
-                    device_info = self.audio.get_device_info_by_index(i)
-                    if device_info['maxInputChannels'] > 0:
-                        input_device = i
-                        valid_input_device = True
-                        print(f"Using input device: {device_info['name']} (index: {i})")
-                        break
+        # Armed stream is already open on a validated device - skip the device checks
+        if self.capture.armed and self.capture.stream is not None:
+            input_device = self.capture.device_index
         else:
-            # Check if the selected device is valid
-            try:
-                device_info = self.audio.get_device_info_by_index(input_device)
-                if device_info['maxInputChannels'] > 0:
-                    valid_input_device = True
-            except Exception as e:
-                print(f"Error checking selected input device: {str(e)}")
-                valid_input_device = False
+            input_device = self.resolve_input_device()
         
-        if not valid_input_device:
+        if input_device is None:
             error_msg = "Nie znaleziono żadnego urządzenia wejściowego audio (mikrofonu)."
             print(error_msg)
             self.main_window.transcript_text.append(f"Błąd: {error_msg}\n\n")
             self.stop_recording()
             return
             
+        # Dostawca tego nagrania (w trybie automatycznym wybierany przy każdym nagraniu)
+        backend = self.active_backend()
+        
+        # Częstotliwość nagrania zależy od dostawcy (16 kHz - dokładność, 8 kHz - mniej danych)
+        self.capture.set_output_rate(self.target_rate(backend))
+        
+        # Koder strumieniowy - kodowanie w trakcie mówienia, poza ścieżką krytyczną
+        self.stream_encoder = self.create_stream_encoder(backend)
+        chunk_listener = self.stream_encoder.feed if self.stream_encoder else None
+        
+        # Opcjonalnie wysyłanie zaczyna się już przy wciśnięciu klawisza
+        self.chunked_upload = self.start_chunked_upload(self.stream_encoder, backend)
+        
+        # Połączenie z dostawcą nawiązywane w tle, gdy użytkownik jeszcze mówi
+        # (wysyłanie chunked samo otwiera połączenie)
+        if self.chunked_upload is None:
+            self.prewarm_connection(backend)
+        
+        # Detektor mowy przed koderem - cisza na początku i końcu nie trafia do kodera
+        self.speech_gate = None
+        if self.vad_enabled:
+            # Opcjonalne skracanie długich pauz - wynik zbierany w osobnym buforze
+            max_pause_ms = self.max_pause_ms if self.compress_pauses_enabled else None
+            output = PCMBuffer(self.capture.rate, self.capture.channels) if max_pause_ms else None
+            self.speech_gate = SpeechGate(self.capture.rate, chunk_listener, max_pause_ms=max_pause_ms, output=output)
+            chunk_listener = self.speech_gate.feed
+        
         try:
-            # Utwórz nowy strumień audio używając istniejącej instancji PyAudio
-            self.stream = self.audio.open(
-                format=FORMAT,
-                channels=CHANNELS,
-                rate=RATE,
-                input=True,
-                input_device_index=input_device,
-                frames_per_buffer=CHUNK
-            )
-            
-            # Uruchom timer do zbierania audio
-            self.audio_timer.start(20)  # Zbieraj dane co 20ms
-            
+            # Otwórz strumień w trybie callback - dane trafiają do bufora pierścieniowego
+            self.capture.start(input_device, chunk_listener)
         except Exception as e:
             print(f"Błąd podczas inicjalizacji strumienia audio: {e}")
             self.main_window.transcript_text.append(f"Błąd podczas inicjalizacji strumienia audio: {str(e)}\n\n")
+            self.abort_chunked_upload()
             self.stop_recording()
             return
         
-        # Powiadomienie dźwiękowe na końcu (może być opóźnione)
-        if self.sound_notifications_enabled:
-            QTimer.singleShot(50, lambda: self.play_notification(start=True))
+        # Powiadomienie dźwiękowe na końcu
+        self.play_notification(start=True)
     
-    def collect_audio(self):
-        """Zbiera dane audio"""
-        if self.recording:
-            try:
-                data = self.stream.read(CHUNK)
-                self.frames.append(data)
-            except Exception as e:
-                print(f"Błąd podczas nagrywania: {str(e)}")
-                self.stop_recording()
+    def resolve_input_device(self):
+        """Returns the index of a valid input device (selected or default), or None"""
+        # Try to use the selected microphone or fall back to the default one
+        if self.selected_mic_index is not None:
+            if self.device_registry.get_input(self.selected_mic_index):
+                return self.selected_mic_index
+            print(f"Selected input device is no longer valid (index: {self.selected_mic_index})")
+            return None
+        
+        device_info = self.device_registry.default_input()
+        if device_info is None:
+            return None
+        print(f"Using default input device: {device_info['display_name']} (index: {device_info['index']})")
+        return device_info['index']
     
     def stop_recording(self):
         """Zatrzymuje nagrywanie"""
@@ -356,160 +476,823 @@ class WhisperTranscriber(QObject):
         recording_duration = time.time() - self.recording_start_time
         
         # Zatrzymaj nagrywanie - najważniejsze operacje najpierw
-        if self.audio_timer.isActive():
-            self.audio_timer.stop()
-        
-        if self.stream:
+        if self.capture.is_active:
             try:
-                self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
+                self.pcm_buffer = self.capture.stop()
+                print(f"Capture stats: {self.capture.stats}")
             except Exception as e:
                 print(f"Błąd podczas zatrzymywania strumienia: {str(e)}")
         
+        # Zastosuj zmiany ustawień uzbrojenia wprowadzone podczas nagrywania
+        self.update_arming()
+        
         # Aktualizacja UI może poczekać
         self.main_window.record_action.setText("Rozpocznij nagrywanie")
         self.main_window.toggle_recording_icon(False)
         
-        # Powiadomienie dźwiękowe
-        if self.sound_notifications_enabled:
-            winsound.Beep(200, 100)  # Krótszy dźwięk (100ms zamiast 200ms)
+        # Powiadomienie dźwiękowe (nie blokuje - kodowanie rusza od razu)
+        self.play_notification(start=False)
+        
+        # Bufor, koder i wysyłanie należą od teraz do tego nagrania - kolejne nagranie tworzy własne
+        pcm_buffer, self.pcm_buffer = self.pcm_buffer, None
+        encoder, self.stream_encoder = self.stream_encoder, None
+        chunked_upload, self.chunked_upload = self.chunked_upload, None
         
-        if len(self.frames) > 0:
-            # Zapisz plik audio - użyj bardziej wydajnej metody
+        if pcm_buffer is not None and len(pcm_buffer) > 0:
+            # Przytnij ciszę na początku i końcu; nagrania bez mowy nie są wysyłane
+            offset_map = None
+            if self.vad_enabled:
+                bounds = self.find_speech(pcm_buffer)
+                if bounds is None:
+                    self.skip_empty_recording(chunked_upload)
+                    return
+                if self.speech_gate is not None and self.speech_gate.output is not None:
+                    # Pauzy zostały skrócone - wysyłamy przetworzony bufor
+                    pcm_buffer = self.speech_gate.output
+                    offset_map = self.speech_gate.offset_map
+                    print(f"Compressed pauses by {self.speech_gate.compressed_samples / pcm_buffer.rate:.2f} s")
+                else:
+                    pcm_buffer = pcm_buffer.slice(*bounds)
+                    offset_map = SampleOffsetMap(pcm_buffer.rate)
+                    offset_map.add(0, bounds[0])
+            
+            # Numer sesji wyznacza miejsce wyniku w kolejności nagrań
+            session_id = self.dictations.open()
+            
+            # Audio jest kodowane w pamięci w wątku roboczym - bez zapisu na dysk
             try:
-                with wave.open(WAVE_OUTPUT_FILENAME, 'wb') as wave_file:
-                    wave_file.setnchannels(CHANNELS)
-                    wave_file.setsampwidth(self.audio.get_sample_size(FORMAT))
-                    wave_file.setframerate(RATE)
-                    wave_file.writeframes(b''.join(self.frames))
+                self.recording_counter += 1
                 
                 # Wyślij do API - przeprowadzamy równoczesne operacje
                 QApplication.processEvents()  # Odśwież UI podczas oczekiwania
-                self.send_audio_to_whisper(WAVE_OUTPUT_FILENAME, recording_duration)
+                self.send_audio_to_whisper(pcm_buffer, recording_duration, encoder, offset_map, chunked_upload,
+                                           session_id)
             except Exception as e:
-                error_text = f"Błąd podczas zapisu audio: {str(e)}\n\n"
-                self.main_window.transcript_text.append(error_text)
-                
-                # Ukryj popup w przypadku błędu
-                self.popup.hide_popup()
+                if chunked_upload is not None:
+                    chunked_upload.abort()
+                self.abandon_transcription(session_id)
+                self.dictations.complete(session_id, {"error": f"Błąd podczas zapisu audio: {str(e)}",
+                                                      "success": False})
         else:
+            if chunked_upload is not None:
+                chunked_upload.abort()
             self.main_window.transcript_text.append("Błąd: Nie zarejestrowano żadnego dźwięku\n\n")
             self.main_window.transcript_text.append(f"Gotowy do nagrywania ({' + '.join(self.main_window.get_hotkey())})")
             # Ukryj popup
-            self.popup.hide_popup()
+            self.update_popup()
     
-    def send_audio_to_whisper(self, file_path, duration):
-        """Wysyła audio do wybranego API asynchronicznie"""
-        api_settings = self.main_window.get_api_settings()
-        api_provider = api_settings["provider"]
-        api_key = api_settings["key"]
+    def find_speech(self, pcm_buffer):
+        """Returns the (start, end) samples of speech in the recording, or None if there is none"""
+        if self.speech_gate is not None:
+            # Detektor działał w trakcie nagrywania - zostaje tylko końcowe wypełnienie
+            self.speech_gate.finish()
+            bounds = self.speech_gate.bounds()
+        else:
+            bounds = find_speech_bounds(pcm_buffer.samples(), pcm_buffer.rate)
         
-        if not api_key:
-            self.main_window.transcript_text.append(f"Błąd: Brak klucza API {api_provider.upper()}. Ustaw klucz w zakładce Ustawienia.\n\n")
-            
-            # Ukryj popup
-            self.popup.hide_popup()
-            return
+        if bounds is not None:
+            trimmed = len(pcm_buffer) - (bounds[1] - bounds[0])
+            print(f"VAD trimmed {trimmed / pcm_buffer.rate:.2f} s of silence")
+        return bounds
+    
+    def skip_empty_recording(self, chunked_upload=None):
+        """Drops a recording without speech before any network call"""
+        print("No speech detected - skipping API call")
+        if chunked_upload is not None:
+            chunked_upload.abort()
+        self.main_window.transcript_text.append("Nie wykryto mowy - nagranie pominięte\n\n")
+        try:
+            self.main_window.stats_manager.record_skipped_recording()
+        except Exception as e:
+            print(f"Error updating statistics: {str(e)}")
+        self.update_popup()
+    
+    def debug_dump_path(self, codec):
+        """Returns a unique per-recording file path for the debug copy, or None if disabled"""
+        if not self.debug_save_audio:
+            return None
+        file_name = f"recording_{time.strftime('%Y%m%d_%H%M%S')}_{self.recording_counter}.{codec.extension}"
+        return os.path.join(DEBUG_RECORDINGS_DIR, file_name)
+    
+    def active_backend(self):
+        """Backend for the next dictation; a provider whose circuit breaker is open is replaced by another one"""
+        backend = self.selected_backend()
+        if backend is not None and not self.breaker_for(backend).allow():
+            fallback = self.failover_backend(backend)
+            if fallback is not None:
+                print(f"{backend.label} is unavailable, using {fallback.label}")
+                return fallback
+        return backend
+    
+    def selected_backend(self):
+        """The backend selected in the settings or, in automatic mode, the best usable one"""
+        if self.api_provider in AUTO_SELECTION:
+            candidates = []
+            for name, _ in available_backends():
+                backend = get_backend(name)
+                if backend is not None and backend.is_usable(self.api_keys.get(name, "")):
+                    candidates.append(backend)
+            ranked = rank_backends(candidates, AUTO_SELECTION[self.api_provider])
+            return ranked[0] if ranked else None
+        return get_backend(self.api_provider)
+    
+    def api_key_for(self, backend):
+        """API key saved for the backend (empty when none)"""
+        return self.api_keys.get(backend.name, "")
+    
+    def breaker_for(self, backend):
+        """The provider's circuit breaker, created on first use (from any thread)"""
+        with self.breakers_lock:
+            breaker = self.breakers.get(backend.name)
+            if breaker is None:
+                breaker = CircuitBreaker(backend.name, lambda: self.probe_backend(backend),
+                                         on_change=lambda _: self.breaker_state_changed.emit())
+                self.breakers[backend.name] = breaker
+            return breaker
+    
+    def probe_backend(self, backend):
+        """Checks whether a provider with an open breaker answers again (runs in a background thread)"""
+        # Status 401/405 też oznacza działający serwer - liczą się tylko przeciążenia i awarie
+        response = self.sessions.session(backend.name).head(backend.url, timeout=5)
+        return response.status_code not in RETRYABLE_STATUSES
+    
+    def failover_backend(self, backend, payload=None):
+        """Another usable provider with a closed breaker (that accepts the payload, if given), or None"""
+        candidates = []
+        for name, _ in available_backends():
+            other = get_backend(name)
+            if (other is None or other.name == backend.name or not other.is_usable(self.api_key_for(other))
+                    or not self.breaker_for(other).allow()):
+                continue
+            if payload is not None and (payload.codec not in other.codecs or
+                                        (other.max_upload_bytes and payload.nbytes > other.max_upload_bytes)):
+                continue
+            candidates.append(other)
+        ranked = rank_backends(candidates, AUTO_SELECTION.get(self.api_provider, "cost"))
+        return ranked[0] if ranked else None
+    
+    def update_tray_tooltip(self):
+        """Shows the state of the providers' circuit breakers in the tray tooltip"""
+        lines = ["Whisper Transcriber"]
+        with self.breakers_lock:
+            breakers = list(self.breakers.items())
+        for name, breaker in breakers:
+            backend = get_backend(name)
+            lines.append(f"{backend.label if backend else name}: {breaker.describe()}")
+        if hasattr(self.main_window, 'tray_icon'):
+            self.main_window.tray_icon.setToolTip("\n".join(lines))
+    
+    def select_codec(self, backend, rate):
+        """Picks the upload format for the provider (per-provider setting overrides the global one)"""
+        preference = self.provider_codecs.get(backend.name, "default")
+        if preference == "default":
+            preference = self.upload_codec
+        return negotiate_codec(preference, list(backend.codecs), rate)
+    
+    def target_rate(self, backend):
+        """Sample rate the recording is converted to for the provider"""
+        if backend is None:
+            return RATE
+        if backend.local:
+            return backend.sample_rate
+        return self.provider_sample_rates.get(backend.name, RATE)
+    
+    def effective_speedup(self, backend):
+        """Speed-up factor for the provider: the setting capped at the provider's safe maximum"""
+        return min(self.speedup_factor, backend.max_speedup)
+    
+    def create_stream_encoder(self, backend):
+        """Creates the encoder fed while recording for the provider, or None"""
+        # Przyspieszone audio powstaje dopiero po zakończeniu nagrania
+        if (backend is None or backend.local or not self.streaming_encode_enabled
+                or self.effective_speedup(backend) > 1.0):
+            return None
+        codec = self.select_codec(backend, self.capture.rate)
+        try:
+            return create_streaming_encoder(codec, self.capture.rate, self.capture.channels)
+        except Exception as e:
+            print(f"Could not create streaming encoder ({codec.name}): {str(e)}")
+            return None
+    
+    def start_chunked_upload(self, encoder, backend):
+        """Opens an upload fed by the streaming encoder, or returns None when it cannot be used"""
+        if (not self.chunked_upload_enabled or encoder is None or not encoder.streamable or backend is None
+                or not backend.supports_chunked or backend.name in self.chunked_rejected):
+            return None
+        api_key = self.api_key_for(backend)
+        if not backend.is_usable(api_key):
+            return None
         
-        # Wybór API w zależności od dostawcy - uruchamiamy asynchronicznie
-        if api_provider == "openai":
-            worker = Worker(self.send_to_openai_async, file_path, api_key, duration)
-            worker.signals.finished.connect(self.on_transcription_result)
-            worker.signals.error.connect(self.on_transcription_error)
-            self.threadpool.start(worker)
-        elif api_provider == "deepinfra":
-            worker = Worker(self.send_to_deepinfra_async, file_path, api_key, duration)
-            worker.signals.finished.connect(self.on_transcription_result)
-            worker.signals.error.connect(self.on_transcription_error)
-            self.threadpool.start(worker)
+        deadlines = StageDeadlines.for_payload(0, CHUNKED_RESPONSE_AUDIO_SECONDS)
+        upload = ChunkedUpload(backend.url, backend.headers(api_key), backend.file_field,
+                               f"audio.{encoder.codec.extension}", encoder.codec.mime_type, backend.form_fields(),
+                               provider=backend.name, session=self.sessions.session(backend.name),
+                               timeout=(deadlines.connect, deadlines.first_byte))
+        # Nagłówek WAV bez rozmiaru, potem dane prosto z kodera
+        upload.write(encoder.stream_header())
+        encoder.data_listener = upload.write
+        upload.start()
+        return upload
+    
+    def prewarm_connection(self, backend):
+        """Opens the pooled connection to the provider in the background"""
+        if backend is not None and backend.local:
+            # Proces modelu powinien już działać - uruchom go ponownie, jeśli się zakończył
+            backend.warm_up()
+        elif self.prewarm_enabled and backend is not None and backend.url:
+            if self.http_transport == "aiohttp":
+                self.get_async_transport().prewarm(backend.name, backend.url)
+            else:
+                self.sessions.prewarm(backend.name, backend.url)
+    
+    def get_async_transport(self):
+        """The aiohttp transport, started on first use"""
+        if self.async_transport is None:
+            self.async_transport = AsyncTransport(pool_size=MAX_PARALLEL_SEGMENTS)
+        return self.async_transport
+    
+    def abort_chunked_upload(self):
+        """Abandons the upload started at the key press (nothing is transcribed)"""
+        if self.chunked_upload is not None:
+            self.chunked_upload.abort()
+            self.chunked_upload = None
+    
+    def save_debug_recording(self, payload, dump_path):
+        try:
+            os.makedirs(DEBUG_RECORDINGS_DIR, exist_ok=True)
+            payload.write_to(dump_path)
+            print(f"Debug recording saved to: {dump_path}")
+        except Exception as e:
+            print(f"Could not save debug recording: {str(e)}")
+    
+    def complete_result(self, result, payload, offloaded_seconds, offset_map):
+        """Adds upload statistics and maps segment timestamps back to the recording"""
+        result["raw_bytes"] = payload.raw_bytes
+        result["uploaded_bytes"] = payload.nbytes
+        result["encode_offloaded_seconds"] = offloaded_seconds
+        
+        # Znaczniki czasu dostawcy odnoszą się do przyciętego nagrania - przelicz na oryginalne
+        # (pamięć podręczna dostaje je w sekundach przyciętego nagrania - to samo audio może mieć inną ciszę wokół)
+        if offset_map is not None and result.get("segments"):
+            result["clip_segments"] = offset_map.clip_segments(result["segments"])
+            result["segments"] = offset_map.map_segments(result["segments"])
+        return result
+    
+    def finish_chunked_upload(self, upload, backend, encoder, api_key, duration, dump_path=None, offset_map=None,
+                              token=None):
+        """Closes the upload started at the key press and waits for the transcription (runs in a worker thread)"""
+        # Dane zostały już wysłane - zostaje zamknięcie treści i oczekiwanie na odpowiedź
+        payload = encoder.finish()
+        upload.close()
+        response = upload.wait(cancel_token=token)
+        if token is not None and token.cancelled:
+            return self.cancelled_result()
+        print(f"Chunked upload: {upload.sent_bytes} bytes streamed while recording")
+        
+        if dump_path:
+            self.save_debug_recording(payload, dump_path)
+        
+        if upload.rejected:
+            # Punkt końcowy nie przyjmuje treści chunked - wysyłamy cały plik
+            reason = upload.error if response is None else f"HTTP {response.status_code}"
+            print(f"Chunked upload to {upload.provider} failed ({reason}), falling back to whole-file upload")
+            if response is not None:
+                self.chunked_rejected.add(upload.provider)
+            result = self.send_to_backend(backend, payload, api_key, duration, token)
+        elif response.status_code in RETRYABLE_STATUSES:
+            # Przejściowy błąd dostawcy - nagranie jest wysyłane ponownie w całości
+            print(f"Chunked upload to {upload.provider} failed (HTTP {response.status_code}), retrying as whole file")
+            self.breaker_for(backend).record_failure()
+            result = self.send_to_backend(backend, payload, api_key, duration, token)
         else:
-            self.main_window.transcript_text.append(f"Błąd: Nieznany dostawca API: {api_provider}\n\n")
-            
-            # Ukryj popup
-            self.popup.hide_popup()
+            self.breaker_for(backend).record_success()
+            result = self.parse_response(backend, response, duration)
+        self.spool_failed(backend, payload, duration, result)
+        return self.complete_result(result, payload, encoder.feed_seconds, offset_map)
+    
+    def encode_and_send(self, backend, pcm_buffer, codec, api_key, duration, dump_path=None, encoder=None,
+                        offset_map=None, speedup=1.0, spool=True, token=None):
+        """Encodes the clip in memory and uploads it (runs in a worker thread)"""
+        payload, offloaded_seconds = self.prepare_payload(pcm_buffer, codec, dump_path, encoder, offset_map, speedup)
+        result = self.send_to_backend(backend, payload, api_key, duration, token)
+        if spool:
+            self.spool_failed(backend, payload, duration, result)
+        return self.complete_result(result, payload, offloaded_seconds, offset_map)
     
-    def send_to_openai_async(self, file_path, api_key, duration):
-        """Wysyła audio do API OpenAI - wersja asynchroniczna"""
-        url = "https://api.openai.com/v1/audio/transcriptions"
+    async def encode_and_send_async(self, backend, pcm_buffer, codec, api_key, duration, dump_path=None,
+                                    encoder=None, offset_map=None, speedup=1.0, hedge_backend=None, spool=True):
+        """Coroutine version of encode_and_send: encoding in an executor thread, the upload on the event loop"""
+        loop = asyncio.get_running_loop()
+        payload, offloaded_seconds = await loop.run_in_executor(
+            None, self.prepare_payload, pcm_buffer, codec, dump_path, encoder, offset_map, speedup)
         
+        if hedge_backend is None:
+            result = await self.send_to_backend_async(backend, payload, api_key, duration)
+        else:
+            result = await self.send_hedged_async(backend, hedge_backend, payload, api_key, duration)
+        if spool:
+            await loop.run_in_executor(None, self.spool_failed, backend, payload, duration, result)
+        return self.complete_result(result, payload, offloaded_seconds, offset_map)
+    
+    async def send_to_backend_async(self, backend, payload, api_key, duration):
+        """Coroutine version of send_to_backend"""
+        result = await self.send_with_retries_async(backend, payload, api_key, duration)
+        fallback = self.failover_backend(backend, payload) if result.get("transient") else None
+        if fallback is not None:
+            print(f"{backend.label} failed, sending the recording to {fallback.label}")
+            result = await self.send_with_retries_async(fallback, payload, self.api_key_for(fallback), duration)
+        return result
+    
+    async def send_with_retries_async(self, backend, payload, api_key, duration):
+        """Coroutine version of send_with_retries"""
         try:
-            headers = {
-                "Authorization": f"Bearer {api_key}"
-            }
-            
-            with open(file_path, 'rb') as audio_file:
-                files = {
-                    'file': (file_path, audio_file, 'audio/wav'),
-                    'model': (None, 'whisper-1')
-                }
-                response = requests.post(url, headers=headers, files=files)
-            
-            if response.status_code == 200:
-                result = response.json()
-                transcribed_text = result['text']
-                return {
-                    "text": transcribed_text,
-                    "duration": duration,
-                    "success": True
-                }
-            else:
-                return {
-                    "error": f"Błąd OpenAI API: {response.status_code}\n{response.text}",
-                    "success": False
-                }
+            body, headers, deadlines = self.build_request(backend, payload, api_key, duration)
         except Exception as e:
             return {
-                "error": f"Błąd podczas przetwarzania: {str(e)}",
+                "error": f"Błąd podczas przetwarzania {backend.label} API: {str(e)}",
                 "success": False
             }
+        for retry in range(self.retry_policy.attempts):
+            response = error = None
+            try:
+                response = await self.async_transport.post(backend.name, backend.url, headers, body, deadlines)
+            except Exception as e:
+                error = e
+            delay = self.check_attempt(backend, response, error, retry)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        return self.attempt_result(backend, response, error, duration)
+    
+    async def send_hedged_async(self, backend, hedge_backend, payload, api_key, duration):
+        """Sends to the primary provider and, if it is slow, the same payload to the hedge provider; first answer wins"""
+        started = time.perf_counter()
+        result, winner, hedged = await hedge(
+            lambda: self.send_with_retries_async(backend, payload, api_key, duration),
+            lambda: self.send_with_retries_async(hedge_backend, payload, self.api_key_for(hedge_backend), duration),
+            self.hedge_delay_ms / 1000.0)
+        winner_name = (backend.name, hedge_backend.name)[winner]
+        if hedged:
+            print(f"Hedged request to {hedge_backend.name} after {self.hedge_delay_ms} ms: "
+                  f"{winner_name} answered first ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        result["hedges"] = [{"hedged": hedged, "winner": winner_name}]
+        return result
+    
+    def spool_failed(self, backend, payload, duration, result):
+        """Queues the recording on disk when it could not be sent (no network, provider down)"""
+        if not self.spool_enabled or result.get("success") or not result.get("transient"):
+            return
+        try:
+            entry = self.spool.add(payload, backend.name, duration)
+            result["spooled"] = entry.id
+            print(f"Recording queued for later transcription ({payload.nbytes} bytes, entry {entry.id})")
+        except Exception as e:
+            print(f"Could not queue the recording: {str(e)}")
     
-    def send_to_deepinfra_async(self, file_path, api_key, duration):
-        """Wysyła audio do API DeepInfra - wersja asynchroniczna"""
-        url = "https://api.deepinfra.com/v1/inference/openai/whisper-large-v3-turbo"
+    def send_spooled(self, entry, payload):
+        """Uploads a queued recording (runs in the drainer thread)"""
+        backend = get_backend(entry.provider)
+        if backend is None:
+            return {"error": f"Nieznany dostawca API: {entry.provider}", "success": False}
+        if (not backend.is_usable(self.api_key_for(backend)) or not self.breaker_for(backend).allow()
+                or payload.codec not in backend.codecs):
+            backend = self.failover_backend(backend, payload)
+            if backend is None:
+                return {"error": "Brak dostępnego dostawcy", "success": False, "transient": True}
+        return self.send_to_backend(backend, payload, self.api_key_for(backend), entry.duration)
+    
+    def on_spooled_result(self, entry, result):
+        """Delivers the transcription of a queued recording, in recording order"""
+        recorded = time.strftime("%H:%M", time.localtime(entry.created))
+        if not result["success"]:
+            self.main_window.transcript_text.append(f"Nagranie z {recorded} z kolejki: {result['error']}\n\n")
+            return
         
+        # Tekst trafia do schowka - wklejenie w aktywne okno mogłoby trafić w przypadkowe miejsce
+        transcribed_text = result["text"]
+        self.main_window.transcript_text.append(f"[{recorded}] {transcribed_text}\n\n")
+        pyperclip.copy(transcribed_text)
         try:
-            headers = {
-                "Authorization": f"bearer {api_key}"
+            self.main_window.stats_manager.update_recording_stats(entry.duration, len(transcribed_text))
+        except Exception as e:
+            print(f"Error updating statistics: {str(e)}")
+        if self.tray_notifications_enabled and hasattr(self.main_window, 'tray_icon'):
+            self.main_window.tray_icon.showMessage("Whisper Transcriber",
+                                                   f"Queued recording from {recorded} transcribed and copied",
+                                                   QSystemTrayIcon.MessageIcon.Information, 2000)
+    
+    def hedge_backend_for(self, backend, codec):
+        """Second provider for hedged requests, or None when hedging is off or no provider can take the payload"""
+        if not self.hedge_enabled:
+            return None
+        if self.hedge_provider == "auto":
+            # Najszybszy inny skonfigurowany dostawca
+            candidates = []
+            for name, _ in available_backends():
+                other = get_backend(name)
+                if other is not None and other.name != backend.name and other.is_usable(self.api_key_for(other)):
+                    candidates.append(other)
+            ranked = rank_backends(candidates, "speed")
+            hedge_backend = ranked[0] if ranked else None
+        else:
+            hedge_backend = get_backend(self.hedge_provider)
+        if (hedge_backend is None or hedge_backend.name == backend.name
+                or not hedge_backend.is_usable(self.api_key_for(hedge_backend))
+                or codec.name not in hedge_backend.codecs):
+            return None
+        return hedge_backend
+    
+    def prepare_payload(self, pcm_buffer, codec, dump_path=None, encoder=None, offset_map=None, speedup=1.0):
+        """Speeds up and encodes the clip; returns (payload, seconds of encoding done while recording)"""
+        offloaded_seconds = 0.0
+        if speedup > 1.0 and pcm_buffer.channels == 1:
+            # Przyspieszenie z zachowaniem wysokości dźwięku - krótsze nagranie, mniejszy koszt
+            started = time.perf_counter()
+            original_duration = pcm_buffer.duration
+            pcm_buffer = PCMBuffer.from_samples(time_compress(pcm_buffer.samples(), pcm_buffer.rate, speedup),
+                                                pcm_buffer.rate)
+            encoder = None
+            if offset_map is not None:
+                offset_map.time_scale = speedup
+            print(f"Sped up {original_duration:.2f} s to {pcm_buffer.duration:.2f} s ({speedup:g}x) "
+                  f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+        
+        if encoder is not None and not encoder.failed:
+            # Większość pracy została wykonana podczas nagrywania
+            payload = encoder.finish()
+            offloaded_seconds = encoder.feed_seconds
+            print(f"Streaming encoder ({codec.name}): {encoder.feed_seconds * 1000:.1f} ms encoded while recording, "
+                  f"{encoder.finish_seconds * 1000:.1f} ms after release")
+        else:
+            started = time.perf_counter()
+            payload = codec.encode(pcm_buffer)
+            print(f"Encoded clip ({codec.name}) in {(time.perf_counter() - started) * 1000:.1f} ms after release")
+        print(f"Encoded {payload.raw_bytes} PCM bytes as {codec.name}: {payload.nbytes} bytes")
+        
+        if dump_path:
+            self.save_debug_recording(payload, dump_path)
+        return payload, offloaded_seconds
+    
+    def send_audio_to_whisper(self, pcm_buffer, duration, encoder=None, offset_map=None, chunked_upload=None,
+                              session_id=None):
+        """Wysyła audio do wybranego API asynchronicznie"""
+        if session_id is None:
+            session_id = self.dictations.open()
+        
+        # Dostawca z rejestru - wybrany w ustawieniach lub automatycznie
+        backend = self.active_backend()
+        if backend is None:
+            if chunked_upload is not None:
+                chunked_upload.abort()
+            self.dictations.complete(session_id, {"error": f"Błąd: Nieznany dostawca API: {self.api_provider}",
+                                                  "success": False})
+            return
+        
+        api_key = self.api_key_for(backend)
+        if not backend.is_usable(api_key):
+            if chunked_upload is not None:
+                chunked_upload.abort()
+            self.dictations.complete(session_id, {
+                "error": f"Błąd: Brak klucza API {backend.label}. Ustaw klucz w zakładce Ustawienia.",
+                "success": False})
+            return
+        
+        # Mapa przesunięć zawsze istnieje - wynik z pamięci podręcznej jest na nią nakładany
+        if offset_map is None:
+            offset_map = SampleOffsetMap(pcm_buffer.rate)
+        
+        if backend.local:
+            # Model lokalny dostaje PCM bezpośrednio - bez kodowania, wysyłania i dzielenia na segmenty
+            if chunked_upload is not None:
+                chunked_upload.abort()
+            key, cached = self.check_cache(backend, pcm_buffer, "pcm", offset_map=offset_map, duration=duration)
+            if cached is not None:
+                self.on_transcription_result(cached, session_id=session_id)
+                return
+            token = self.begin_transcription(session_id)
+            worker = Worker(self.transcribe_locally, backend, pcm_buffer, duration, offset_map, token=token)
+            worker.signals.finished.connect(
+                functools.partial(self.on_transcription_result, cache_key=key, token=token, session_id=session_id))
+            worker.signals.error.connect(
+                functools.partial(self.on_transcription_error, token=token, session_id=session_id))
+            self.threadpool.start(worker)
+            return
+        
+        # Użyj kodera strumieniowego, jeśli jego format nadal pasuje do dostawcy
+        if encoder is not None and encoder.codec.name in backend.codecs:
+            codec = encoder.codec
+        else:
+            codec = self.select_codec(backend, pcm_buffer.rate)
+            encoder = None
+        dump_path = self.debug_dump_path(codec)
+        speedup = self.effective_speedup(backend)
+        
+        # Opcjonalny drugi dostawca dla wolnych odpowiedzi - to samo nagranie musi pasować obu
+        hedge_backend = self.hedge_backend_for(backend, codec)
+        if hedge_backend is not None:
+            speedup = min(speedup, self.effective_speedup(hedge_backend))
+        
+        # Nagranie transkrybowane już wcześniej - bez wysyłania
+        key, cached = self.check_cache(backend, pcm_buffer, codec.name, speedup, offset_map, duration)
+        if cached is not None:
+            if chunked_upload is not None:
+                chunked_upload.abort()
+            self.on_transcription_result(cached, session_id=session_id)
+            return
+        token = self.begin_transcription(session_id)
+        on_result = functools.partial(self.on_transcription_result, cache_key=key, token=token, session_id=session_id)
+        
+        # Wysyłanie rozpoczęte przy wciśnięciu klawisza pasuje tylko do tego samego dostawcy i kodera
+        if chunked_upload is not None and (chunked_upload.provider != backend.name or encoder is None):
+            chunked_upload.abort()
+            chunked_upload = None
+        
+        # Długie nagrania są dzielone na segmenty transkrybowane równolegle
+        ranges = self.plan_segments(backend, pcm_buffer)
+        if len(ranges) > 1:
+            if chunked_upload is not None:
+                chunked_upload.abort()
+            self.send_segments(backend, pcm_buffer, ranges, codec, api_key, duration, offset_map, speedup,
+                               hedge_backend, on_result, token)
+            return
+        
+        if chunked_upload is not None:
+            # Wysyłanie chunked korzysta z generatora requests - zawsze przez requests
+            worker = Worker(self.finish_chunked_upload, chunked_upload, backend, encoder, api_key, duration, dump_path,
+                            offset_map, token=token)
+        elif self.http_transport == "aiohttp" or hedge_backend is not None:
+            # Żądanie jako korutyna - żaden wątek nie czeka na odpowiedź, a przegrany
+            # wyścig z drugim dostawcą można anulować
+            signals = self.get_async_transport().run(self.encode_and_send_async(
+                backend, pcm_buffer, codec, api_key, duration, dump_path, encoder, offset_map, speedup, hedge_backend))
+            signals.finished.connect(on_result)
+            # Anulowanie przerywa korutynę - zamyka połączenie i zwalnia je od razu
+            token.add_callback(signals.cancel)
+            return
+        else:
+            worker = Worker(self.encode_and_send, backend, pcm_buffer, codec, api_key, duration, dump_path, encoder,
+                            offset_map, speedup, token=token)
+        worker.signals.finished.connect(on_result)
+        worker.signals.error.connect(functools.partial(self.on_transcription_error, token=token, session_id=session_id))
+        self.threadpool.start(worker)
+    
+    def begin_transcription(self, session_id):
+        """Registers a dictation waiting for its transcription; returns its cancel token"""
+        token = CancelToken()
+        self.in_flight[token] = session_id
+        self.update_cancel_action()
+        
+        # Każde trwające dyktowanie zajmuje wątek czekający na sieć - nakładające się nagrania nie czekają na pulę
+        if self.threadpool.maxThreadCount() < len(self.in_flight):
+            self.threadpool.setMaxThreadCount(len(self.in_flight))
+        return token
+    
+    def end_transcription(self, token):
+        """Unregisters a finished dictation; False if it was cancelled (its result is dropped)"""
+        if token is None:
+            return True
+        self.in_flight.pop(token, None)
+        self.update_cancel_action()
+        return not token.cancelled
+    
+    def abandon_transcription(self, session_id):
+        """Cancels and unregisters the session's token when sending failed after it was registered"""
+        for token, token_session in list(self.in_flight.items()):
+            if token_session == session_id:
+                token.cancel()
+                self.end_transcription(token)
+    
+    def cancelled_result(self):
+        return {"error": "Transkrypcja anulowana", "success": False, "cancelled": True}
+    
+    def check_cache(self, backend, pcm_buffer, codec_name, speedup=1.0, offset_map=None, duration=None):
+        """Content address of the clip and its cached transcription (None on a miss or with the cache off).
+
+        A hit gets this recording's duration, and its segments (cached in
+        seconds of the processed clip) are mapped through this recording's
+        offset_map; nothing has been sped up yet, so its time_scale is 1.
+        """
+        if not self.cache_enabled:
+            return None, None
+        key = cache_key(pcm_buffer, backend.cache_identity(), codec_name, speedup)
+        cached = self.cache.get(key)
+        try:
+            self.main_window.stats_manager.record_cache_lookup(cached is not None)
+        except Exception as e:
+            print(f"Error updating statistics: {str(e)}")
+        if cached is not None:
+            print(f"Transcription cache hit ({backend.name}, {pcm_buffer.duration:.1f} s)")
+            cached["cached"] = True
+            if duration is not None:
+                cached["duration"] = duration
+            if offset_map is not None and cached.get("segments"):
+                cached["segments"] = offset_map.map_segments(cached["segments"])
+        return key, cached
+    
+    def transcribe_locally(self, backend, pcm_buffer, duration, offset_map=None, token=None):
+        """Transcribes the clip with the local model (runs in a worker thread)"""
+        result = backend.transcribe(pcm_buffer, duration, self.partial_transcript.emit, token)
+        if offset_map is not None and result.get("segments"):
+            result["clip_segments"] = offset_map.clip_segments(result["segments"])
+            result["segments"] = offset_map.map_segments(result["segments"])
+        return result
+    
+    def plan_segments(self, backend, pcm_buffer):
+        """Sample ranges to transcribe separately; a single range when the clip is short enough"""
+        max_seconds = self.max_segment_seconds if self.segmented_enabled else None
+        
+        # Górne oszacowanie rozmiaru to nieskompresowany PCM - kodeki tylko go zmniejszają
+        limit = backend.max_upload_bytes
+        if limit:
+            bytes_per_second = pcm_buffer.rate * pcm_buffer.channels * pcm_buffer.sample_width
+            limit_seconds = limit * 0.9 / bytes_per_second - SEGMENT_OVERLAP_SECONDS
+            if max_seconds is None or max_seconds > limit_seconds:
+                max_seconds = limit_seconds
+        
+        if max_seconds is None or pcm_buffer.duration <= max_seconds:
+            return [(0, len(pcm_buffer))]
+        return split_at_silences(pcm_buffer.samples(), pcm_buffer.rate, max_seconds, SEGMENT_OVERLAP_SECONDS)
+    
+    def send_segments(self, backend, pcm_buffer, ranges, codec, api_key, duration, offset_map=None, speedup=1.0,
+                      hedge_backend=None, on_result=None, token=None):
+        """Transcribes the segments of a long clip concurrently; results are stitched in order"""
+        print(f"Splitting {pcm_buffer.duration:.1f} s clip into {len(ranges)} segments: "
+              f"{', '.join(f'{(end - start) / pcm_buffer.rate:.1f} s' for start, end in ranges)}")
+        collector = SegmentedTranscription(ranges, pcm_buffer.rate, duration, speedup, offset_map, parent=self)
+        collector.finished.connect(on_result or self.on_transcription_result)
+        
+        if self.http_transport == "aiohttp" or hedge_backend is not None:
+            transport = self.get_async_transport()
+            for index, (start, end) in enumerate(ranges):
+                signals = transport.run(self.transcribe_segment_async(
+                    index, backend, pcm_buffer.slice(start, end), codec, api_key, duration, speedup, hedge_backend))
+                signals.finished.connect(collector.on_segment_result)
+                if token is not None:
+                    token.add_callback(signals.cancel)
+            # Anulowane korutyny nie zgłaszają wyników - kolektor nie doczekałby się ostatniego segmentu
+            if token is not None:
+                token.add_callback(collector.abandon)
+            return
+        
+        # Żądania czekają głównie na sieć - pula nie powinna ograniczać ich do liczby rdzeni
+        parallel = min(len(ranges), MAX_PARALLEL_SEGMENTS)
+        if self.threadpool.maxThreadCount() < parallel:
+            self.threadpool.setMaxThreadCount(parallel)
+        
+        for index, (start, end) in enumerate(ranges):
+            worker = Worker(self.transcribe_segment, index, backend, pcm_buffer.slice(start, end), codec, api_key,
+                            duration, speedup, token=token)
+            worker.signals.finished.connect(collector.on_segment_result)
+            self.threadpool.start(worker)
+    
+    def transcribe_segment(self, index, backend, segment, codec, api_key, duration, speedup=1.0, token=None):
+        """Encodes and sends one segment (runs in a worker thread); the result carries its index"""
+        try:
+            result = self.encode_and_send(backend, segment, codec, api_key, duration, speedup=speedup, spool=False,
+                                          token=token)
+        except Exception as e:
+            result = {"error": str(e), "success": False}
+        result["segment_index"] = index
+        return result
+    
+    async def transcribe_segment_async(self, index, backend, segment, codec, api_key, duration, speedup=1.0,
+                                       hedge_backend=None):
+        """Coroutine version of transcribe_segment"""
+        try:
+            result = await self.encode_and_send_async(backend, segment, codec, api_key, duration, speedup=speedup,
+                                                      hedge_backend=hedge_backend, spool=False)
+        except Exception as e:
+            result = {"error": str(e), "success": False}
+        result["segment_index"] = index
+        return result
+    
+    def send_to_backend(self, backend, payload, api_key, duration, token=None):
+        """Wysyła audio do API dostawcy (w wątku roboczym); po awarii dostawcy - do innego"""
+        result = self.send_with_retries(backend, payload, api_key, duration, token)
+        fallback = self.failover_backend(backend, payload) if result.get("transient") else None
+        if fallback is not None:
+            print(f"{backend.label} failed, sending the recording to {fallback.label}")
+            result = self.send_with_retries(fallback, payload, self.api_key_for(fallback), duration, token)
+        return result
+    
+    def build_request(self, backend, payload, api_key, duration, token=None):
+        """Request body, headers and stage deadlines; the idempotency key is the same for every retry"""
+        # Treść żądania czytana bezpośrednio z bufora audio w pamięci
+        body = backend.build_body(payload)
+        headers = backend.headers(api_key)
+        headers["Content-Type"] = body.content_type
+        headers["Idempotency-Key"] = uuid.uuid4().hex
+        
+        # Limity etapów rosną z rozmiarem wysyłki i długością nagrania
+        deadlines = StageDeadlines.for_payload(payload.nbytes, duration)
+        body.time_limit = deadlines.connect + deadlines.upload
+        body.cancel_token = token
+        return body, headers, deadlines
+    
+    def send_with_retries(self, backend, payload, api_key, duration, token=None):
+        """Sends the request, retrying transient failures with backoff"""
+        try:
+            body, headers, deadlines = self.build_request(backend, payload, api_key, duration, token)
+        except Exception as e:
+            return {
+                "error": f"Błąd podczas przetwarzania {backend.label} API: {str(e)}",
+                "success": False
             }
-            
-            with open(file_path, 'rb') as audio_file:
-                files = {
-                    'audio': (file_path, audio_file, 'audio/wav'),
-                }
-                response = requests.post(url, headers=headers, files=files)
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # DeepInfra może zwrócić tekst na kilka sposobów
-                if "text" in result and result["text"]:
-                    transcribed_text = result["text"]
-                elif "segments" in result and result["segments"]:
-                    # Łączymy segmenty tekstu
-                    segments = [seg["text"] for seg in result["segments"] if "text" in seg]
-                    transcribed_text = " ".join(segments)
+        try:
+            for retry in range(self.retry_policy.attempts):
+                response = error = None
+                try:
+                    body.reset()
+                    started = time.perf_counter()
+                    response = self.sessions.session(backend.name).post(
+                        backend.url, headers=headers, data=body, timeout=(deadlines.connect, deadlines.first_byte))
+                    print(f"{backend.name} request via requests: {(time.perf_counter() - started) * 1000:.0f} ms")
+                except TranscriptionCancelled:
+                    raise
+                except Exception as e:
+                    error = e
+                if token is not None and token.cancelled:
+                    raise TranscriptionCancelled()
+                delay = self.check_attempt(backend, response, error, retry)
+                if delay is None:
+                    break
+                if token is not None:
+                    token.sleep(delay)
                 else:
-                    transcribed_text = "Brak tekstu w odpowiedzi API."
-                
-                return {
-                    "text": transcribed_text,
-                    "duration": duration,
-                    "success": True
-                }
-            else:
-                return {
-                    "error": f"Błąd DeepInfra API: {response.status_code}\n{response.text}",
-                    "success": False
-                }
+                    time.sleep(delay)
+        except TranscriptionCancelled:
+            return self.cancelled_result()
+        return self.attempt_result(backend, response, error, duration)
+    
+    def check_attempt(self, backend, response, error, retry):
+        """Records an attempt in the provider's breaker; returns the wait before the next retry, or None to stop"""
+        breaker = self.breaker_for(backend)
+        if response is not None and response.status_code not in RETRYABLE_STATUSES:
+            breaker.record_success()
+            return None
+        breaker.record_failure()
+        if retry + 1 >= self.retry_policy.attempts or not breaker.allow():
+            return None
+        # 429 i 503 oznaczają odrzucenie bez przetwarzania - inne błędy ponawiamy tylko dla żądań idempotentnych
+        if not backend.idempotent and (response is None or response.status_code not in (429, 503)):
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        delay = self.retry_policy.delay(retry, retry_after)
+        if delay is not None:
+            reason = f"HTTP {response.status_code}" if response is not None else str(error)
+            print(f"{backend.name} request failed ({reason}), retry {retry + 1} in {delay:.1f} s")
+        return delay
+    
+    def attempt_result(self, backend, response, error, duration):
+        """Result of the last attempt; transient failures are marked so the recording can go to another provider"""
+        if response is None:
+            return {
+                "error": f"Błąd podczas przetwarzania {backend.label} API: {str(error)}",
+                "success": False,
+                "transient": True
+            }
+        result = self.parse_response(backend, response, duration)
+        if response.status_code in RETRYABLE_STATUSES:
+            result["transient"] = True
+        return result
+    
+    def parse_response(self, backend, response, duration):
+        """Zamienia odpowiedź dostawcy na wynik transkrypcji"""
+        try:
+            return backend.parse(response, duration)
         except Exception as e:
             return {
-                "error": f"Błąd podczas przetwarzania DeepInfra API: {str(e)}",
+                "error": f"Błąd podczas przetwarzania odpowiedzi {backend.label}: {str(e)}",
                 "success": False
             }
     
-    def on_transcription_result(self, result):
+    def on_transcription_result(self, result, cache_key=None, token=None, session_id=None):
         """Obsługuje wynik transkrypcji z wątku roboczego"""
+        # Wynik anulowanego dyktowania jest pomijany - popup został już ukryty
+        if not self.end_transcription(token):
+            if session_id is not None:
+                self.dictations.drop(session_id)
+            return
+        
+        # Statystyki zabezpieczania żądań - również dla nieudanych transkrypcji
+        if result.get("hedges"):
+            try:
+                self.main_window.stats_manager.record_hedges(result["hedges"])
+            except Exception as e:
+                print(f"Error updating statistics: {str(e)}")
+        
+        if result["success"] and cache_key is not None and not result.get("cached"):
+            # Znaczniki czasu sprzed przeliczenia na to nagranie
+            self.cache.put(cache_key, dict(result, segments=result.get("clip_segments", result.get("segments"))))
+        
+        # Wynik czeka, aż wcześniejsze nagrania zostaną przetworzone
+        if session_id is None:
+            self.present_result(None, result)
+        else:
+            self.dictations.complete(session_id, result)
+    
+    def present_result(self, session_id, result):
+        """Shows and pastes a transcription; called in recording order"""
         if result["success"]:
             transcribed_text = result["text"]
             duration = result["duration"]
@@ -527,6 +1310,9 @@ class WhisperTranscriber(QObject):
             try:
                 # Update statistics in the stats_manager
                 self.main_window.stats_manager.update_recording_stats(duration, len(transcribed_text))
+                if "uploaded_bytes" in result:
+                    self.main_window.stats_manager.update_upload_stats(
+                        result["raw_bytes"], result["uploaded_bytes"], result.get("encode_offloaded_seconds", 0.0))
                 
                 # Force refresh of the main view if it's currently visible
                 if self.main_window.isVisible() and hasattr(self.main_window, 'main_button'):
@@ -538,23 +1324,43 @@ class WhisperTranscriber(QObject):
             
             # Emituj sygnał o zakończeniu transkrypcji
             self.transcription_complete.emit(transcribed_text, duration)
+            
+            # Połączenie działa - kolejka nie musi czekać na kolejną próbę
+            if self.spool.pending():
+                self.spool_drainer.wake(force=True)
+        elif "spooled" in result:
+            pending = len(self.spool.pending())
+            self.main_window.transcript_text.append(
+                f"{result['error']}\nNagranie zapisane w kolejce - zostanie przetworzone po przywróceniu połączenia "
+                f"(oczekujące: {pending})\n\n")
+            self.spool_drainer.wake()
         else:
             # W przypadku błędu
             error_text = result["error"] + "\n\n"
             self.main_window.transcript_text.append(error_text)
         
         # Ukryj popup
-        self.popup.hide_popup()
+        self.update_popup()
 
-    def on_transcription_error(self, error_message):
+    def on_transcription_error(self, error_message, token=None, session_id=None):
         """Handles errors during transcription"""
-        error_text = f"Błąd transkrypcji: {error_message}\n\n"
-        self.main_window.transcript_text.append(error_text)
-        
-        # Hide processing popup
-        if hasattr(self, 'popup'):
+        if not self.end_transcription(token):
+            if session_id is not None:
+                self.dictations.drop(session_id)
+            return
+        self.on_transcription_result({"error": f"Błąd transkrypcji: {error_message}", "success": False},
+                                     session_id=session_id)
+    
+    def update_popup(self):
+        """Hides the popup once nothing is recorded or transcribed; otherwise it keeps its state"""
+        if hasattr(self, 'popup') and not self.recording and not self.dictations.pending:
             self.popup.hide_popup()
     
+    def on_partial_transcript(self, text):
+        """A growing local hypothesis is shown unless the popup shows the next recording"""
+        if not self.recording:
+            self.popup.show_partial(text)
+    
     def paste_text_to_clipboard(self, text):
         """Copies text to clipboard and simulates pasting if auto-paste is enabled"""
         # Copy to clipboard
@@ -577,7 +1383,23 @@ class WhisperTranscriber(QObject):
         """Aktualizuje ustawienia API"""
         self.api_provider = settings.get("provider", "openai")
         self.api_key = settings.get("key", "")
+        self.api_keys = dict(settings.get("keys", {}))
+        
+        # Serwer zgodny z API OpenAI (np. własny) - adres i model z ustawień
+        compatible = get_backend("openai_compatible")
+        if compatible is not None:
+            compatible.configure(settings.get("base_url", ""), settings.get("model", ""))
+        
+        # Lokalny model - proces z modelem startuje od razu, żeby pierwsze dyktowanie nie czekało na wczytanie
+        local = get_backend("local")
+        if local is not None:
+            local.configure(settings.get("local_model_dir", ""), settings.get("local_quantize", True))
+            if self.api_provider == "local":
+                local.warm_up()
         print(f"Zaktualizowano ustawienia API: {self.api_provider}")
+        
+        # Nowe klucze mogą udostępnić dostawcę - kolejka nie czeka na koniec przerwy
+        self.spool_drainer.wake(force=True)
 
     def update_hotkeys(self, new_hotkeys):
         """Updates hotkey settings in keyboard handler"""
@@ -602,99 +1424,112 @@ class WhisperTranscriber(QObject):
         else:
             print(f"Unknown option: {option_name}")
 
+    def update_audio_settings(self, settings):
+        """Applies recording settings and arms or disarms the microphone"""
+        self.armed_enabled = settings.get("armed_enabled", False)
+        self.preroll_ms = settings.get("preroll_ms", 500)
+        self.debug_save_audio = settings.get("debug_save_audio", False)
+        self.upload_codec = settings.get("upload_codec", "auto")
+        self.provider_codecs = settings.get("provider_codecs", {})
+        self.streaming_encode_enabled = settings.get("streaming_encode_enabled", True)
+        self.chunked_upload_enabled = settings.get("chunked_upload_enabled", False)
+        self.segmented_enabled = settings.get("segmented_enabled", True)
+        self.max_segment_seconds = settings.get("max_segment_seconds", 30)
+        self.prewarm_enabled = settings.get("prewarm_enabled", True)
+        self.http_transport = settings.get("http_transport", "requests")
+        self.hedge_enabled = settings.get("hedge_enabled", False)
+        self.hedge_delay_ms = settings.get("hedge_delay_ms", 2000)
+        self.hedge_provider = settings.get("hedge_provider", "auto")
+        self.spool_enabled = settings.get("spool_enabled", True)
+        self.spool.max_bytes = settings.get("spool_max_mb", 200) * 1024 * 1024
+        self.cache_enabled = settings.get("cache_enabled", True)
+        self.vad_enabled = settings.get("vad_enabled", True)
+        self.compress_pauses_enabled = settings.get("compress_pauses_enabled", False)
+        self.max_pause_ms = settings.get("max_pause_ms", 1000)
+        self.speedup_factor = settings.get("speedup_factor", 1.0)
+        self.provider_sample_rates = settings.get("provider_sample_rates", {})
+        self.meter_debug_overlay = settings.get("meter_debug_overlay", False)
+        if hasattr(self, 'popup'):
+            self.popup.set_debug_overlay(self.meter_debug_overlay)
+        
+        # Zmiana formatu urządzenia wymaga ponownego otwarcia strumienia
+        native_capture = settings.get("native_capture", True)
+        if native_capture != self.capture.native_capture:
+            self.capture.native_capture = native_capture
+            if not self.recording:
+                self.capture.close()
+        print(f"Recording settings updated: armed={self.armed_enabled}, pre-roll={self.preroll_ms} ms")
+        self.update_arming()
+    
+    def update_arming(self):
+        """Keeps the selected device's stream warm when armed mode is enabled"""
+        if self.recording:
+            return  # Zastosowane po zakończeniu nagrywania
+        
+        if not self.armed_enabled:
+            self.capture.disarm()
+            return
+        
+        input_device = self.resolve_input_device()
+        if input_device is None:
+            self.capture.disarm()
+            return
+        
+        try:
+            self.capture.arm(input_device, self.preroll_ms)
+        except Exception as e:
+            print(f"Could not arm microphone: {str(e)}")
+            self.capture.disarm()
+    
+    def on_microphone_changed(self, mic_name):
+        """Handles microphone change from the settings view"""
+        self.update_microphone(mic_name)
+        self.update_arming()
+    
     def update_microphone(self, mic_name):
         """Updates the selected microphone"""
-        # If no microphone name is provided, use the default device
-        if not mic_name:
-            try:
-                default_device_info = self.audio.get_default_input_device_info()
-                if default_device_info and default_device_info['maxInputChannels'] > 0:
-                    self.selected_mic_index = default_device_info['index']
-                    device_name = default_device_info['name']
-                    # Ensure proper encoding for display
-                    try:
-                        # Try to properly encode device name for display if it contains non-ASCII characters
-                        device_name = device_name.encode('latin1').decode('utf-8')
-                    except (UnicodeDecodeError, UnicodeEncodeError):
-                        pass  # Keep original if encoding conversion fails
-                    print(f"Using default microphone: {device_name} (index: {self.selected_mic_index})")
-                else:
-                    self.selected_mic_index = None
-                    print("No valid default input device found")
-            except Exception as e:
-                print(f"Could not get default input device: {str(e)}")
-                self.selected_mic_index = None
-            return
+        device_info = None
         
-        # If a microphone name is provided, try to find it
-        found = False
-        for i in range(self.audio.get_device_count()):
-            device_info = self.audio.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0:  # Only consider input devices
-                name = device_info['name']
-                # Try to properly encode device name for comparison
-                try:
-                    name_utf8 = name.encode('latin1').decode('utf-8')
-                except (UnicodeDecodeError, UnicodeEncodeError):
-                    name_utf8 = name  # Keep original if encoding conversion fails
-                
-                if name == mic_name or name_utf8 == mic_name:
-                    self.selected_mic_index = i
-                    print(f"Selected microphone: {name_utf8} (index: {i})")
-                    found = True
-                    break
+        # If a microphone name is provided, try to find it (exact match, then partial)
+        if mic_name:
+            device_info = self.device_registry.find_input(mic_name)
+            if device_info:
+                print(f"Selected microphone: {device_info['display_name']} (index: {device_info['index']})")
+            else:
+                print(f"Warning: Could not find microphone: {mic_name}")
+                device_info = self.device_registry.find_input_partial(mic_name)
+                if device_info:
+                    print(f"Found similar microphone: {device_info['display_name']} (index: {device_info['index']})")
         
-        if not found:
-            print(f"Warning: Could not find microphone: {mic_name}")
-            # Try to find any microphone that contains the name (partial match)
-            for i in range(self.audio.get_device_count()):
-                device_info = self.audio.get_device_info_by_index(i)
-                if device_info['maxInputChannels'] > 0:
-                    name = device_info['name']
-                    # Try to properly encode device name for comparison
-                    try:
-                        name_utf8 = name.encode('latin1').decode('utf-8')
-                    except (UnicodeDecodeError, UnicodeEncodeError):
-                        name_utf8 = name
-                    
-                    if mic_name in name or mic_name in name_utf8:
-                        self.selected_mic_index = i
-                        print(f"Found similar microphone: {name_utf8} (index: {i})")
-                        found = True
-                        break
-            
-            # If still not found, use the default input device
-            if not found:
-                try:
-                    default_device_info = self.audio.get_default_input_device_info()
-                    if default_device_info and default_device_info['maxInputChannels'] > 0:
-                        self.selected_mic_index = default_device_info['index']
-                        device_name = default_device_info['name']
-                        # Ensure proper encoding for display
-                        try:
-                            device_name = device_name.encode('latin1').decode('utf-8')
-                        except (UnicodeDecodeError, UnicodeEncodeError):
-                            pass
-                        print(f"Using default microphone: {device_name} (index: {self.selected_mic_index})")
-                    else:
-                        self.selected_mic_index = None
-                        print("No valid default input device found")
-                except Exception as e:
-                    print(f"Could not get default input device: {str(e)}")
-                    self.selected_mic_index = None
+        # If no microphone name is provided or it was not found, use the default device
+        if device_info is None:
+            device_info = self.device_registry.default_input()
+            if device_info:
+                print(f"Using default microphone: {device_info['display_name']} (index: {device_info['index']})")
+            else:
+                print("No valid default input device found")
+        
+        self.selected_mic_index = device_info['index'] if device_info else None
+    
+    def on_audio_reinitializing(self):
+        """Closes streams before the shared PyAudio instance is replaced"""
+        self.capture.close()
+        self.cue_player.close()
+    
+    def on_devices_changed(self):
+        """Picks up the new PyAudio instance and re-resolves the microphone after a rescan"""
+        self.audio = self.device_registry.audio
+        self.capture.audio = self.audio
+        self.cue_player.audio = self.audio
+        self.update_microphone(self.main_window.get_selected_microphone())
+        self.update_arming()
 
     def check_microphone_availability(self):
         """Checks if any microphones are available and shows a message if not"""
-        has_microphone = False
-        
-        for i in range(self.audio.get_device_count()):
-            device_info = self.audio.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0:
-                has_microphone = True
-                print(f"Available microphone: {device_info['name']} (index: {i})")
-                break
-        
-        if not has_microphone:
+        if self.device_registry.has_input_devices():
+            device_info = self.device_registry.input_devices()[0]
+            print(f"Available microphone: {device_info['name']} (index: {device_info['index']})")
+        else:
             error_msg = "Brak wykrytych mikrofonów w systemie. Proszę podłączyć mikrofon i zrestartować aplikację lub przejść do Ustawień, aby odświeżyć listę mikrofonów."
             print(error_msg)
             
@@ -706,6 +1541,8 @@ class WhisperTranscriber(QObject):
             ))
 
 def main():
+    # Proces lokalnego modelu w spakowanej aplikacji (Windows)
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     
     # Ustaw możliwości zasobnika systemowego
@@ -714,11 +1551,16 @@ def main():
     else:
         QApplication.setQuitOnLastWindowClosed(False)  # Nie zamykaj aplikacji po zamknięciu ostatniego okna
     
-    main_window = WhisperMainWindow()
+    # Jedna instancja PyAudio i jedno wyliczenie urządzeń dla całej aplikacji
+    device_registry = DeviceRegistry()
+    device_registry.start_watching()
+    
+    main_window = WhisperMainWindow(device_registry)
     transcriber = WhisperTranscriber(main_window)
     
     # Upewnij się, że PyAudio zostanie poprawnie zamknięty przy zamykaniu aplikacji
-    app.aboutToQuit.connect(lambda: transcriber.audio.terminate() if hasattr(transcriber, 'audio') else None)
+    app.aboutToQuit.connect(transcriber.capture.close)
+    app.aboutToQuit.connect(device_registry.terminate)
     
     main_window.show()
     sys.exit(app.exec())
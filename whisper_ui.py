@@ -12,6 +12,10 @@ from PyQt6.QtCore import Qt, pyqtSignal, QSettings, QEvent, QSize, QPoint
 from PyQt6.QtGui import QFont, QIcon, QPixmap, QPainter, QColor, QAction, QPen
 import math
 
+from device_registry import DeviceRegistry
+from audio_codecs import CODECS, soundfile
+from transcription_backends import AUTO_SELECTION, available_backends, get_backend
+
 class StatsManager:
     """Klasa do zarządzania statystykami użytkownika"""
     
@@ -19,21 +23,35 @@ class StatsManager:
         self.settings_file = "whisper_stats.json"
         self.stats = self._load_stats()
     
-    def _load_stats(self):
-        default_stats = {
+    def _default_stats(self):
+        return {
             "total_recordings": 0,
             "total_seconds": 0,
             "total_characters": 0,
             "api_calls": 0,
+            "raw_audio_bytes": 0,
+            "uploaded_bytes": 0,
+            "encode_seconds_offloaded": 0,
+            "skipped_recordings": 0,
+            "hedge_dispatches": 0,
+            "hedged_requests": 0,
+            "hedge_wins": {},
+            "cache_hits": 0,
+            "cache_misses": 0,
             "last_used": None
         }
+    
+    def _load_stats(self):
+        default_stats = self._default_stats()
         
         if os.path.exists(self.settings_file):
             try:
                 with open(self.settings_file, 'r') as f:
-                    return json.load(f)
+                    # Uzupełnij brakujące klucze ze starszych plików statystyk
+                    default_stats.update(json.load(f))
+                    return default_stats
             except:
-                return default_stats
+                return self._default_stats()
         return default_stats
     
     def save_stats(self):
@@ -48,6 +66,54 @@ class StatsManager:
         self.stats["last_used"] = time.strftime("%Y-%m-%d %H:%M:%S")
         self.save_stats()
     
+    def update_upload_stats(self, raw_bytes, uploaded_bytes, encode_seconds_offloaded=0.0):
+        """Records the PCM size before encoding, the size actually uploaded and encode time done while recording"""
+        self.stats["raw_audio_bytes"] += raw_bytes
+        self.stats["uploaded_bytes"] += uploaded_bytes
+        self.stats["encode_seconds_offloaded"] += encode_seconds_offloaded
+        self.save_stats()
+    
+    def record_skipped_recording(self):
+        """Counts a recording dropped by voice activity detection (an API call avoided)"""
+        self.stats["skipped_recordings"] += 1
+        self.save_stats()
+    
+    def record_hedges(self, hedges):
+        """Counts requests sent with hedging enabled, how many were duplicated and which provider answered first"""
+        for hedge in hedges:
+            self.stats["hedge_dispatches"] += 1
+            if hedge["hedged"]:
+                self.stats["hedged_requests"] += 1
+                wins = self.stats["hedge_wins"]
+                wins[hedge["winner"]] = wins.get(hedge["winner"], 0) + 1
+        self.save_stats()
+    
+    def get_hedge_rate(self):
+        """Fraction of hedging-enabled requests that were duplicated to the second provider"""
+        dispatches = self.stats["hedge_dispatches"]
+        if dispatches <= 0:
+            return 0.0
+        return self.stats["hedged_requests"] / dispatches
+    
+    def record_cache_lookup(self, hit):
+        """Counts a transcription cache lookup"""
+        self.stats["cache_hits" if hit else "cache_misses"] += 1
+        self.save_stats()
+    
+    def get_cache_hit_rate(self):
+        """Fraction of cache lookups answered from the cache"""
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        if lookups <= 0:
+            return 0.0
+        return self.stats["cache_hits"] / lookups
+    
+    def get_bandwidth_saved(self):
+        """Fraction of the raw PCM bytes that encoding kept off the network"""
+        raw = self.stats["raw_audio_bytes"]
+        if raw <= 0:
+            return 0.0
+        return max(0.0, 1.0 - self.stats["uploaded_bytes"] / raw)
+    
     def get_time_saved(self):
         # Zakładamy, że mówimy 3x szybciej niż piszemy
         # Przyjmijmy, że przeciętna prędkość pisania to 40 WPM (200 znaków/min)
@@ -70,19 +136,17 @@ class StatsManager:
             "total_characters": self.stats["total_characters"],
             "api_calls": self.stats["api_calls"],
             "time_saved": time_saved_str,
+            "bandwidth_saved": f"{self.get_bandwidth_saved() * 100:.0f}%",
+            "hedge_rate": f"{self.get_hedge_rate() * 100:.0f}%",
+            "cache_ratio": (f"{self.get_cache_hit_rate() * 100:.0f}% / {(1 - self.get_cache_hit_rate()) * 100:.0f}%"
+                            if self.stats["cache_hits"] + self.stats["cache_misses"] else "-"),
+            "hedge_wins": ", ".join(f"{name} {count}" for name, count in sorted(self.stats["hedge_wins"].items())),
             "last_used": self.stats["last_used"] or "Nigdy"
         }
     
     def clear_stats(self):
         """Czyści wszystkie statystyki użytkownika"""
-        default_stats = {
-            "total_recordings": 0,
-            "total_seconds": 0,
-            "total_characters": 0,
-            "api_calls": 0,
-            "last_used": None
-        }
-        self.stats = default_stats
+        self.stats = self._default_stats()
         self.save_stats()
 
     def update_last_recording_stats(self, duration_seconds, text):
@@ -402,8 +466,9 @@ class WhisperMainWindow(QMainWindow):
     hotkey_changed = pyqtSignal(list)
     option_changed = pyqtSignal(str, bool)
     microphone_changed = pyqtSignal(str)  # New signal for microphone changes
+    audio_settings_changed = pyqtSignal(dict)
     
-    def __init__(self):
+    def __init__(self, device_registry=None):
         super().__init__()
         self.setWindowTitle("Whisper Transcriber")
         self.setMinimumSize(800, 600)
@@ -411,8 +476,12 @@ class WhisperMainWindow(QMainWindow):
         # Ustawienia
         self.settings = QSettings("WhisperApp", "TranscriberSettings")
         self.api_provider = self.settings.value("api_provider", "openai")
-        self.openai_key = self.settings.value("openai_key", "")
-        self.deepinfra_key = self.settings.value("deepinfra_key", "")
+        # Klucze API wszystkich dostawców z rejestru (openai_key, deepinfra_key, ...)
+        self.api_keys = {name: self.settings.value(f"{name}_key", "") for name, _ in available_backends()}
+        self.compatible_base_url = self.settings.value("compatible_base_url", "")
+        self.compatible_model = self.settings.value("compatible_model", "whisper-1")
+        self.local_model_dir = self.settings.value("local_model_dir", "")
+        self.local_quantize = self.settings.value("local_quantize", True, type=bool)
         self.hotkey = self.settings.value("hotkey", ["Ctrl", "Shift"])
         self.selected_microphone = self.settings.value("selected_microphone", "")
         
@@ -421,9 +490,46 @@ class WhisperMainWindow(QMainWindow):
         self.tray_notifications_enabled = self.settings.value("tray_notifications_enabled", True, type=bool)
         self.startup_enabled = self.settings.value("startup_enabled", False, type=bool)
         
+        # Ustawienia nagrywania
+        self.armed_enabled = self.settings.value("armed_enabled", False, type=bool)
+        self.preroll_ms = self.settings.value("preroll_ms", 500, type=int)
+        self.debug_save_audio = self.settings.value("debug_save_audio", False, type=bool)
+        self.vad_enabled = self.settings.value("vad_enabled", True, type=bool)
+        self.compress_pauses_enabled = self.settings.value("compress_pauses_enabled", False, type=bool)
+        self.max_pause_ms = self.settings.value("max_pause_ms", 1000, type=int)
+        self.speedup_factor = self.settings.value("speedup_factor", 1.0, type=float)
+        self.native_capture = self.settings.value("native_capture", True, type=bool)
+        self.meter_debug_overlay = self.settings.value("meter_debug_overlay", False, type=bool)
+        
+        # Format wysyłanego audio ("auto" = najmniejszy format akceptowany przez dostawcę)
+        self.upload_codec = self.settings.value("upload_codec", "auto")
+        self.provider_codecs = {
+            name: self.settings.value(f"upload_codec_{name}", "default") for name, _ in available_backends()
+        }
+        self.streaming_encode_enabled = self.settings.value("streaming_encode_enabled", True, type=bool)
+        self.chunked_upload_enabled = self.settings.value("chunked_upload_enabled", False, type=bool)
+        self.provider_sample_rates = {
+            provider: self.settings.value(f"sample_rate_{provider}", 8000, type=int)
+            for provider, _ in available_backends()
+        }
+        self.segmented_enabled = self.settings.value("segmented_enabled", True, type=bool)
+        self.prewarm_enabled = self.settings.value("prewarm_enabled", True, type=bool)
+        self.http_transport = self.settings.value("http_transport", "requests")
+        self.hedge_enabled = self.settings.value("hedge_enabled", False, type=bool)
+        self.hedge_delay_ms = self.settings.value("hedge_delay_ms", 2000, type=int)
+        self.hedge_provider = self.settings.value("hedge_provider", "auto")
+        self.spool_enabled = self.settings.value("spool_enabled", True, type=bool)
+        self.spool_max_mb = self.settings.value("spool_max_mb", 200, type=int)
+        self.cache_enabled = self.settings.value("cache_enabled", True, type=bool)
+        self.max_segment_seconds = self.settings.value("max_segment_seconds", 30, type=int)
+        
         # Statystyki
         self.stats_manager = StatsManager()
         
+        # Wspólna lista urządzeń audio (bez ponownej inicjalizacji PortAudio przy każdym otwarciu ustawień)
+        self.device_registry = device_registry or DeviceRegistry()
+        self.device_registry.devices_changed.connect(self.on_devices_changed)
+        
         # UI
         self.init_ui()
         
@@ -1012,6 +1118,8 @@ class WhisperMainWindow(QMainWindow):
         
         # For the last session, we'll use the time saved instead
         self.create_stat_widget(layout, "⏱", "#6F42C1", "Time Saved", stats["time_saved"])
+        self.create_stat_widget(layout, "📶", "#17A2B8", "Upload Saved", stats["bandwidth_saved"])
+        self.create_stat_widget(layout, "♻", "#20C997", "Cache Hit / Miss", stats["cache_ratio"])
         
         return section
     
@@ -1175,25 +1283,8 @@ class WhisperMainWindow(QMainWindow):
         mic_label = QLabel("Select Input Device:")
         self.mic_combo = QComboBox()
         
-        # Get available audio input devices
-        import pyaudio
-        p = pyaudio.PyAudio()
-        for i in range(p.get_device_count()):
-            device_info = p.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0:  # Only add input devices
-                name = device_info['name']
-                # Add device info to the display text
-                display_text = f"{name} (Channels: {int(device_info['maxInputChannels'])})"
-                self.mic_combo.addItem(display_text, device_info['index'])
-        p.terminate()
-        
-        # Set current microphone if previously selected
-        if self.selected_microphone:
-            # Find the item that contains the selected microphone name
-            for i in range(self.mic_combo.count()):
-                if self.selected_microphone in self.mic_combo.itemText(i):
-                    self.mic_combo.setCurrentIndex(i)
-                    break
+        # Get available audio input devices from the cached registry
+        self.populate_microphone_combo()
         
         # Create a horizontal layout for microphone selection and refresh button
         mic_selection_layout = QHBoxLayout()
@@ -1216,6 +1307,216 @@ class WhisperMainWindow(QMainWindow):
         
         layout.addWidget(mic_section)
         
+        # Recording Settings Section
+        recording_section = QGroupBox("Recording Settings")
+        recording_section.setStyleSheet(group_box_style)
+        recording_layout = QVBoxLayout(recording_section)
+        
+        # Armed mode keeps the microphone open so the first syllable is never lost
+        self.armed_check = QCheckBox("Keep microphone armed (pre-roll buffer)")
+        self.armed_check.setToolTip("Keeps the input stream open between recordings. Disable for privacy or to save power.")
+        self.armed_check.setChecked(self.armed_enabled)
+        recording_layout.addWidget(self.armed_check)
+        
+        preroll_layout = QHBoxLayout()
+        preroll_label = QLabel("Pre-roll length:")
+        self.preroll_combo = QComboBox()
+        for ms in (300, 500, 750, 1000):
+            self.preroll_combo.addItem(f"{ms} ms", ms)
+        preroll_index = self.preroll_combo.findData(self.preroll_ms)
+        self.preroll_combo.setCurrentIndex(preroll_index if preroll_index >= 0 else 1)
+        preroll_layout.addWidget(preroll_label)
+        preroll_layout.addWidget(self.preroll_combo)
+        recording_layout.addLayout(preroll_layout)
+        
+        # Voice activity detection
+        self.vad_check = QCheckBox("Trim silence and skip recordings without speech")
+        self.vad_check.setChecked(self.vad_enabled)
+        recording_layout.addWidget(self.vad_check)
+        
+        # Native device format, converted in software
+        self.native_capture_check = QCheckBox("Capture at the microphone's native format")
+        self.native_capture_check.setToolTip("Records at the device's own sample rate and channels and converts "
+                                             "in the app; turn off if a device misbehaves")
+        self.native_capture_check.setChecked(self.native_capture)
+        recording_layout.addWidget(self.native_capture_check)
+        
+        # Frame rate / CPU overlay on the level meter of the recording popup
+        self.meter_debug_check = QCheckBox("Show level meter performance overlay")
+        self.meter_debug_check.setChecked(self.meter_debug_overlay)
+        recording_layout.addWidget(self.meter_debug_check)
+        
+        # Shortening of long pauses (needs silence trimming)
+        pause_layout = QHBoxLayout()
+        self.compress_pauses_check = QCheckBox("Shorten pauses longer than:")
+        self.compress_pauses_check.setToolTip("Long silent spans inside a dictation are cut to a short gap before upload")
+        self.compress_pauses_check.setChecked(self.compress_pauses_enabled)
+        self.max_pause_combo = QComboBox()
+        for ms in (750, 1000, 1500, 2000):
+            self.max_pause_combo.addItem(f"{ms / 1000:g} s", ms)
+        max_pause_index = self.max_pause_combo.findData(self.max_pause_ms)
+        self.max_pause_combo.setCurrentIndex(max_pause_index if max_pause_index >= 0 else 1)
+        self.compress_pauses_check.setEnabled(self.vad_enabled)
+        self.vad_check.toggled.connect(self.compress_pauses_check.setEnabled)
+        pause_layout.addWidget(self.compress_pauses_check)
+        pause_layout.addWidget(self.max_pause_combo)
+        recording_layout.addLayout(pause_layout)
+        
+        # Pitch-preserving speed-up before upload
+        speedup_layout = QHBoxLayout()
+        speedup_label = QLabel("Speed up audio:")
+        speedup_label.setToolTip("Shorter uploads are cheaper and faster; the factor is capped per provider")
+        self.speedup_combo = QComboBox()
+        self.speedup_combo.addItem("Off", 1.0)
+        for factor in (1.1, 1.25, 1.5, 1.75, 2.0):
+            self.speedup_combo.addItem(f"{factor:g}x", factor)
+        speedup_index = self.speedup_combo.findData(self.speedup_factor)
+        self.speedup_combo.setCurrentIndex(speedup_index if speedup_index >= 0 else 0)
+        speedup_layout.addWidget(speedup_label)
+        speedup_layout.addWidget(self.speedup_combo)
+        speedup_layout.addStretch()
+        recording_layout.addLayout(speedup_layout)
+        
+        # Debug copy of every clip
+        self.debug_save_check = QCheckBox("Save a copy of each recording (debug)")
+        self.debug_save_check.setToolTip("Writes every clip to a unique file in the debug_recordings folder")
+        self.debug_save_check.setChecked(self.debug_save_audio)
+        recording_layout.addWidget(self.debug_save_check)
+        
+        # Save Recording Settings Button
+        save_recording_button = QPushButton("Save Recording Settings")
+        save_recording_button.clicked.connect(self.save_audio_settings)
+        recording_layout.addWidget(save_recording_button)
+        
+        layout.addWidget(recording_section)
+        
+        # Upload Settings Section
+        upload_section = QGroupBox("Upload Settings")
+        upload_section.setStyleSheet(group_box_style)
+        upload_layout = QFormLayout(upload_section)
+        
+        self.codec_combo = QComboBox()
+        self.codec_combo.addItem("Auto (smallest accepted)", "auto")
+        for codec in CODECS.values():
+            self.codec_combo.addItem(codec.label, codec.name)
+        self.codec_combo.setCurrentIndex(max(self.codec_combo.findData(self.upload_codec), 0))
+        upload_layout.addRow(QLabel("Upload format:"), self.codec_combo)
+        
+        # Per-provider override of the upload format
+        self.provider_codec_combos = {}
+        for provider, provider_label in available_backends():
+            if not self.uploads_audio(provider):
+                continue
+            combo = QComboBox()
+            combo.addItem("Same as above", "default")
+            combo.addItem("Auto (smallest accepted)", "auto")
+            for codec in CODECS.values():
+                combo.addItem(codec.label, codec.name)
+            combo.setCurrentIndex(max(combo.findData(self.provider_codecs.get(provider, "default")), 0))
+            self.provider_codec_combos[provider] = combo
+            upload_layout.addRow(QLabel(f"{provider_label} format:"), combo)
+        
+        if soundfile is None:
+            upload_layout.addRow(QLabel("FLAC and Opus need the soundfile package."))
+        
+        # Sample rate sent to each provider: 16 kHz for accuracy, 8 kHz for the smallest uploads
+        self.sample_rate_combos = {}
+        for provider, provider_label in available_backends():
+            if not self.uploads_audio(provider):
+                continue
+            combo = QComboBox()
+            for rate in (8000, 12000, 16000):
+                combo.addItem(f"{rate // 1000} kHz", rate)
+            combo.setCurrentIndex(max(combo.findData(self.provider_sample_rates.get(provider, 8000)), 0))
+            self.sample_rate_combos[provider] = combo
+            upload_layout.addRow(QLabel(f"{provider_label} sample rate:"), combo)
+        
+        # Encoding while the user speaks keeps it off the release-to-upload path
+        self.streaming_encode_check = QCheckBox("Encode while recording")
+        self.streaming_encode_check.setChecked(self.streaming_encode_enabled)
+        upload_layout.addRow(self.streaming_encode_check)
+        
+        # Chunked upload opened at the key press (WAV formats only; falls back to a whole-file upload)
+        self.chunked_upload_check = QCheckBox("Upload while recording (chunked transfer)")
+        self.chunked_upload_check.setToolTip("Needs 'Encode while recording' and a WAV format; "
+                                             "endpoints that reject it get the whole file instead")
+        self.chunked_upload_check.setChecked(self.chunked_upload_enabled)
+        self.chunked_upload_check.setEnabled(self.streaming_encode_enabled)
+        self.streaming_encode_check.toggled.connect(self.chunked_upload_check.setEnabled)
+        upload_layout.addRow(self.chunked_upload_check)
+        
+        # Connections are kept alive between dictations; the key press re-opens them if needed
+        self.prewarm_check = QCheckBox("Connect to the provider while recording")
+        self.prewarm_check.setToolTip("Opens or revalidates the connection at the key press, "
+                                      "so the upload at release does not wait for the handshakes")
+        self.prewarm_check.setChecked(self.prewarm_enabled)
+        upload_layout.addRow(self.prewarm_check)
+        
+        # HTTP client used for uploads (selectable for benchmarking; chunked uploads always use requests)
+        self.transport_combo = QComboBox()
+        self.transport_combo.addItem("requests (thread per request)", "requests")
+        self.transport_combo.addItem("aiohttp (asyncio event loop)", "aiohttp")
+        self.transport_combo.setCurrentIndex(max(self.transport_combo.findData(self.http_transport), 0))
+        upload_layout.addRow(QLabel("HTTP client:"), self.transport_combo)
+        
+        # Hedging: a slow request is duplicated to a second provider and the first answer wins
+        self.hedge_check = QCheckBox("Hedge slow requests to a second provider")
+        self.hedge_check.setToolTip("Costs an extra request whenever the first provider is slower than the delay")
+        self.hedge_check.setChecked(self.hedge_enabled)
+        self.hedge_delay_combo = QComboBox()
+        for delay_ms in (500, 1000, 1500, 2000, 3000, 5000):
+            self.hedge_delay_combo.addItem(f"{delay_ms / 1000:g} s", delay_ms)
+        self.hedge_delay_combo.setCurrentIndex(max(self.hedge_delay_combo.findData(self.hedge_delay_ms), 0))
+        self.hedge_provider_combo = QComboBox()
+        self.hedge_provider_combo.addItem("Automatic (another configured provider)", "auto")
+        for name, label in available_backends():
+            self.hedge_provider_combo.addItem(label, name)
+        self.hedge_provider_combo.setCurrentIndex(max(self.hedge_provider_combo.findData(self.hedge_provider), 0))
+        self.hedge_delay_combo.setEnabled(self.hedge_enabled)
+        self.hedge_provider_combo.setEnabled(self.hedge_enabled)
+        self.hedge_check.toggled.connect(self.hedge_delay_combo.setEnabled)
+        self.hedge_check.toggled.connect(self.hedge_provider_combo.setEnabled)
+        upload_layout.addRow(self.hedge_check)
+        upload_layout.addRow(QLabel("Hedge after:"), self.hedge_delay_combo)
+        upload_layout.addRow(QLabel("Hedge provider:"), self.hedge_provider_combo)
+        
+        # Offline queue: recordings that could not be sent are kept on disk and transcribed later
+        self.spool_check = QCheckBox("Queue recordings while offline and transcribe them later")
+        self.spool_check.setToolTip("Results of queued recordings are added to the transcript and copied to the clipboard")
+        self.spool_check.setChecked(self.spool_enabled)
+        self.spool_limit_combo = QComboBox()
+        for limit_mb in (50, 200, 500, 1000):
+            self.spool_limit_combo.addItem(f"{limit_mb} MB", limit_mb)
+        self.spool_limit_combo.setCurrentIndex(max(self.spool_limit_combo.findData(self.spool_max_mb), 0))
+        self.spool_limit_combo.setToolTip("The oldest queued recordings are dropped above this size")
+        upload_layout.addRow(self.spool_check)
+        upload_layout.addRow(QLabel("Offline queue limit:"), self.spool_limit_combo)
+        
+        # Identical recordings (re-sends, repeated short commands) are answered from the cache
+        self.cache_check = QCheckBox("Reuse transcriptions of identical recordings")
+        self.cache_check.setToolTip("Results are kept for 7 days in the transcription_cache folder")
+        self.cache_check.setChecked(self.cache_enabled)
+        upload_layout.addRow(self.cache_check)
+        
+        # Long recordings are split at pauses and the parts transcribed in parallel
+        self.segmented_check = QCheckBox("Split long recordings into parallel requests")
+        self.segmented_check.setChecked(self.segmented_enabled)
+        self.segment_length_combo = QComboBox()
+        for seconds in (15, 30, 45, 60):
+            self.segment_length_combo.addItem(f"{seconds} s", seconds)
+        segment_index = self.segment_length_combo.findData(self.max_segment_seconds)
+        self.segment_length_combo.setCurrentIndex(segment_index if segment_index >= 0 else 1)
+        self.segment_length_combo.setEnabled(self.segmented_enabled)
+        self.segmented_check.toggled.connect(self.segment_length_combo.setEnabled)
+        upload_layout.addRow(self.segmented_check)
+        upload_layout.addRow(QLabel("Maximum segment length:"), self.segment_length_combo)
+        
+        save_upload_button = QPushButton("Save Upload Settings")
+        save_upload_button.clicked.connect(self.save_audio_settings)
+        upload_layout.addRow(save_upload_button)
+        
+        layout.addWidget(upload_section)
+        
         # API Settings Section
         api_section = QGroupBox("API Settings")
         api_section.setStyleSheet(group_box_style)
@@ -1225,9 +1526,12 @@ class WhisperMainWindow(QMainWindow):
         provider_layout = QHBoxLayout()
         provider_label = QLabel("API Provider:")
         self.provider_combo = QComboBox()
-        self.provider_combo.addItems(["OpenAI", "DeepInfra"])
-        self.provider_combo.setCurrentText("OpenAI" if self.api_provider == "openai" else "DeepInfra")
-        self.provider_combo.currentTextChanged.connect(self.on_provider_changed)
+        for name, label in available_backends():
+            self.provider_combo.addItem(label, name)
+        # Automatic choice among the providers that have a key (or need none)
+        self.provider_combo.addItem("Automatic - cheapest", "auto_cheapest")
+        self.provider_combo.addItem("Automatic - fastest", "auto_fastest")
+        self.provider_combo.setCurrentIndex(max(self.provider_combo.findData(self.api_provider), 0))
         provider_layout.addWidget(provider_label)
         provider_layout.addWidget(self.provider_combo)
         api_layout.addLayout(provider_layout)
@@ -1237,11 +1541,40 @@ class WhisperMainWindow(QMainWindow):
         key_label = QLabel("API Key:")
         self.api_key_input = QLineEdit()
         self.api_key_input.setEchoMode(QLineEdit.EchoMode.Password)
-        self.api_key_input.setText(self.openai_key if self.api_provider == "openai" else self.deepinfra_key)
         key_layout.addWidget(key_label)
         key_layout.addWidget(self.api_key_input)
         api_layout.addLayout(key_layout)
         
+        # Self-hosted server with the OpenAI transcription API
+        compatible_layout = QFormLayout()
+        self.base_url_input = QLineEdit()
+        self.base_url_input.setPlaceholderText("http://localhost:8000/v1")
+        self.base_url_input.setText(self.compatible_base_url)
+        self.model_input = QLineEdit()
+        self.model_input.setText(self.compatible_model)
+        compatible_layout.addRow(QLabel("Base URL:"), self.base_url_input)
+        compatible_layout.addRow(QLabel("Model:"), self.model_input)
+        api_layout.addLayout(compatible_layout)
+        
+        # Whisper model running on this machine
+        local_layout = QFormLayout()
+        model_dir_layout = QHBoxLayout()
+        self.local_model_input = QLineEdit()
+        self.local_model_input.setPlaceholderText("Folder with a faster-whisper (CTranslate2) model")
+        self.local_model_input.setText(self.local_model_dir)
+        self.local_model_browse = QPushButton("Browse...")
+        self.local_model_browse.clicked.connect(self.browse_local_model)
+        model_dir_layout.addWidget(self.local_model_input)
+        model_dir_layout.addWidget(self.local_model_browse)
+        self.local_quantize_check = QCheckBox("Quantize to int8 (faster, less memory)")
+        self.local_quantize_check.setChecked(self.local_quantize)
+        local_layout.addRow(QLabel("Model folder:"), model_dir_layout)
+        local_layout.addRow(self.local_quantize_check)
+        api_layout.addLayout(local_layout)
+        
+        self.provider_combo.currentIndexChanged.connect(self.on_provider_changed)
+        self.on_provider_changed()
+        
         # Save API Settings Button
         save_api_button = QPushButton("Save API Settings")
         save_api_button.clicked.connect(self.save_api_settings)
@@ -1309,35 +1642,68 @@ class WhisperMainWindow(QMainWindow):
         scroll_area.setWidget(tab)
         return scroll_area
     
-    def on_provider_changed(self, provider):
-        """Updates the API key input when provider is changed"""
-        self.api_key_input.setText(self.openai_key if provider == "OpenAI" else self.deepinfra_key)
+    def on_provider_changed(self, index=None):
+        """Updates the API key and endpoint inputs when provider is changed"""
+        provider = self.provider_combo.currentData()
+        automatic = provider in AUTO_SELECTION
+        self.api_key_input.setText(self.api_keys.get(provider, ""))
+        self.api_key_input.setEnabled(not automatic)
+        self.base_url_input.setEnabled(provider == "openai_compatible")
+        self.model_input.setEnabled(provider == "openai_compatible")
+        self.local_model_input.setEnabled(provider == "local")
+        self.local_model_browse.setEnabled(provider == "local")
+        self.local_quantize_check.setEnabled(provider == "local")
+    
+    @staticmethod
+    def uploads_audio(provider):
+        """True for providers that take an encoded upload (the local model takes PCM)"""
+        backend = get_backend(provider)
+        return backend is None or not backend.local
+    
+    def browse_local_model(self):
+        """Lets the user pick the local model folder"""
+        folder = QFileDialog.getExistingDirectory(self, "Select model folder", self.local_model_input.text())
+        if folder:
+            self.local_model_input.setText(folder)
     
     def save_api_settings(self):
         """Saves the API settings"""
-        provider = self.provider_combo.currentText()
+        provider = self.provider_combo.currentData()
+        provider_label = self.provider_combo.currentText()
         api_key = self.api_key_input.text().strip()
         
-        if not api_key:
-            QMessageBox.warning(self, "API Settings", "API key cannot be empty.")
-            return
-        
-        self.api_provider = provider.lower()
-        if self.api_provider == "openai":
-            self.openai_key = api_key
-            self.settings.setValue("openai_key", api_key)
-        else:
-            self.deepinfra_key = api_key
-            self.settings.setValue("deepinfra_key", api_key)
-        
+        if provider not in AUTO_SELECTION:
+            backend = get_backend(provider)
+            if not api_key and (backend is None or backend.requires_api_key):
+                QMessageBox.warning(self, "API Settings", "API key cannot be empty.")
+                return
+            self.api_keys[provider] = api_key
+            self.settings.setValue(f"{provider}_key", api_key)
+        
+        if provider == "openai_compatible":
+            if not self.base_url_input.text().strip():
+                QMessageBox.warning(self, "API Settings", "Base URL cannot be empty.")
+                return
+            self.compatible_base_url = self.base_url_input.text().strip()
+            self.compatible_model = self.model_input.text().strip() or "whisper-1"
+            self.settings.setValue("compatible_base_url", self.compatible_base_url)
+            self.settings.setValue("compatible_model", self.compatible_model)
+        
+        if provider == "local":
+            if not os.path.isdir(self.local_model_input.text().strip()):
+                QMessageBox.warning(self, "API Settings", "Select an existing model folder.")
+                return
+            self.local_model_dir = self.local_model_input.text().strip()
+            self.local_quantize = self.local_quantize_check.isChecked()
+            self.settings.setValue("local_model_dir", self.local_model_dir)
+            self.settings.setValue("local_quantize", self.local_quantize)
+        
+        self.api_provider = provider
         self.settings.setValue("api_provider", self.api_provider)
         
-        self.api_settings_changed.emit({
-            "provider": self.api_provider,
-            "key": api_key
-        })
+        self.api_settings_changed.emit(self.get_api_settings())
         
-        QMessageBox.information(self, "API Settings", f"API settings for {provider} have been saved.")
+        QMessageBox.information(self, "API Settings", f"API settings for {provider_label} have been saved.")
     
     def save_hotkey_settings(self):
         """Saves the hotkey settings"""
@@ -1471,6 +1837,11 @@ class WhisperMainWindow(QMainWindow):
         self.record_action.triggered.connect(self.toggle_recording_from_tray)
         tray_menu.addAction(self.record_action)
         
+        # Cancel action - available while a transcription is in progress
+        self.cancel_action = QAction("Cancel Transcription", self)
+        self.cancel_action.setEnabled(False)
+        tray_menu.addAction(self.cancel_action)
+        
         # Separator
         tray_menu.addSeparator()
         
@@ -1696,60 +2067,121 @@ class WhisperMainWindow(QMainWindow):
         self.microphone_changed.emit(mic_name)
         QMessageBox.information(self, "Microphone Settings", f"Microphone has been set to: {mic_name}")
 
-    def refresh_microphone_list(self):
-        """Refreshes the list of available microphones"""
+    def save_audio_settings(self):
+        """Saves the recording settings"""
+        self.armed_enabled = self.armed_check.isChecked()
+        self.preroll_ms = self.preroll_combo.currentData()
+        self.debug_save_audio = self.debug_save_check.isChecked()
+        self.vad_enabled = self.vad_check.isChecked()
+        self.settings.setValue("vad_enabled", self.vad_enabled)
+        self.compress_pauses_enabled = self.compress_pauses_check.isChecked()
+        self.max_pause_ms = self.max_pause_combo.currentData()
+        self.settings.setValue("compress_pauses_enabled", self.compress_pauses_enabled)
+        self.settings.setValue("max_pause_ms", self.max_pause_ms)
+        self.speedup_factor = self.speedup_combo.currentData()
+        self.settings.setValue("speedup_factor", self.speedup_factor)
+        self.native_capture = self.native_capture_check.isChecked()
+        self.settings.setValue("native_capture", self.native_capture)
+        self.meter_debug_overlay = self.meter_debug_check.isChecked()
+        self.settings.setValue("meter_debug_overlay", self.meter_debug_overlay)
+        self.settings.setValue("armed_enabled", self.armed_enabled)
+        self.settings.setValue("preroll_ms", self.preroll_ms)
+        self.settings.setValue("debug_save_audio", self.debug_save_audio)
+        
+        self.upload_codec = self.codec_combo.currentData()
+        self.settings.setValue("upload_codec", self.upload_codec)
+        for provider, combo in self.provider_codec_combos.items():
+            self.provider_codecs[provider] = combo.currentData()
+            self.settings.setValue(f"upload_codec_{provider}", combo.currentData())
+        self.streaming_encode_enabled = self.streaming_encode_check.isChecked()
+        self.settings.setValue("streaming_encode_enabled", self.streaming_encode_enabled)
+        for provider, combo in self.sample_rate_combos.items():
+            self.provider_sample_rates[provider] = combo.currentData()
+            self.settings.setValue(f"sample_rate_{provider}", combo.currentData())
+        self.chunked_upload_enabled = self.chunked_upload_check.isChecked()
+        self.settings.setValue("chunked_upload_enabled", self.chunked_upload_enabled)
+        self.prewarm_enabled = self.prewarm_check.isChecked()
+        self.settings.setValue("prewarm_enabled", self.prewarm_enabled)
+        self.http_transport = self.transport_combo.currentData()
+        self.settings.setValue("http_transport", self.http_transport)
+        self.hedge_enabled = self.hedge_check.isChecked()
+        self.hedge_delay_ms = self.hedge_delay_combo.currentData()
+        self.hedge_provider = self.hedge_provider_combo.currentData()
+        self.settings.setValue("hedge_enabled", self.hedge_enabled)
+        self.settings.setValue("hedge_delay_ms", self.hedge_delay_ms)
+        self.settings.setValue("hedge_provider", self.hedge_provider)
+        self.spool_enabled = self.spool_check.isChecked()
+        self.spool_max_mb = self.spool_limit_combo.currentData()
+        self.settings.setValue("spool_enabled", self.spool_enabled)
+        self.settings.setValue("spool_max_mb", self.spool_max_mb)
+        self.cache_enabled = self.cache_check.isChecked()
+        self.settings.setValue("cache_enabled", self.cache_enabled)
+        self.segmented_enabled = self.segmented_check.isChecked()
+        self.max_segment_seconds = self.segment_length_combo.currentData()
+        self.settings.setValue("segmented_enabled", self.segmented_enabled)
+        self.settings.setValue("max_segment_seconds", self.max_segment_seconds)
+        
+        self.audio_settings_changed.emit(self.get_audio_settings())
+        QMessageBox.information(self, "Audio Settings", "Recording and upload settings have been saved.")
+
+    def populate_microphone_combo(self):
+        """Fills the microphone combo box from the device registry; returns the number of devices"""
         self.mic_combo.clear()
         
-        # Get available audio input devices
-        import pyaudio
-        p = pyaudio.PyAudio()
-        found_devices = False
+        devices = self.device_registry.input_devices()
+        for device_info in devices:
+            # Add device info to the display text
+            display_text = f"{device_info['display_name']} (Channels: {int(device_info['maxInputChannels'])})"
+            self.mic_combo.addItem(display_text, device_info['index'])
         
-        for i in range(p.get_device_count()):
-            device_info = p.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0:  # Only add input devices
-                found_devices = True
-                name = device_info['name']
-                
-                # Fix encoding of device name for display
-                try:
-                    name_utf8 = name.encode('latin1').decode('utf-8')
-                except (UnicodeDecodeError, UnicodeEncodeError):
-                    name_utf8 = name
-                    
-                # Add device info to the display text
-                display_text = f"{name_utf8} (Channels: {int(device_info['maxInputChannels'])})"
-                self.mic_combo.addItem(display_text, device_info['index'])
-        p.terminate()
-        
-        if not found_devices:
+        if not devices:
             self.mic_combo.addItem("No microphones found")
+        elif self.selected_microphone:
+            # Set current microphone if previously selected
+            for i in range(self.mic_combo.count()):
+                if self.selected_microphone in self.mic_combo.itemText(i):
+                    self.mic_combo.setCurrentIndex(i)
+                    break
+        
+        return len(devices)
+
+    def refresh_microphone_list(self):
+        """Refreshes the list of available microphones"""
+        # Rescan devices; while recording the rescan is deferred and the cached list is shown
+        if self.device_registry.request_reinitialize() is False:
+            self.populate_microphone_combo()
+        
+        count = self.mic_combo.count() if self.device_registry.has_input_devices() else 0
+        if count == 0:
             QMessageBox.warning(self, "No Microphones", "No microphone devices were found on your system.")
         else:
-            # Set current microphone if previously selected
-            if self.selected_microphone:
-                # Find the item that contains the selected microphone name
-                for i in range(self.mic_combo.count()):
-                    if self.selected_microphone in self.mic_combo.itemText(i):
-                        self.mic_combo.setCurrentIndex(i)
-                        break
-            
-            QMessageBox.information(self, "Microphones Refreshed", f"Found {self.mic_combo.count()} microphone device(s).")
+            QMessageBox.information(self, "Microphones Refreshed", f"Found {count} microphone device(s).")
+
+    def on_devices_changed(self):
+        """Updates the microphone list after a device rescan"""
+        if not hasattr(self, 'mic_combo'):
+            return
+        try:
+            self.populate_microphone_combo()
+        except RuntimeError:
+            # Settings view was closed and the combo box has been deleted
+            pass
 
     def get_api_settings(self):
         """Returns current API settings"""
         return {
             "provider": self.api_provider,
-            "key": self.get_active_api_key()
+            "key": self.get_active_api_key(),
+            "keys": dict(self.api_keys),
+            "base_url": self.compatible_base_url,
+            "model": self.compatible_model,
+            "local_model_dir": self.local_model_dir,
+            "local_quantize": self.local_quantize
         }
     
     def get_active_api_key(self):
         """Returns active API key based on selected provider"""
-        if self.api_provider == "openai":
-            return self.openai_key
-        elif self.api_provider == "deepinfra":
-            return self.deepinfra_key
-        return ""
+        return self.api_keys.get(self.api_provider, "")
     
     def get_selected_microphone(self):
         """Returns the currently selected microphone"""
@@ -1764,6 +2196,35 @@ class WhisperMainWindow(QMainWindow):
             "startup_enabled": self.startup_enabled
         }
 
+    def get_audio_settings(self):
+        """Returns current recording settings"""
+        return {
+            "armed_enabled": self.armed_enabled,
+            "preroll_ms": self.preroll_ms,
+            "debug_save_audio": self.debug_save_audio,
+            "vad_enabled": self.vad_enabled,
+            "compress_pauses_enabled": self.compress_pauses_enabled,
+            "max_pause_ms": self.max_pause_ms,
+            "speedup_factor": self.speedup_factor,
+            "native_capture": self.native_capture,
+            "meter_debug_overlay": self.meter_debug_overlay,
+            "provider_sample_rates": dict(self.provider_sample_rates),
+            "upload_codec": self.upload_codec,
+            "provider_codecs": dict(self.provider_codecs),
+            "streaming_encode_enabled": self.streaming_encode_enabled,
+            "chunked_upload_enabled": self.chunked_upload_enabled,
+            "prewarm_enabled": self.prewarm_enabled,
+            "http_transport": self.http_transport,
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "hedge_provider": self.hedge_provider,
+            "spool_enabled": self.spool_enabled,
+            "spool_max_mb": self.spool_max_mb,
+            "cache_enabled": self.cache_enabled,
+            "segmented_enabled": self.segmented_enabled,
+            "max_segment_seconds": self.max_segment_seconds
+        }
+
     def get_hotkey(self):
         """Returns the current hotkey combination"""
         return self.hotkey